@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Single-pass summary statistics and cross-tabs over classified events.
+
+Counts for each classification field and the cross-tabs below are built in one
+pass over streamed records, so reports on large output files never load the
+whole dataset or need another LLM run. Aggregates can be saved and updated with
+records appended later.
+
+    python analytics.py us_data_enhanced.json
+    python analytics.py us_data_enhanced.jsonl --format csv --output summary.csv --state summary_state.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Any, Dict, Iterable, List
+
+from event_io import OUTPUT_FORMATS, iter_event_file
+from results_store import CLASSIFICATION_FIELDS
+
+# Headings used by the summary printed at the end of a classification run.
+FIELD_LABELS = {
+    'attack_type': "Attack Types",
+    'extremist_beliefs_classification': "Extremist Beliefs",
+    'connection_to_organized_extremist_group_classification': "Organized Group Connection",
+    'sole_perpetrator_classification': "Sole Perpetrator",
+    'issue_type': "Issue Types",
+    'target': "Targets",
+    'political_violence_classification': "Political Violence Classification",
+}
+
+MISSING = 'UNKNOWN'
+
+
+def _value(event: Dict[str, Any], field: str) -> str:
+    value = event.get(field)
+    return MISSING if value is None else str(value)
+
+
+def event_month(event: Dict[str, Any]) -> str:
+    """YYYY-MM of an event, from event_date or the year/month columns."""
+    date = str(event.get('event_date') or '')
+    if len(date) >= 7 and date[4] == '-':
+        return date[:7]
+    year, month = event.get('year'), event.get('month')
+    if year and month:
+        return f"{year}-{int(month):02d}"
+    return MISSING
+
+
+class EventSummary:
+    """Counts and cross-tabs of classified events, updated one record at a time.
+
+    Cross-tabs are keyed by name: `<field>_by_state` and `<field>_by_month` for
+    every classification field, plus `political_violence_by_issue_type`.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.counts = {field: Counter() for field in CLASSIFICATION_FIELDS}
+        self.crosstabs = defaultdict(Counter)
+
+    def update(self, event: Dict[str, Any]):
+        """Add one record to the aggregates."""
+        self.records += 1
+        state = _value(event, 'state') or MISSING
+        month = event_month(event)
+        for field in CLASSIFICATION_FIELDS:
+            value = _value(event, field)
+            self.counts[field][value] += 1
+            self.crosstabs[f"{field}_by_state"][(value, state)] += 1
+            self.crosstabs[f"{field}_by_month"][(value, month)] += 1
+        self.crosstabs["political_violence_by_issue_type"][
+            (_value(event, 'political_violence_classification'), _value(event, 'issue_type'))
+        ] += 1
+
+    def update_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Add every record; return how many were added."""
+        before = self.records
+        for event in events:
+            self.update(event)
+        return self.records - before
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form: counts per field and nested {row: {col: count}} cross-tabs."""
+        crosstabs = {}
+        for name, table in sorted(self.crosstabs.items()):
+            nested = defaultdict(dict)
+            for (row, col), count in sorted(table.items()):
+                nested[row][col] = count
+            crosstabs[name] = dict(nested)
+        return {
+            "records": self.records,
+            "counts": {field: dict(sorted(counts.items())) for field, counts in self.counts.items()},
+            "crosstabs": crosstabs,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EventSummary':
+        """Rebuild a summary saved with to_dict()."""
+        summary = cls()
+        summary.records = data.get("records", 0)
+        for field, counts in data.get("counts", {}).items():
+            summary.counts.setdefault(field, Counter()).update(counts)
+        for name, nested in data.get("crosstabs", {}).items():
+            for row, cols in nested.items():
+                for col, count in cols.items():
+                    summary.crosstabs[name][(row, col)] += count
+        return summary
+
+    def rows(self) -> Iterable[List[Any]]:
+        """Flat (table, row, column, count) rows for CSV output; field counts have an empty column."""
+        for field, counts in self.counts.items():
+            for value, count in sorted(counts.items()):
+                yield [field, value, '', count]
+        for name, table in sorted(self.crosstabs.items()):
+            for (row, col), count in sorted(table.items()):
+                yield [name, row, col, count]
+
+
+def print_summary(summary: EventSummary):
+    """Print the per-field counts in the classification run's summary format."""
+    print("\nSUMMARY STATISTICS:")
+    for field, label in FIELD_LABELS.items():
+        print(f"{label}:")
+        for value, count in sorted(summary.counts[field].items()):
+            print(f"  {value}: {count}")
+
+
+def load_summary(path: str) -> EventSummary:
+    """Load saved aggregates, or start empty if the file does not exist."""
+    if not os.path.exists(path):
+        return EventSummary()
+    with open(path, 'r', encoding='utf-8') as f:
+        return EventSummary.from_dict(json.load(f))
+
+
+def save_summary(summary: EventSummary, path: str):
+    """Save aggregates atomically so an interrupted save keeps the previous state."""
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(summary.to_dict(), f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def write_report(summary: EventSummary, output_format: str, output=None):
+    """Write the summary as JSON or as flat CSV rows."""
+    output = output or sys.stdout
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(['table', 'row', 'column', 'count'])
+        writer.writerows(summary.rows())
+    else:
+        json.dump(summary.to_dict(), output, indent=2, ensure_ascii=False)
+        output.write('\n')
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Summarize classified events without reclassifying them.")
+    parser.add_argument('path', nargs='?', default='us_data_enhanced.json',
+                        help="Enhanced events as a JSON array, JSONL or CSV (default: us_data_enhanced.json)")
+    parser.add_argument('--input-format', choices=OUTPUT_FORMATS, default=None,
+                        help="Input format (default: from the file extension)")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json',
+                        help="Report format (default: json)")
+    parser.add_argument('--output', default=None,
+                        help="Write the report here instead of to stdout")
+    parser.add_argument('--state', default=None,
+                        help="Aggregates saved by a previous run; only records after the ones it has seen are added, then it is updated")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
+    """Summarize an output file, optionally continuing from saved aggregates."""
+    args = parse_args(argv)
+    summary = load_summary(args.state) if args.state else EventSummary()
+    events = iter_event_file(args.path, args.input_format)
+    added = summary.update_many(islice(events, summary.records, None))
+    if args.state:
+        save_summary(summary, args.state)
+        print(f"Added {added} new records ({summary.records} total)", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write_report(summary, args.format, f)
+    else:
+        write_report(summary, args.format)
+
+
+if __name__ == "__main__":
+    main()
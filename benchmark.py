@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the classification pipeline.
+
+Runs classification_script.py end to end against a local fake LLM (the stub
+server with configurable latency and failure rate), over us_data_filtered.csv
+and synthetic inflations of it. For each dataset size it reports events/sec,
+wall time, peak RSS of the pipeline process and prompt bytes per event, plus the
+per-stage latencies from the run report. No API calls are made.
+
+    python benchmark.py --sizes base,10000 --latency-ms 200 --failure-rate 0.02 --workers 16
+
+With --output-token-ms each response also takes time per generated token, and
+--compare-compact runs every size with and without --compact to measure the
+saving in response size and latency.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from event_io import count_csv_rows, iter_csv_rows
+from llm_stub import StubError, StubLLMServer, default_responder
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+
+def latency_sampler(distribution: str, median_ms: float, spread: float,
+                    rng: random.Random) -> Callable[[], float]:
+    """Return a function drawing one simulated response latency in seconds.
+
+    `fixed` always waits median_ms; `uniform` draws from median_ms * (1 ± spread);
+    `lognormal` has median median_ms and shape sigma = spread, giving the long
+    tail typical of API latencies.
+    """
+    median = median_ms / 1000
+    if distribution == 'fixed':
+        return lambda: median
+    if distribution == 'uniform':
+        return lambda: max(0.0, rng.uniform(median * (1 - spread), median * (1 + spread)))
+    if distribution == 'lognormal':
+        mu = math.log(median) if median > 0 else float('-inf')
+        return lambda: rng.lognormvariate(mu, spread) if median > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution '{distribution}' (choose from {', '.join(LATENCY_DISTRIBUTIONS)})")
+
+
+class FakeLLM:
+    """Stub responder that sleeps for a sampled latency, fails at a given rate, and counts prompt and response bytes.
+
+    With output_token_ms, each successful response also waits that long per
+    generated token (estimated at 4 bytes each), as a model decoding its answer.
+    """
+
+    def __init__(self, latency: Callable[[], float], failure_rate: float = 0.0,
+                 failure_status: int = 529, seed: int = 0, output_token_ms: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.output_token_ms = output_token_ms
+        self.requests = 0
+        self.failures = 0
+        self.prompt_bytes = 0
+        self.response_bytes = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.requests = self.failures = self.prompt_bytes = self.response_bytes = 0
+
+    def __call__(self, prompt: str) -> str:
+        with self._lock:
+            delay = self.latency()
+            fail = self._rng.random() < self.failure_rate
+            self.requests += 1
+            if fail:
+                self.failures += 1
+            else:
+                self.prompt_bytes += len(prompt.encode('utf-8'))
+        if fail:
+            time.sleep(delay)
+            raise StubError(self.failure_status)
+        response = default_responder(prompt)
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self.response_bytes += size
+        time.sleep(delay + size / 4 * self.output_token_ms / 1000)
+        return response
+
+
+def inflate_dataset(source: str, destination: str, size: int) -> int:
+    """Write `size` rows cycling through source; copies after the first get distinct notes."""
+    with open(destination, 'w', encoding='utf-8', newline='') as f:
+        writer = None
+        written = 0
+        copy = 0
+        while written < size:
+            for row in iter_csv_rows(source):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                if copy:
+                    row['notes'] = f"{row.get('notes', '')} [SYNTHETIC COPY {copy}]"
+                writer.writerow(row)
+                written += 1
+                if written == size:
+                    break
+            copy += 1
+    return written
+
+
+def run_pipeline(input_path: str, workdir: str, api_url: str, pipeline_args: List[str]) -> Dict[str, Any]:
+    """Run the classification script in a child process; return its exit status, wall time, peak RSS and run report."""
+    config_path = os.path.join(workdir, 'backend.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump({"backend": "http", "api_url": api_url, "model": "benchmark-model"}, f)
+    report_path = os.path.join(workdir, 'run_report.json')
+    command = [
+        sys.executable, os.path.join(SCRIPT_DIR, 'classification_script.py'),
+        '--config', config_path,
+        '--input', input_path,
+        '--output', os.path.join(workdir, 'output.jsonl'),
+        '--checkpoint', os.path.join(workdir, 'checkpoint.jsonl'),
+        '--no-cache',
+        '--run-report', report_path,
+    ] + pipeline_args
+
+    started = time.monotonic()
+    with open(os.path.join(workdir, 'pipeline.log'), 'w', encoding='utf-8') as log:
+        # Run from the script directory so the example CSVs are found.
+        process = subprocess.Popen(command, cwd=SCRIPT_DIR, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+    wall_seconds = time.monotonic() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    report = None
+    if os.path.exists(report_path):
+        with open(report_path, encoding='utf-8') as f:
+            report = json.load(f)
+    return {"returncode": process.returncode, "wall_seconds": wall_seconds, "peak_rss_bytes": peak_rss, "report": report}
+
+
+def benchmark_size(source: str, size: Optional[int], fake: FakeLLM, api_url: str,
+                   pipeline_args: List[str], workdir: str, variants: List[List[str]] = ([],)) -> List[Dict[str, Any]]:
+    """Benchmark one dataset size (None for the source file as is), once per variant of extra pipeline arguments."""
+    if size is None:
+        input_path, events = source, count_csv_rows(source)
+    else:
+        input_path = os.path.join(workdir, f'synthetic_{size}.csv')
+        events = inflate_dataset(source, input_path, size)
+
+    results = []
+    for variant in variants:
+        fake.reset()
+        run = run_pipeline(input_path, workdir, api_url, pipeline_args + variant)
+        dataset = "base" if size is None else f"synthetic_{size}"
+        results.append(summarize_run(" ".join([dataset] + variant), events, run, fake))
+    if size is not None:
+        os.remove(input_path)
+    return results
+
+
+def summarize_run(dataset: str, events: int, run: Dict[str, Any], fake: FakeLLM) -> Dict[str, Any]:
+    """Combine one pipeline run with the fake LLM's counts."""
+    result = {
+        "dataset": dataset,
+        "events": events,
+        "returncode": run["returncode"],
+        "wall_seconds": run["wall_seconds"],
+        "events_per_second": events / run["wall_seconds"] if run["wall_seconds"] > 0 else None,
+        "peak_rss_mb": run["peak_rss_bytes"] / (1024 * 1024),
+        "llm_requests": fake.requests,
+        "injected_failures": fake.failures,
+        "prompt_bytes_per_event": fake.prompt_bytes / events if events else 0,
+        "response_bytes_per_event": fake.response_bytes / events if events else 0,
+    }
+    if run["report"] is not None:
+        stages = run["report"]["stages"]
+        result["stages_ms"] = {
+            stage: {key: summary[key] * 1000 for key in ('p50', 'p95', 'p99') if key in summary}
+            for stage, summary in stages.items()
+        }
+        result["counters"] = run["report"]["counters"]
+    return result
+
+
+def print_results(results: List[Dict[str, Any]]):
+    """Print one summary line per dataset size."""
+    print(f"{'dataset':<28} {'events':>8} {'wall s':>9} {'events/s':>10} {'peak RSS MB':>12} {'prompt B/event':>15} "
+          f"{'response B/event':>17} {'requests':>9} {'failures':>9}")
+    for result in results:
+        status = "" if result["returncode"] == 0 else f"  (exit {result['returncode']})"
+        print(f"{result['dataset']:<28} {result['events']:>8} {result['wall_seconds']:>9.2f} {result['events_per_second']:>10.1f} "
+              f"{result['peak_rss_mb']:>12.1f} {result['prompt_bytes_per_event']:>15.0f} {result['response_bytes_per_event']:>17.0f} "
+              f"{result['llm_requests']:>9} {result['injected_failures']:>9}{status}")
+
+
+def print_compact_comparison(results: List[Dict[str, Any]]):
+    """Print the response size and latency saved by --compact, from alternating full-label and compact results."""
+    print()
+    for full, compact in zip(results[::2], results[1::2]):
+        full_call = full.get("stages_ms", {}).get("backend_call", {}).get("p50")
+        compact_call = compact.get("stages_ms", {}).get("backend_call", {}).get("p50")
+        line = (f"{compact['dataset']}: {compact['response_bytes_per_event']:.0f} instead of "
+                f"{full['response_bytes_per_event']:.0f} response bytes per event "
+                f"({1 - compact['response_bytes_per_event'] / full['response_bytes_per_event']:.0%} fewer)")
+        if full_call and compact_call:
+            line += f", p50 LLM call {compact_call:.0f}ms instead of {full_call:.0f}ms ({1 - compact_call / full_call:.0%} faster)"
+        print(line + f", wall time {compact['wall_seconds']:.1f}s instead of {full['wall_seconds']:.1f}s")
+
+
+def parse_sizes(text: str) -> List[Optional[int]]:
+    """Parse a comma-separated list of sizes; 'base' means the source file unchanged."""
+    sizes = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        if part == 'base':
+            sizes.append(None)
+        elif part:
+            sizes.append(int(part.replace('k', '000')))
+    return sizes
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the classification pipeline against a simulated LLM.")
+    parser.add_argument('--input', default=os.path.join(SCRIPT_DIR, 'us_data_filtered.csv'),
+                        help="Source CSV (default: us_data_filtered.csv)")
+    parser.add_argument('--sizes', default='base,10000,100000',
+                        help="Comma-separated dataset sizes; 'base' is the source file, numbers are synthetic inflations "
+                             "(default: base,10000,100000)")
+    parser.add_argument('--latency-ms', type=float, default=50.0,
+                        help="Median simulated LLM latency in milliseconds (default: 50)")
+    parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='lognormal',
+                        help="Latency distribution (default: lognormal)")
+    parser.add_argument('--latency-spread', type=float, default=0.5,
+                        help="Lognormal sigma, or the ± fraction for uniform latency (default: 0.5)")
+    parser.add_argument('--output-token-ms', type=float, default=0.0,
+                        help="Simulated generation time per output token in milliseconds, added to each response (default: 0)")
+    parser.add_argument('--compare-compact', action='store_true',
+                        help="Run each size with and without --compact and report the response size and latency saved")
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help="Fraction of LLM requests answered with an error (default: 0)")
+    parser.add_argument('--failure-status', type=int, default=529,
+                        help="HTTP status of injected failures (default: 529, overloaded)")
+    parser.add_argument('--workers', type=int, default=16,
+                        help="Pipeline --workers (default: 16)")
+    parser.add_argument('--pipeline-args', default='',
+                        help="Extra classification_script.py arguments, e.g. \"--batch-size 5 --dedup\"")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for simulated latencies and failures (default: 0)")
+    parser.add_argument('--output', default=None,
+                        help="Also write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> List[Dict[str, Any]]:
+    """Benchmark each requested dataset size and print the results."""
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    fake = FakeLLM(latency_sampler(args.latency_distribution, args.latency_ms, args.latency_spread, rng),
+                   args.failure_rate, args.failure_status, args.seed, args.output_token_ms)
+    pipeline_args = ['--workers', str(args.workers)] + shlex.split(args.pipeline_args)
+    variants = [[], ['--compact']] if args.compare_compact else [[]]
+
+    results = []
+    with StubLLMServer(fake) as server, tempfile.TemporaryDirectory() as workdir:
+        print(f"Fake LLM at {server.url}: {args.latency_distribution} latency, median {args.latency_ms:.0f}ms, "
+              f"failure rate {args.failure_rate:.1%}; pipeline args: {' '.join(pipeline_args)}")
+        for size in parse_sizes(args.sizes):
+            for result in benchmark_size(args.input, size, fake, server.url, pipeline_args, workdir, variants):
+                results.append(result)
+                print(f"{result['dataset']}: {result['events']} events in {result['wall_seconds']:.1f}s "
+                      f"({result['events_per_second']:.1f} events/s)")
+
+    print()
+    print_results(results)
+    if args.compare_compact:
+        print_compact_comparison(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL checkpoints for long classification runs.
+
+Each classified event is appended as one line, {"index": ..., "hash": ..., "event": ...},
+and flushed immediately, so a crash loses at most the event in flight. A resumed
+run skips every index already recorded for the same source row, and the final
+output is streamed from the checkpoint in input order.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Optional
+
+
+def event_fingerprint(event: Dict[str, Any]) -> str:
+    """Stable hash of an event's source fields."""
+    return hashlib.sha256(json.dumps(event, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _repair_partial_line(path: str):
+    """Truncate a trailing line left half-written by a crash so appends stay valid."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b'\n':
+            return
+        size = f.seek(0, os.SEEK_END)
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(position - step + newline + 1)
+                return
+            position -= step
+        f.truncate(0)
+
+
+class CheckpointWriter:
+    """Appends classified events to a JSONL checkpoint, flushing after each one."""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        if resume:
+            _repair_partial_line(path)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def write(self, index: int, source_hash: str, event: Dict[str, Any]):
+        """Record the enhanced event for input row `index`."""
+        record = {"index": index, "hash": source_hash, "event": event}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_checkpoint(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield checkpoint records in file order, skipping a half-written final line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Warning: Skipping corrupt checkpoint line in {path}")
+
+
+def load_completed(path: str) -> Dict[int, str]:
+    """Map each recorded input index to the hash of the source row it was classified from."""
+    return {record["index"]: record["hash"] for record in iter_checkpoint(path)}
+
+
+def _record_index(line: bytes) -> Optional[int]:
+    """Read the index from a checkpoint line, or None if the line is corrupt.
+    
+    Records written by CheckpointWriter start {"index": N, so the index is read
+    without decoding the whole record; any other line is decoded in full.
+    """
+    prefix = b'{"index": '
+    if line.startswith(prefix):
+        end = line.find(b',', len(prefix))
+        if end != -1:
+            try:
+                return int(line[len(prefix):end])
+            except ValueError:
+                pass
+    try:
+        index = json.loads(line)["index"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return index if isinstance(index, int) else None
+
+
+def iter_checkpoint_events(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield recorded events in input order, keeping the last record for any repeated index."""
+    # Checkpoints are normally written in input order: one cheap scan confirms it,
+    # then the events stream straight through.
+    in_order = True
+    last_index = -1
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            index = _record_index(line)
+            if index is None:
+                # iter_checkpoint skips it below, with a warning.
+                continue
+            if index <= last_index:
+                in_order = False
+                break
+            last_index = index
+
+    if in_order:
+        for record in iter_checkpoint(path):
+            yield record["event"]
+        return
+
+    # Out of order (e.g. after a resume over an edited input): index byte offsets,
+    # then read records in index order without holding the events in memory.
+    offsets = {}
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.endswith(b'\n'):
+                index = _record_index(line)
+                if index is None:
+                    print(f"Warning: Skipping corrupt checkpoint line in {path}")
+                else:
+                    offsets[index] = offset
+            offset += len(line)
+        for index in sorted(offsets):
+            f.seek(offsets[index])
+            try:
+                record = json.loads(f.readline())
+            except json.JSONDecodeError:
+                print(f"Warning: Skipping corrupt checkpoint line in {path}")
+                continue
+            yield record["event"]
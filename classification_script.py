@@ -3,13 +3,45 @@
 Classification script for processing political violence events using LLM.
 """
 
-import csv
+import argparse
+import difflib
 import json
-import subprocess
+import re
 import sys
-from typing import Dict, List, Any
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 import os
 
+from analytics import EventSummary, print_summary, save_summary
+from checkpoint import CheckpointWriter, event_fingerprint, iter_checkpoint, iter_checkpoint_events, load_completed
+from dedup import cluster_sizes, find_duplicate_clusters
+from event_io import OUTPUT_FORMATS, count_csv_rows, infer_format, iter_csv_rows, iter_event_file, open_event_writer
+from example_index import ExampleIndex
+from incremental import PreviousResults
+from instrumentation import metrics, print_stage_report
+from llm_backends import LLMBackend, LLMTimeoutError, MeteredBackend, create_backend, load_backend_config
+from response_cache import CachedBackend, ResponseCache
+from results_store import LLM_SOURCE, SOURCE_COLUMN, ResultsStore, parse_filters
+from scheduler import ScheduledBackend
+from sharding import SOURCE_ROW, parse_shard, shard_of, shard_path
+from triage import DEFAULT_THRESHOLD as DEFAULT_TRIAGE_THRESHOLD, TriageModel, TriageRouter
+
+# Backend used when callers do not pass one; built lazily from the default config.
+DEFAULT_BACKEND = None
+
+REQUIRED_FIELDS = [
+    "attack_type",
+    "extremist_beliefs_classification",
+    "connection_to_organized_extremist_group_classification",
+    "sole_perpetrator_classification",
+    "issue_type",
+    "target",
+    "political_violence_classification"
+]
+
 # Classification definitions
 ATTACK_TYPE_LIST = [
     {
@@ -148,14 +180,130 @@ POLITICAL_VIOLENCE_CLASSIFICATION_LIST = [
     }
 ]
 
+# Allowed values of each classification field, from the definition lists above.
+# The prompt also allows MANUAL CHECK, and N/A for the organized group connection.
+FIELD_DEFINITIONS = {
+    "attack_type": ATTACK_TYPE_LIST,
+    "extremist_beliefs_classification": EXTREMIST_BELIEFS_CLASSIFICATION_LIST,
+    "connection_to_organized_extremist_group_classification": CONNECTION_TO_ORGANIZED_EXTREMIST_GROUP_CLASSIFICATION_LIST,
+    "sole_perpetrator_classification": SOLE_PERPETRATOR_CLASSIFICATION_LIST,
+    "issue_type": ISSUE_TYPE_LIST,
+    "target": TARGET_LIST,
+    "political_violence_classification": POLITICAL_VIOLENCE_CLASSIFICATION_LIST,
+}
+
+MANUAL_CHECK = "MANUAL CHECK"
+
+FIELD_VALUES = {field: [entry[field] for entry in definitions] for field, definitions in FIELD_DEFINITIONS.items()}
+FIELD_VALUES["connection_to_organized_extremist_group_classification"].append("N/A")
+
+# Near-miss spellings must be at least this similar to one allowed value, and
+# clearly closer to it than to any other, to be corrected.
+NEAR_MISS_CUTOFF = 0.85
+NEAR_MISS_MARGIN = 0.05
+
+def _value_key(value: str) -> str:
+    """Compare values ignoring case, whitespace, punctuation and dash styles."""
+    return re.sub(r"[^A-Z0-9+]", "", value.upper())
+
+_VALUE_KEYS = {
+    field: {_value_key(value): value for value in values + [MANUAL_CHECK]}
+    for field, values in FIELD_VALUES.items()
+}
+
+def normalize_field_value(field: str, value: Any) -> Optional[str]:
+    """Map a returned value onto the field's allowed values, or None if it is not one of them."""
+    if not isinstance(value, str) or field not in _VALUE_KEYS:
+        return None
+    keys = _VALUE_KEYS[field]
+    key = _value_key(value)
+    if key in keys:
+        return keys[key]
+    scores = sorted(((difflib.SequenceMatcher(None, key, candidate).ratio(), candidate) for candidate in keys), reverse=True)
+    if not key or scores[0][0] < NEAR_MISS_CUTOFF:
+        return None
+    if len(scores) > 1 and scores[0][0] - scores[1][0] < NEAR_MISS_MARGIN:
+        return None
+    return keys[scores[0][1]]
+
+def validate_classification(data: Dict[str, Any]) -> Tuple[Dict[str, str], List[str]]:
+    """Normalize each required field; return the valid fields and the names of missing or invalid ones."""
+    valid = {}
+    invalid = []
+    for field in REQUIRED_FIELDS:
+        value = normalize_field_value(field, data.get(field))
+        if value is None:
+            invalid.append(field)
+            continue
+        if value != data[field]:
+            metrics.increment('normalized_values')
+        valid[field] = value
+    return valid, invalid
+
+# Compact responses use a short key per field and integer codes for its values,
+# numbered in definition-list order with 0 for MANUAL CHECK.
+COMPACT_KEYS = {
+    "attack_type": "at",
+    "extremist_beliefs_classification": "eb",
+    "connection_to_organized_extremist_group_classification": "cg",
+    "sole_perpetrator_classification": "sp",
+    "issue_type": "it",
+    "target": "tg",
+    "political_violence_classification": "pv",
+}
+COMPACT_VALUES = {field: [MANUAL_CHECK] + FIELD_VALUES[field] for field in COMPACT_KEYS}
+_COMPACT_FIELDS = {key: field for field, key in COMPACT_KEYS.items()}
+
+def render_compact_codes() -> str:
+    """One line per field listing its compact key and value codes."""
+    return "\n".join(
+        f'"{key}" ({field}): ' + ", ".join(f"{code}={value}" for code, value in enumerate(COMPACT_VALUES[field]))
+        for field, key in COMPACT_KEYS.items()
+    )
+
+def compact_schema(batch: bool = False) -> Dict[str, Any]:
+    """JSON schema limiting a compact response to the known keys and codes.
+    
+    A batch response is an object whose "events" array holds one entry per event.
+    """
+    properties = {key: {"type": "integer", "enum": list(range(len(COMPACT_VALUES[field])))}
+                  for field, key in COMPACT_KEYS.items()}
+    required = list(COMPACT_KEYS.values())
+    if not batch:
+        return {"type": "object", "properties": properties, "required": required, "additionalProperties": False}
+    item = {"type": "object", "properties": dict(event_index={"type": "integer"}, **properties),
+            "required": ["event_index"] + required, "additionalProperties": False}
+    return {"type": "object", "properties": {"events": {"type": "array", "items": item}}, "required": ["events"]}
+
+def encode_compact(classification: Dict[str, str]) -> Dict[str, int]:
+    """Compact form of a complete classification."""
+    return {key: COMPACT_VALUES[field].index(classification[field]) for field, key in COMPACT_KEYS.items()}
+
+def expand_compact(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace compact keys and codes with field names and full labels.
+    
+    Unknown codes are left out, so validation reports those fields as missing.
+    Other keys, including full field names, are kept.
+    """
+    expanded = {key: value for key, value in data.items() if key not in _COMPACT_FIELDS}
+    for key, field in _COMPACT_FIELDS.items():
+        try:
+            code = int(data[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= code < len(COMPACT_VALUES[field]):
+            expanded[field] = COMPACT_VALUES[field][code]
+    return expanded
+
+def _record_compact_sizes(response_text: str, full_label_response: Any, events: int = 1):
+    """Count compact response characters against the same answer as full-label JSON."""
+    metrics.increment('compact_responses', events)
+    metrics.increment('compact_response_chars', len(response_text))
+    metrics.increment('full_label_response_chars', len(json.dumps(full_label_response)))
+
 def load_csv_data(filename: str) -> List[Dict[str, Any]]:
     """Load CSV data into a list of dictionaries."""
-    data = []
-    with open(filename, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            data.append(row)
-    return data
+    return list(iter_csv_rows(filename))
 
 def load_examples() -> tuple:
     """Load example data from green and yellow CSV files."""
@@ -176,18 +324,62 @@ def load_examples() -> tuple:
     
     return green_examples, yellow_examples
 
-def create_classification_prompt(event: Dict[str, Any], green_examples: List[Dict], yellow_examples: List[Dict]) -> str:
-    """Create a prompt for the LLM to classify an event."""
-    
-    prompt = f"""You are an expert analyst tasked with classifying political violence events. Please analyze the following event and provide classifications based on the criteria below.
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Claude models (about four characters per token)."""
+    return (len(text) + 3) // 4
 
-EVENT TO CLASSIFY:
-Notes: {event.get('notes', '')}
-Tags: {event.get('tags', '')}
-Associated Actor 1: {event.get('assoc_actor_1', '')}
-Actor 1: {event.get('actor1', '')}
-Event Type: {event.get('event_type', '')}
-Sub Event Type: {event.get('sub_event_type', '')}
+SIMILAR_EXAMPLES_NOTE = """Each event below is followed by the labeled reference events most similar to it.
+GREEN examples met the political violence criteria; YELLOW examples are other events for reference."""
+
+def render_reference_examples(green_examples: List[Dict], yellow_examples: List[Dict]) -> str:
+    """Render the fixed reference examples (the first three rows of each example set)."""
+    return f"""GREEN EXAMPLES (Political Violence):
+{json.dumps(green_examples[:3] if green_examples else [], indent=2)}
+
+YELLOW EXAMPLES (Other Events):
+{json.dumps(yellow_examples[:3] if yellow_examples else [], indent=2)}"""
+
+OUTPUT_FORMAT = """REQUIRED OUTPUT FORMAT:
+Please respond with ONLY a valid JSON object containing these seven fields:
+{
+    "attack_type": "one of the attack types from the list",
+    "extremist_beliefs_classification": "YES or NO",
+    "connection_to_organized_extremist_group_classification": "YES, NO, or N/A",
+    "sole_perpetrator_classification": "YES or NO",
+    "issue_type": "one of the issue types from the list",
+    "target": "one of the target types from the list",
+    "political_violence_classification": "POLITICAL VIOLENCE or NOT POLITICAL VIOLENCE"
+}
+
+Important: Set connection_to_organized_extremist_group_classification to "N/A" if extremist_beliefs_classification is "NO".
+"""
+
+COMPACT_OUTPUT_FORMAT = """REQUIRED OUTPUT FORMAT (COMPACT CODES):
+Please respond with ONLY a valid JSON object with these seven short keys, each set to the number of the chosen value:
+{codes}
+
+For example: {{{example}}}
+
+Important: Set "cg" to the number for N/A if "eb" is the number for NO.
+"""
+
+def render_prompt_prefix(green_examples: List[Dict], yellow_examples: List[Dict], similar_examples: bool = False,
+                         compact: bool = False) -> str:
+    """Render the invariant part of the prompt: criteria, guidelines, examples and output format.
+    
+    With similar_examples, the fixed examples are replaced by a note that each event
+    carries its own nearest reference examples. With compact, the model is asked
+    for numeric codes under short keys instead of full labels.
+    """
+    reference_examples = SIMILAR_EXAMPLES_NOTE if similar_examples else render_reference_examples(green_examples, yellow_examples)
+    if compact:
+        output_format = COMPACT_OUTPUT_FORMAT.format(
+            codes=render_compact_codes(),
+            example=", ".join(f'"{key}": <number>' for key in COMPACT_KEYS.values())
+        )
+    else:
+        output_format = OUTPUT_FORMAT
+    return f"""You are an expert analyst tasked with classifying political violence events. Please analyze the event at the end of this prompt and provide classifications based on the criteria below.
 
 CLASSIFICATION CRITERIA:
 
@@ -232,234 +424,936 @@ GUIDELINES:
 REFERENCE EXAMPLES:
 Here are some examples from similar events for reference:
 
-GREEN EXAMPLES (Political Violence):
-{json.dumps(green_examples[:3] if green_examples else [], indent=2)}
+{reference_examples}
 
-YELLOW EXAMPLES (Other Events):
-{json.dumps(yellow_examples[:3] if yellow_examples else [], indent=2)}
+{output_format}"""
 
-REQUIRED OUTPUT FORMAT:
-Please respond with ONLY a valid JSON object containing these seven fields:
-{{
-    "attack_type": "one of the attack types from the list",
-    "extremist_beliefs_classification": "YES or NO",
-    "connection_to_organized_extremist_group_classification": "YES, NO, or N/A",
-    "sole_perpetrator_classification": "YES or NO",
-    "issue_type": "one of the issue types from the list",
-    "target": "one of the target types from the list",
-    "political_violence_classification": "POLITICAL VIOLENCE or NOT POLITICAL VIOLENCE"
-}}
+def render_event_section(event: Dict[str, Any], similar_examples: Optional[List[Dict]] = None) -> str:
+    """Render the per-event part of the prompt, which goes last."""
+    section = f"""
+EVENT TO CLASSIFY:
+Notes: {event.get('notes', '')}
+Tags: {event.get('tags', '')}
+Associated Actor 1: {event.get('assoc_actor_1', '')}
+Actor 1: {event.get('actor1', '')}
+Event Type: {event.get('event_type', '')}
+Sub Event Type: {event.get('sub_event_type', '')}
+"""
+    if similar_examples:
+        section += "Similar Reference Examples:\n"
+        section += "".join(json.dumps(example, ensure_ascii=False) + "\n" for example in similar_examples)
+    return section
 
-Important: Set connection_to_organized_extremist_group_classification to "N/A" if extremist_beliefs_classification is "NO".
+BATCH_OUTPUT_FORMAT = """
+BATCH OUTPUT FORMAT:
+This request contains {count} events, each introduced by "EVENT TO CLASSIFY (event_index N)". Instead of a single JSON object, respond with ONLY a valid JSON array containing one object per event. Each object must contain an "event_index" field with the event's index plus the seven fields from the required output format above.
+"""
+
+COMPACT_BATCH_OUTPUT_FORMAT = """
+BATCH OUTPUT FORMAT:
+This request contains {count} events, each introduced by "EVENT TO CLASSIFY (event_index N)". Respond with ONLY a valid JSON object of the form {{"events": [...]}} whose array contains one object per event. Each object must contain an "event_index" field with the event's index plus the seven short keys from the required output format above.
 """
-    
-    return prompt
 
-def classify_event_with_llm(event: Dict[str, Any], green_examples: List[Dict], yellow_examples: List[Dict]) -> Dict[str, str]:
-    """Use LLM to classify a single event."""
-    prompt = create_classification_prompt(event, green_examples, yellow_examples)
+class PromptBuilder:
+    """Builds prompts from a prefix rendered once per example set plus a per-event section.
+    
+    The prefix is identical for every event, so it goes first where providers can
+    cache it; only the short event section changes between calls. A compact
+    builder asks for numeric codes and carries the JSON schemas responses
+    should follow.
+    """
+    
+    # Recently used builders by example-list identity, for callers that don't pass
+    # one explicitly; bounded so example lists built per call don't accumulate.
+    MAX_SHARED_BUILDERS = 8
+    _builders = OrderedDict()
+    _builders_lock = threading.Lock()
+    
+    def __init__(self, green_examples: List[Dict], yellow_examples: List[Dict], example_index: Optional[ExampleIndex] = None,
+                 examples_per_event: int = 4, compact: bool = False):
+        self.green_examples = green_examples
+        self.yellow_examples = yellow_examples
+        self.example_index = example_index
+        self.examples_per_event = examples_per_event
+        self.compact = compact
+        self.response_schema = compact_schema() if compact else None
+        self.batch_schema = compact_schema(batch=True) if compact else None
+        self.prefix = render_prompt_prefix(green_examples, yellow_examples, similar_examples=example_index is not None, compact=compact)
+        self.prompt_count = 0
+        self.event_count = 0
+        self.event_chars = 0
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def for_examples(cls, green_examples: List[Dict], yellow_examples: List[Dict]) -> 'PromptBuilder':
+        """Return a plain builder for these example lists, reusing a recent one's rendered prefix."""
+        key = (id(green_examples), id(yellow_examples))
+        with cls._builders_lock:
+            builder = cls._builders.get(key)
+            # A cached builder keeps its lists alive, but check identity anyway so
+            # an id reused after eviction can't return another list's prefix.
+            if builder is not None and builder.green_examples is green_examples and builder.yellow_examples is yellow_examples:
+                cls._builders.move_to_end(key)
+                return builder
+            builder = cls(green_examples, yellow_examples)
+            cls._builders[key] = builder
+            if len(cls._builders) > cls.MAX_SHARED_BUILDERS:
+                cls._builders.popitem(last=False)
+            return builder
+    
+    def _event_section(self, event: Dict[str, Any]) -> str:
+        similar = self.example_index.nearest(event, self.examples_per_event) if self.example_index is not None else None
+        return render_event_section(event, similar)
+    
+    def _record(self, events: int, chars: int):
+        with self._lock:
+            self.prompt_count += 1
+            self.event_count += events
+            self.event_chars += chars
+    
+    def build(self, event: Dict[str, Any]) -> str:
+        """Return the full prompt for one event."""
+        with metrics.time('prompt_build'):
+            section = self._event_section(event)
+            self._record(1, len(section))
+            prompt = self.prefix + section
+        metrics.observe_size('prompt_chars', len(prompt))
+        return prompt
+    
+    def build_batch(self, indexed_events: List[Tuple[int, Dict[str, Any]]]) -> str:
+        """Return one prompt asking for a JSON array classifying several (event_index, event) pairs."""
+        with metrics.time('prompt_build'):
+            body = (COMPACT_BATCH_OUTPUT_FORMAT if self.compact else BATCH_OUTPUT_FORMAT).format(count=len(indexed_events))
+            for index, event in indexed_events:
+                body += self._event_section(event).replace("EVENT TO CLASSIFY:", f"EVENT TO CLASSIFY (event_index {index}):", 1)
+            self._record(len(indexed_events), len(body))
+            prompt = self.prefix + body
+        metrics.observe_size('prompt_chars', len(prompt))
+        return prompt
     
+    def stats(self) -> Dict[str, float]:
+        """Summarize prompt sizes per event in characters and estimated tokens."""
+        with self._lock:
+            prompts = self.prompt_count
+            events = self.event_count
+            event_chars = self.event_chars
+        avg_event_chars = event_chars / events if events else 0
+        # A batched prompt sends the prefix once for all of its events.
+        avg_prefix_chars = len(self.prefix) * prompts / events if events else len(self.prefix)
+        return {
+            "prompts": prompts,
+            "events": events,
+            "prefix_chars": len(self.prefix),
+            "prefix_tokens": estimate_tokens(self.prefix),
+            "avg_prefix_chars_per_event": avg_prefix_chars,
+            "avg_event_chars": avg_event_chars,
+            "avg_event_tokens": avg_event_chars / 4,
+            "avg_prompt_chars": avg_prefix_chars + avg_event_chars,
+            "avg_prompt_tokens": (avg_prefix_chars + avg_event_chars) / 4,
+        }
+
+def create_classification_prompt(event: Dict[str, Any], green_examples: List[Dict], yellow_examples: List[Dict]) -> str:
+    """Create a prompt for the LLM to classify an event."""
+    return PromptBuilder.for_examples(green_examples, yellow_examples).build(event)
+
+def print_prompt_stats(builder: 'PromptBuilder'):
+    """Print per-event prompt sizes and how much of each prompt is the cacheable prefix."""
+    stats = builder.stats()
+    print(f"Prompt size per event: {stats['avg_prompt_chars']:.0f} chars (~{stats['avg_prompt_tokens']:.0f} tokens), "
+          f"of which {stats['avg_prefix_chars_per_event']:.0f} chars (~{stats['avg_prefix_chars_per_event'] / 4:.0f} tokens) is the shared cacheable prefix "
+          f"and {stats['avg_event_chars']:.0f} chars (~{stats['avg_event_tokens']:.0f} tokens) is event-specific")
+
+def manual_check_classification() -> Dict[str, str]:
+    """Return a classification with every field set to MANUAL CHECK."""
+    return {field: MANUAL_CHECK for field in REQUIRED_FIELDS}
+
+def get_default_backend() -> LLMBackend:
+    """Return the shared backend built from the default configuration."""
+    global DEFAULT_BACKEND
+    if DEFAULT_BACKEND is None:
+        DEFAULT_BACKEND = create_backend(load_backend_config())
+    return DEFAULT_BACKEND
+
+def extract_json_object(response_text: str) -> Optional[Dict[str, Any]]:
+    """Extract the JSON object from an LLM response, or None if there is none."""
     try:
-        # Call the LLM using subprocess
-        result = subprocess.run(
-            ['/home/codespace/.python/current/bin/llm', '-m', 'claude-4-sonnet', prompt],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        if result.returncode != 0:
-            print(f"Error calling LLM: {result.stderr}")
-            return {
-                "attack_type": "MANUAL CHECK",
-                "extremist_beliefs_classification": "MANUAL CHECK",
-                "connection_to_organized_extremist_group_classification": "MANUAL CHECK",
-                "sole_perpetrator_classification": "MANUAL CHECK",
-                "issue_type": "MANUAL CHECK",
-                "target": "MANUAL CHECK",
-                "political_violence_classification": "MANUAL CHECK"
-            }
-        
-        # Parse the JSON response
-        response_text = result.stdout.strip()
+        # Look for JSON in the response
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}') + 1
         
-        # Try to extract JSON from the response
-        try:
-            # Look for JSON in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
+        if start_idx != -1 and end_idx != 0:
+            data = json.loads(response_text[start_idx:end_idx])
+            return data if isinstance(data, dict) else None
+        else:
+            print(f"Warning: No valid JSON found in LLM response: {response_text[:200]}...")
+            return None
             
-            if start_idx != -1 and end_idx != 0:
-                json_text = response_text[start_idx:end_idx]
-                classification = json.loads(json_text)
-                
-                # Validate the response has required fields
-                required_fields = ["attack_type", "extremist_beliefs_classification", "connection_to_organized_extremist_group_classification", "sole_perpetrator_classification", "issue_type", "target", "political_violence_classification"]
-                if all(field in classification for field in required_fields):
-                    return classification
-                else:
-                    print(f"Warning: Missing required fields in LLM response")
-                    return {
-                        "attack_type": "MANUAL CHECK",
-                        "extremist_beliefs_classification": "MANUAL CHECK",
-                        "connection_to_organized_extremist_group_classification": "MANUAL CHECK",
-                        "sole_perpetrator_classification": "MANUAL CHECK",
-                        "issue_type": "MANUAL CHECK",
-                        "target": "MANUAL CHECK",
-                        "political_violence_classification": "MANUAL CHECK"
-                    }
-            else:
-                print(f"Warning: No valid JSON found in LLM response: {response_text[:200]}...")
-                return {
-                    "attack_type": "MANUAL CHECK",
-                    "extremist_beliefs_classification": "MANUAL CHECK",
-                    "connection_to_organized_extremist_group_classification": "MANUAL CHECK",
-                    "sole_perpetrator_classification": "MANUAL CHECK",
-                    "issue_type": "MANUAL CHECK",
-                    "target": "MANUAL CHECK",
-                    "political_violence_classification": "MANUAL CHECK"
-                }
-                
-        except json.JSONDecodeError as e:
-            print(f"Warning: Could not parse LLM response as JSON: {e}")
-            print(f"Response was: {response_text[:200]}...")
-            return {
-                "attack_type": "MANUAL CHECK",
-                "extremist_beliefs_classification": "MANUAL CHECK",
-                "connection_to_organized_extremist_group_classification": "MANUAL CHECK",
-                "sole_perpetrator_classification": "MANUAL CHECK",
-                "issue_type": "MANUAL CHECK",
-                "target": "MANUAL CHECK",
-                "political_violence_classification": "MANUAL CHECK"
-            }
-    
-    except subprocess.TimeoutExpired:
+    except json.JSONDecodeError as e:
+        print(f"Warning: Could not parse LLM response as JSON: {e}")
+        print(f"Response was: {response_text[:200]}...")
+        return None
+
+REPAIR_PROMPT = """You are an expert analyst classifying political violence events. An earlier answer for the event below left some fields missing or set them to values that are not allowed.
+
+Fields already classified:
+{classified}
+
+Choose a value for each of the following fields from its allowed values:
+{fields}
+{event_section}
+Respond with ONLY a JSON object containing these fields: {names}. Use "MANUAL CHECK" if you cannot confidently determine a value.
+"""
+
+def render_repair_prompt(event: Dict[str, Any], classified: Dict[str, str], fields: List[str]) -> str:
+    """Render a short follow-up prompt asking for just the given fields."""
+    sections = []
+    for field in fields:
+        section = f"\n{field.upper()} CLASSIFICATIONS:\n{json.dumps(FIELD_DEFINITIONS[field], indent=2)}\n"
+        if field == "connection_to_organized_extremist_group_classification":
+            section += 'Set this to "N/A" if extremist_beliefs_classification is "NO".\n'
+        sections.append(section)
+    return REPAIR_PROMPT.format(
+        classified=json.dumps(classified, indent=2),
+        fields="".join(sections),
+        event_section=render_event_section(event),
+        names=", ".join(fields)
+    )
+
+def repair_classification(event: Dict[str, Any], classified: Dict[str, str], fields: List[str], backend: LLMBackend) -> Dict[str, str]:
+    """Ask again for only the missing or invalid fields; any still invalid become MANUAL CHECK."""
+    metrics.increment('repair_requests')
+    prompt = render_repair_prompt(event, classified, fields)
+    repaired = {}
+    try:
+        data = extract_json_object(backend.complete(prompt).strip())
+    except Exception as e:
+        print(f"Error calling LLM for a repair request: {e}")
+        data = None
+    if data is not None:
+        for field in fields:
+            value = normalize_field_value(field, data.get(field))
+            if value is not None:
+                repaired[field] = value
+    if len(repaired) < len(fields):
+        # Don't let a cache serve the same unusable repair again.
+        backend.discard(prompt)
+    metrics.increment('repaired_fields', len(repaired))
+    metrics.increment('unrepaired_fields', len(fields) - len(repaired))
+    return {field: repaired.get(field, MANUAL_CHECK) for field in fields}
+
+def complete_classification(event: Dict[str, Any], classified: Dict[str, str], invalid: List[str], backend: LLMBackend) -> Dict[str, str]:
+    """Fill in missing or invalid fields with a repair request and return all fields in order."""
+    if invalid:
+        print(f"Warning: Requesting {', '.join(invalid)} again for an event with missing or invalid values")
+        classified = dict(classified, **repair_classification(event, classified, invalid, backend))
+    return {field: classified[field] for field in REQUIRED_FIELDS}
+
+def classify_event_with_llm(event: Dict[str, Any], green_examples: List[Dict], yellow_examples: List[Dict], backend: LLMBackend = None,
+                            builder: Optional[PromptBuilder] = None) -> Dict[str, str]:
+    """Use LLM to classify a single event, with builder's prompts if given."""
+    builder = builder or PromptBuilder.for_examples(green_examples, yellow_examples)
+    prompt = builder.build(event)
+    backend = backend or get_default_backend()
+    
+    try:
+        response_text = backend.complete(prompt, prefix_length=len(builder.prefix), schema=builder.response_schema).strip()
+        with metrics.time('parse'):
+            data = extract_json_object(response_text)
+            if data is not None:
+                if builder.compact:
+                    data = expand_compact(data)
+                classification, invalid = validate_classification(data)
+                if builder.compact and not invalid:
+                    _record_compact_sizes(response_text, classification)
+        if data is None:
+            # Don't let a cache serve the same unusable response again.
+            backend.discard(prompt)
+            metrics.increment('parse_failures')
+            metrics.increment('manual_check_fallbacks')
+            return manual_check_classification()
+        return complete_classification(event, classification, invalid, backend)
+    
+    except LLMTimeoutError:
         print("Warning: LLM call timed out")
-        return {
-            "attack_type": "MANUAL CHECK",
-            "extremist_beliefs_classification": "MANUAL CHECK",
-            "connection_to_organized_extremist_group_classification": "MANUAL CHECK",
-            "sole_perpetrator_classification": "MANUAL CHECK",
-            "issue_type": "MANUAL CHECK",
-            "target": "MANUAL CHECK",
-            "political_violence_classification": "MANUAL CHECK"
-        }
+        metrics.increment('manual_check_fallbacks')
+        return manual_check_classification()
     except Exception as e:
         print(f"Error calling LLM: {e}")
-        return {
-            "attack_type": "MANUAL CHECK",
-            "extremist_beliefs_classification": "MANUAL CHECK",
-            "connection_to_organized_extremist_group_classification": "MANUAL CHECK",
-            "sole_perpetrator_classification": "MANUAL CHECK",
-            "issue_type": "MANUAL CHECK",
-            "target": "MANUAL CHECK",
-            "political_violence_classification": "MANUAL CHECK"
-        }
+        metrics.increment('manual_check_fallbacks')
+        return manual_check_classification()
+
+def parse_batch_response(response_text: str, expected_indices: Iterable[int],
+                         partial: Optional[Dict[int, Tuple[Dict[str, str], List[str]]]] = None,
+                         compact: bool = False) -> Dict[int, Dict[str, str]]:
+    """Extract classifications keyed by event_index from a batch response, skipping incomplete entries.
+    
+    Entries with some missing or invalid fields are skipped too, or, if `partial`
+    is given, stored there as (valid fields, invalid field names). With compact,
+    entries hold codes, which are expanded to full labels first.
+    """
+    expected = set(expected_indices)
+    start_idx = response_text.find('[')
+    end_idx = response_text.rfind(']') + 1
+    if start_idx == -1 or end_idx == 0:
+        print(f"Warning: No JSON array found in batch LLM response: {response_text[:200]}...")
+        return {}
+    
+    try:
+        items = json.loads(response_text[start_idx:end_idx])
+    except json.JSONDecodeError as e:
+        print(f"Warning: Could not parse batch LLM response as JSON: {e}")
+        return {}
+    if not isinstance(items, list):
+        return {}
+    
+    results = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get('event_index'))
+        except (TypeError, ValueError):
+            continue
+        if index not in expected:
+            continue
+        # Same validation as single-event responses
+        classification, invalid = validate_classification(expand_compact(item) if compact else item)
+        if not invalid:
+            results[index] = classification
+        elif partial is not None and len(invalid) < len(REQUIRED_FIELDS):
+            partial[index] = (classification, invalid)
+    return results
+
+def _request_batch(indexed_events: List[Tuple[int, Dict[str, Any]]], builder: 'PromptBuilder', backend: LLMBackend) -> Dict[int, Dict[str, str]]:
+    """Send one batch prompt and return whichever events came back complete."""
+    prompt = builder.build_batch(indexed_events)
+    try:
+        response_text = backend.complete(prompt, prefix_length=len(builder.prefix), schema=builder.batch_schema).strip()
+    except LLMTimeoutError:
+        print(f"Warning: LLM call timed out for a batch of {len(indexed_events)} events")
+        return {}
+    except Exception as e:
+        print(f"Error calling LLM for a batch of {len(indexed_events)} events: {e}")
+        return {}
+    
+    partial = {}
+    with metrics.time('parse'):
+        results = parse_batch_response(response_text, (index for index, _ in indexed_events), partial, builder.compact)
+        if builder.compact and len(results) == len(indexed_events):
+            _record_compact_sizes(response_text, [dict(results[index], event_index=index) for index, _ in indexed_events],
+                                  len(indexed_events))
+    # Entries with a few bad fields get a short repair request rather than a full retry.
+    events = dict(indexed_events)
+    for index, (classification, invalid) in partial.items():
+        results[index] = complete_classification(events[index], classification, invalid, backend)
+    if len(results) < len(indexed_events):
+        # Don't let a cache serve the same partial response again.
+        backend.discard(prompt)
+        metrics.increment('batch_incomplete_responses')
+    return results
+
+def classify_batch(events: List[Dict[str, Any]], green_examples: List[Dict], yellow_examples: List[Dict], backend: LLMBackend = None,
+                   builder: Optional[PromptBuilder] = None) -> List[Dict[str, str]]:
+    """Classify several events with one LLM request, retrying only the events missing from the response.
+    
+    Events a response leaves out are split into halves and re-requested; a single
+    leftover event falls back to the normal one-event prompt and its MANUAL CHECK
+    handling.
+    """
+    backend = backend or get_default_backend()
+    builder = builder or PromptBuilder.for_examples(green_examples, yellow_examples)
+    results = {}
+    queue = [list(enumerate(events))]
+    while queue:
+        batch = queue.pop()
+        if len(batch) == 1:
+            index, event = batch[0]
+            results[index] = classify_event_with_llm(event, green_examples, yellow_examples, backend, builder)
+            continue
+        
+        found = _request_batch(batch, builder, backend)
+        results.update(found)
+        missing = [(index, event) for index, event in batch if index not in found]
+        if missing:
+            print(f"Warning: Batch response missing {len(missing)} of {len(batch)} events; retrying them in smaller batches")
+            half = (len(missing) + 1) // 2
+            for part in (missing[half:], missing[:half]):
+                if part:
+                    queue.append(part)
+    
+    return [results[index] for index in range(len(events))]
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of up to `size` items."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _ordered_map(func, items: Iterable[Any], workers: int) -> Iterator[Any]:
+    """Apply func to items on up to `workers` threads, yielding results in input order."""
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    
+    # Keep a bounded window of in-flight calls so results can be yielded in
+    # order without submitting the whole dataset up front.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
-def main():
+def classify_events(events: Iterable[Dict[str, Any]], green_examples: List[Dict], yellow_examples: List[Dict], workers: int = 1, backend: LLMBackend = None, batch_size: int = 1,
+                    triage: Optional[TriageRouter] = None, builder: Optional[PromptBuilder] = None) -> Iterator[Dict[str, str]]:
+    """Classify events with up to `workers` concurrent LLM calls, yielding results in input order.
+    
+    With batch_size > 1, each call classifies up to batch_size events at once.
+    With a triage router, events its local model is confident about skip the LLM.
+    Prompts come from builder, or a plain builder for the example lists if none is given.
+    """
+    builder = builder or PromptBuilder.for_examples(green_examples, yellow_examples)
+    backend = backend or get_default_backend()
+    routed = triage.route(events) if triage is not None else ((event, None) for event in events)
+    if batch_size > 1:
+        def classify_routed_batch(batch: List[Tuple[Dict[str, Any], Optional[Dict[str, str]]]]) -> List[Dict[str, str]]:
+            remaining = [event for event, local in batch if local is None]
+            results = iter(classify_batch(remaining, green_examples, yellow_examples, backend, builder) if remaining else [])
+            return [local if local is not None else next(results) for _, local in batch]
+        
+        for results in _ordered_map(classify_routed_batch, _chunked(routed, batch_size), workers):
+            yield from results
+        return
+    
+    def classify_routed(item: Tuple[Dict[str, Any], Optional[Dict[str, str]]]) -> Dict[str, str]:
+        event, local = item
+        return local if local is not None else classify_event_with_llm(event, green_examples, yellow_examples, backend, builder)
+    
+    yield from _ordered_map(classify_routed, routed, workers)
+
+RECLASSIFY_CRITERIA = ('manual-check', 'invalid')
+
+def reclassification_reason(event: Dict[str, Any], criteria: Iterable[str], filters: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Why a row of an existing output should be classified again, or None to keep it.
+    
+    Returns 'predicate' if the row matches every column=value filter, 'manual-check'
+    if a field is MANUAL CHECK, or 'invalid' if a field is missing or not an allowed
+    value, checking only the given criteria.
+    """
+    if filters and all(str(event.get(column, '')) == value for column, value in filters.items()):
+        return 'predicate'
+    if 'manual-check' in criteria and any(event.get(field) == MANUAL_CHECK for field in REQUIRED_FIELDS):
+        return 'manual-check'
+    if 'invalid' in criteria and any(normalize_field_value(field, event.get(field)) is None for field in REQUIRED_FIELDS):
+        return 'invalid'
+    return None
+
+def print_usage_report(meter: MeteredBackend, event_count: int, wall_seconds: float, input_price: float, output_price: float):
+    """Print LLM requests, estimated tokens, cost and latency per classified event."""
+    stats = meter.stats()
+    if not event_count:
+        return
+    input_tokens = stats["prompt_chars"] / 4
+    output_tokens = stats["response_chars"] / 4
+    cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    avg_latency = stats["seconds"] / stats["calls"] if stats["calls"] else 0
+    print(f"LLM usage: {stats['calls']} requests for {event_count} events ({stats['calls'] / event_count:.2f} per event), "
+          f"{stats['errors']} failed, {avg_latency:.2f}s average request latency")
+    print(f"Per event: ~{input_tokens / event_count:.0f} input tokens, ~{output_tokens / event_count:.0f} output tokens, "
+          f"~${cost / event_count:.4f} (before prompt-cache discounts), {wall_seconds / event_count:.2f}s wall time")
+    cached = stats["cache_read_tokens"] + stats["cache_write_tokens"]
+    if cached:
+        # Provider-reported counts; input_tokens excludes the cached prefix.
+        print(f"Prompt cache: {stats['cache_read_tokens']} input tokens read from cache and {stats['cache_write_tokens']} written, "
+              f"{stats['cache_read_tokens'] / (cached + stats['input_tokens']):.0%} of reported input tokens")
+
+def print_compact_report(report: Dict[str, Any]):
+    """Print output tokens of compact responses against the same answers with full labels."""
+    event_count = report["counters"].get('compact_responses', 0)
+    compact_chars = report["counters"].get('compact_response_chars', 0)
+    full_chars = report["counters"].get('full_label_response_chars', 0)
+    if not event_count or not full_chars:
+        return
+    print(f"Compact output: ~{compact_chars / 4 / event_count:.0f} output tokens per event instead of "
+          f"~{full_chars / 4 / event_count:.0f} with full labels ({1 - compact_chars / full_chars:.0%} fewer); "
+          f"run benchmark.py --compare-compact to measure the latency difference")
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Classify political violence events using an LLM.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of concurrent LLM calls (default: 1, sequential)")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Number of events to classify per LLM request (default: 1)")
+    parser.add_argument('--input-price-per-mtok', type=float, default=3.0,
+                        help="Input token price in USD per million tokens, for the cost report (default: 3.0)")
+    parser.add_argument('--output-price-per-mtok', type=float, default=15.0,
+                        help="Output token price in USD per million tokens, for the cost report (default: 15.0)")
+    parser.add_argument('--similar-examples', type=int, default=0, metavar='K',
+                        help="Give each event its K most similar labeled examples instead of the first three green/yellow rows")
+    parser.add_argument('--compact', action='store_true',
+                        help="Ask for short numeric codes instead of full labels, constrained by a JSON schema where the backend "
+                             "supports one, to cut output tokens; the output keeps the full labels")
+    parser.add_argument('--triage', default=None, metavar='MODEL',
+                        help="Classify events locally with a model trained by triage.py, sending only low-confidence ones to the LLM")
+    parser.add_argument('--triage-threshold', type=float, default=DEFAULT_TRIAGE_THRESHOLD,
+                        help="Minimum calibrated chance that all fields are right to keep a local classification "
+                             f"(default: {DEFAULT_TRIAGE_THRESHOLD})")
+    parser.add_argument('--dedup', action='store_true',
+                        help="Classify one representative per cluster of duplicate/near-duplicate events and copy its result to the rest")
+    parser.add_argument('--dedup-threshold', type=float, default=0.8,
+                        help="Minimum Jaccard similarity of notes word shingles for two events to be near duplicates (default: 0.8)")
+    parser.add_argument('--config', default=None,
+                        help="JSON file with LLM backend settings (backend, model, llm_path, api_url, timeout, max_tokens, "
+                             "requests_per_minute, tokens_per_minute, max_retries, latency_target)")
+    parser.add_argument('--backend', choices=['subprocess', 'http', 'stub'], default=None,
+                        help="LLM backend: the llm CLI per event, a pooled in-process HTTP client, or a local stub (default: $LLM_BACKEND or subprocess)")
+    parser.add_argument('--model', default=None,
+                        help="Model name passed to the backend (default: $LLM_MODEL or the backend's default)")
+    parser.add_argument('--llm-path', default=None,
+                        help="Path to the llm executable for the subprocess backend (default: $LLM_PATH or the codespace install)")
+    parser.add_argument('--requests-per-minute', type=float, default=None,
+                        help="Rate limit on LLM requests (default: unlimited)")
+    parser.add_argument('--tokens-per-minute', type=float, default=None,
+                        help="Rate limit on estimated input tokens sent to the LLM (default: unlimited)")
+    parser.add_argument('--max-retries', type=int, default=None,
+                        help="Retries with jittered exponential backoff for timeouts, 429s and overload errors (default: 4)")
+    parser.add_argument('--target-latency', type=float, default=None, metavar='SECONDS',
+                        help="Reduce concurrency when LLM calls take longer than this (default: adapt to errors only)")
+    parser.add_argument('--cache-path', default='llm_cache.sqlite',
+                        help="SQLite file caching LLM responses by (model, prompt) hash (default: llm_cache.sqlite)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Send every prompt to the model without consulting the response cache")
+    parser.add_argument('--cache-max-entries', type=int, default=None,
+                        help="Evict least recently used responses beyond this many entries")
+    parser.add_argument('--cache-max-mb', type=float, default=None,
+                        help="Evict least recently used responses beyond this many megabytes")
+    parser.add_argument('--cache-max-age-days', type=float, default=None,
+                        help="Ignore and evict cached responses older than this")
+    parser.add_argument('--input', default='us_data_filtered.csv',
+                        help="CSV of events to classify (default: us_data_filtered.csv)")
+    parser.add_argument('--output', default=None,
+                        help="Where to write the enhanced events (default: us_data_enhanced.json, or the --reclassify file)")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=None,
+                        help="Output format: json (legacy pretty array), jsonl or csv (default: from the --output extension)")
+    parser.add_argument('--run-report', default=None, metavar='PATH',
+                        help="Write a JSON report of per-stage latencies (p50/p95/p99), sizes, throughput and failure counts")
+    parser.add_argument('--prometheus', default=None, metavar='PATH',
+                        help="Also write the run metrics in Prometheus text format")
+    parser.add_argument('--sqlite', default=None, metavar='PATH',
+                        help="Also write the enhanced events to an indexed SQLite database (see results_store.py)")
+    parser.add_argument('--summary', default=None, metavar='PATH',
+                        help="Save summary counts and cross-tabs as JSON (usable as analytics.py --state)")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Append-only JSONL checkpoint written after every event (default: us_data_enhanced_checkpoint.jsonl)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip events already recorded in the checkpoint by an interrupted run")
+    parser.add_argument('--incremental', default=None, metavar='PREVIOUS',
+                        help="Diff --input against a previous enhanced output: carry forward unchanged events, classify only "
+                             "new or changed ones, and drop removed ones")
+    parser.add_argument('--shard', default=None, metavar='I/N',
+                        help="Classify only shard I of N (0 <= I < N), chosen by a stable hash of each row's content; "
+                             "default output and checkpoint names get a .shard-I-of-N suffix (merge with sharding.py)")
+    parser.add_argument('--reclassify', default=None, metavar='PATH',
+                        help="Instead of classifying --input, classify again only the selected rows of this enhanced output "
+                             "and merge them back in place (or into --output)")
+    parser.add_argument('--select', default=None,
+                        help="Rows to reclassify: comma-separated from manual-check (any MANUAL CHECK field) and invalid "
+                             "(missing or not an allowed value) (default: manual-check,invalid, or none when --where is given)")
+    parser.add_argument('--where', action='append', default=[], metavar='COLUMN=VALUE',
+                        help="Also reclassify rows where COLUMN equals VALUE (repeatable; all must match)")
+    return parser.parse_args(argv)
+
+def setup_backend(args: argparse.Namespace) -> Tuple[LLMBackend, MeteredBackend, ScheduledBackend, Optional[ResponseCache]]:
+    """Build the backend stack from the options: cache -> scheduler -> meter -> backend."""
+    backend_config = load_backend_config(args.config, {
+        "backend": args.backend,
+        "model": args.model,
+        "llm_path": args.llm_path,
+        "requests_per_minute": args.requests_per_minute,
+        "tokens_per_minute": args.tokens_per_minute,
+        "max_retries": args.max_retries,
+        "latency_target": args.target_latency,
+    })
+    meter = MeteredBackend(create_backend(backend_config))
+    # Retries and rate limits sit inside the cache so cache hits are never throttled
+    scheduler = ScheduledBackend(
+        meter,
+        requests_per_minute=backend_config["requests_per_minute"],
+        tokens_per_minute=backend_config["tokens_per_minute"],
+        max_retries=int(backend_config["max_retries"]),
+        concurrency=max(args.workers, 1),
+        latency_target=backend_config["latency_target"]
+    )
+    backend = scheduler
+    print(f"Using {backend.name} backend with model {backend.model}")
+    
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            args.cache_path,
+            max_entries=args.cache_max_entries,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb is not None else None,
+            max_age_days=args.cache_max_age_days
+        )
+        backend = CachedBackend(backend, cache)
+        print(f"Using response cache {args.cache_path} ({cache.stats()['entries']} entries)")
+    return backend, meter, scheduler, cache
+
+def setup_prompt_builder(args: argparse.Namespace, green_examples: List[Dict], yellow_examples: List[Dict]) -> 'PromptBuilder':
+    """Make the run's prompt builder, with similar-example retrieval and compact output if requested."""
+    example_index = None
+    if args.similar_examples > 0:
+        index_started = time.monotonic()
+        example_index = ExampleIndex(green_examples, yellow_examples)
+        print(f"Indexed {len(example_index)} labeled examples in {time.monotonic() - index_started:.2f}s; "
+              f"each event gets its {args.similar_examples} nearest")
+    if args.compact:
+        print("Asking for compact codes; responses are expanded to full labels")
+    return PromptBuilder(green_examples, yellow_examples, example_index, max(args.similar_examples, 1), compact=args.compact)
+
+def finish_run(args: argparse.Namespace, backend: LLMBackend, meter: MeteredBackend, scheduler: ScheduledBackend,
+               cache: Optional[ResponseCache], prompt_builder: 'PromptBuilder', event_count: int, wall_seconds: float):
+    """Print prompt, usage, cache, scheduler and stage reports, close the backend and write any metrics files."""
+    print_prompt_stats(prompt_builder)
+    print_usage_report(meter, event_count, wall_seconds, args.input_price_per_mtok, args.output_price_per_mtok)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    stats = scheduler.stats()
+    print(f"Scheduler: {stats['retries']} retries, {stats['failures']} failed calls, "
+          f"{stats['throttled_seconds']:.1f}s waiting on rate limits, final concurrency {stats['concurrency_limit']}/{max(args.workers, 1)}")
+    backend.close()
+    
+    report = metrics.report(wall_seconds, event_count)
+    print_stage_report(report)
+    if prompt_builder.compact:
+        print_compact_report(report)
+    if args.run_report:
+        metrics.write_report(args.run_report, wall_seconds, event_count)
+        print(f"Run report written to {args.run_report}")
+    if args.prometheus:
+        metrics.write_prometheus(args.prometheus)
+        print(f"Prometheus metrics written to {args.prometheus}")
+
+def reclassify(args: argparse.Namespace):
+    """Classify again only the selected rows of an existing output, merging the results back in order.
+    
+    Rows whose fields are all allowed values (after normalizing spellings) but
+    include MANUAL CHECK, and rows matching --where, get a full classification.
+    Rows with only missing or invalid fields get a repair request for just those
+    fields. Every other row is copied unchanged, apart from normalized spellings.
+    """
+    criteria = [c.strip() for c in args.select.split(',') if c.strip()] if args.select is not None else (
+        [] if args.where else list(RECLASSIFY_CRITERIA))
+    unknown = [c for c in criteria if c not in RECLASSIFY_CRITERIA]
+    if unknown:
+        sys.exit(f"Error: unknown --select criteria {', '.join(unknown)} (choose from {', '.join(RECLASSIFY_CRITERIA)})")
+    try:
+        filters = parse_filters(args.where)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    if not os.path.exists(args.reclassify):
+        print(f"Error: {args.reclassify} not found")
+        sys.exit(1)
+    input_format = infer_format(args.reclassify)
+    output = args.output or args.reclassify
+    output_format = args.output_format or infer_format(output)
+    
+    # Only the selected rows are held in memory; the rest are streamed again when merging
+    full, repairs = [], []
+    total_events = 0
+    for index, event in enumerate(iter_event_file(args.reclassify, input_format)):
+        total_events += 1
+        reason = reclassification_reason(event, criteria, filters)
+        if reason == 'invalid':
+            repairs.append((index, event))
+        elif reason is not None:
+            full.append((index, event))
+    selected = len(full) + len(repairs)
+    print(f"Selected {selected} of {total_events} events in {args.reclassify}: "
+          f"{len(full)} to classify again, {len(repairs)} with invalid fields to repair")
+    
+    backend, meter, scheduler, cache = setup_backend(args)
+    if isinstance(backend, CachedBackend):
+        # The cached answers for these events are the ones being replaced
+        backend.refresh = True
+    green_examples, yellow_examples = load_examples()
+    prompt_builder = setup_prompt_builder(args, green_examples, yellow_examples)
+    
+    started = time.monotonic()
+    results = {}
+    done = 0
+    
+    def record(index: int, classification: Dict[str, str]):
+        nonlocal done
+        done += 1
+        print(f"Reclassifying event {done}/{selected} ({done/selected*100:.1f}%)")
+        results[index] = classification
+    
+    def repair(item: Tuple[int, Dict[str, Any]]) -> Dict[str, str]:
+        classified, invalid = validate_classification(item[1])
+        return complete_classification(item[1], classified, invalid, backend)
+    
+    for (index, _), classification in zip(repairs, _ordered_map(repair, repairs, args.workers)):
+        record(index, classification)
+    classifications = classify_events((event for _, event in full), green_examples, yellow_examples,
+                                      workers=args.workers, backend=backend, batch_size=args.batch_size, builder=prompt_builder)
+    for (index, _), classification in zip(full, classifications):
+        record(index, classification)
+    
+    wall_seconds = time.monotonic() - started
+    finish_run(args, backend, meter, scheduler, cache, prompt_builder, selected, wall_seconds)
+    
+    # Merge into a temporary file next to the output, so the input can be the output
+    print(f"Saving merged results to {output} ({output_format})...")
+    temporary = output + '.tmp'
+    summary = EventSummary()
+    normalized = 0
+    store = None
+    if args.sqlite:
+        store = ResultsStore(args.sqlite)
+        store.clear()
+    with open_event_writer(temporary, output_format) as writer:
+        for index, event in enumerate(iter_event_file(args.reclassify, input_format)):
+            if index in results:
+                event.update(results[index])
+                # Outputs of triage runs record the source; it is the LLM's now
+                if SOURCE_COLUMN in event:
+                    event[SOURCE_COLUMN] = LLM_SOURCE
+            else:
+                classified, invalid = validate_classification(event)
+                if not invalid and any(event.get(field) != classified[field] for field in REQUIRED_FIELDS):
+                    event.update(classified)
+                    normalized += 1
+            writer.write(event)
+            if store is not None:
+                store.add(event, index)
+            summary.update(event)
+    os.replace(temporary, output)
+    if store is not None:
+        store.close()
+        print(f"Results database written to {args.sqlite}")
+    
+    still_manual = sum(1 for result in results.values() if MANUAL_CHECK in result.values())
+    print(f"Reclassification complete! {selected - still_manual} of {selected} selected events now have no MANUAL CHECK fields"
+          f" ({still_manual} still need a manual check); {normalized} other events had values respelled.")
+    if args.summary:
+        save_summary(summary, args.summary)
+        print(f"Summary counts and cross-tabs written to {args.summary}")
+    print_summary(summary)
+
+def main(argv: List[str] = None):
     """Main function to process all events."""
+    args = parse_args(argv)
+    metrics.reset()
+    if args.reclassify:
+        reclassify(args)
+        return
+    
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+    args.output = args.output or (shard_path('us_data_enhanced.json', *shard) if shard else 'us_data_enhanced.json')
+    args.checkpoint = args.checkpoint or (shard_path('us_data_enhanced_checkpoint.jsonl', *shard) if shard
+                                          else 'us_data_enhanced_checkpoint.jsonl')
+    backend, meter, scheduler, cache = setup_backend(args)
+    
     print("Loading data...")
     
-    # Load the main dataset
+    def input_rows(timed: bool = False) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        """Rows of the input (or of this shard) with their input index and content hash."""
+        rows = iter_csv_rows(args.input)
+        for index, event in enumerate(metrics.timed_iter('csv_load', rows) if timed else rows):
+            source_hash = event_fingerprint(event)
+            if shard is None or shard_of(source_hash, shard[1]) == shard[0]:
+                yield index, source_hash, event
+    
+    # Count the main dataset; rows are streamed from disk as they are classified
     try:
-        events = load_csv_data('us_data_filtered.csv')
-        print(f"Loaded {len(events)} events from us_data_filtered.csv")
+        if shard:
+            total_events = sum(1 for _ in input_rows())
+            print(f"Found {total_events} events for shard {shard[0]}/{shard[1]} in {args.input}")
+        else:
+            total_events = count_csv_rows(args.input)
+            print(f"Found {total_events} events in {args.input}")
     except FileNotFoundError:
-        print("Error: us_data_filtered.csv not found")
+        print(f"Error: {args.input} not found")
         sys.exit(1)
     
     # Load example data
     green_examples, yellow_examples = load_examples()
+    prompt_builder = setup_prompt_builder(args, green_examples, yellow_examples)
+    print(f"Rendered shared prompt prefix once: {len(prompt_builder.prefix)} chars (~{estimate_tokens(prompt_builder.prefix)} tokens)")
     
-    # Process each event
-    enhanced_events = []
-    total_events = len(events)
+    # Skip events already recorded in the checkpoint when resuming
+    completed = load_completed(args.checkpoint) if args.resume else {}
     
-    print(f"Processing {total_events} events...")
+    def pending_rows() -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        for index, source_hash, event in input_rows(timed=True):
+            if completed.get(index) != source_hash:
+                yield index, source_hash, event
     
-    for i, event in enumerate(events, 1):
-        print(f"Processing event {i}/{total_events} ({i/total_events*100:.1f}%)")
-        
-        # Get classification from LLM
-        classification = classify_event_with_llm(event, green_examples, yellow_examples)
-        
-        # Create enhanced event with original data plus new classifications
-        enhanced_event = event.copy()
-        enhanced_event.update(classification)
-        
-        enhanced_events.append(enhanced_event)
-        
-        # Save intermediate results every 50 events
-        if i % 50 == 0:
-            print(f"Saving intermediate results after {i} events...")
-            with open('us_data_enhanced_temp.json', 'w', encoding='utf-8') as f:
-                json.dump(enhanced_events, f, indent=2, ensure_ascii=False)
+    pending_count = total_events
+    if args.resume:
+        pending_count = sum(1 for _ in pending_rows())
+        print(f"Resuming from {args.checkpoint}: {total_events - pending_count} events already classified")
+    elif os.path.exists(args.checkpoint):
+        print(f"Starting a fresh checkpoint (pass --resume to continue from {args.checkpoint})")
+    
+    # Only cluster representatives go to the LLM; duplicates copy their result
+    clusters = None
+    representative_results = {}
+    if args.dedup:
+        clusters = find_duplicate_clusters((event for _, _, event in input_rows()), args.dedup_threshold)
+        sizes = cluster_sizes(clusters)
+        if shard:
+            # Clusters are found within the shard; map their positions back to input indices
+            indices = [index for index, _, _ in input_rows()]
+            clusters = {indices[position]: indices[representative] for position, representative in enumerate(clusters)}
+            sizes = {indices[representative]: size for representative, size in sizes.items()}
+        print(f"Deduplication: {len(sizes)} distinct incidents among {total_events} events "
+              f"({total_events - len(sizes)} duplicates will copy their representative's classification)")
+        # Representatives finished by an earlier run are read back from the checkpoint
+        for record in iter_checkpoint(args.checkpoint) if args.resume else []:
+            index = record["index"]
+            if sizes.get(index, 0) > 1 and completed.get(index) == record["hash"]:
+                representative_results[index] = {field: record["event"].get(field) for field in REQUIRED_FIELDS}
+                if SOURCE_COLUMN in record["event"]:
+                    representative_results[index][SOURCE_COLUMN] = record["event"][SOURCE_COLUMN]
+    
+    triage = None
+    if args.triage:
+        triage = TriageRouter(TriageModel.load(args.triage), args.triage_threshold)
+        print(f"Triage: events with confidence >= {args.triage_threshold} are classified locally by {args.triage}")
     
-    # Save final results
-    print("Saving final results to us_data_enhanced.json...")
-    with open('us_data_enhanced.json', 'w', encoding='utf-8') as f:
-        json.dump(enhanced_events, f, indent=2, ensure_ascii=False)
+    previous = None
+    if args.incremental:
+        try:
+            previous = PreviousResults(args.incremental)
+        except FileNotFoundError:
+            print(f"Error: {args.incremental} not found")
+            sys.exit(1)
+        print(f"Incremental: comparing with {previous.total} previously classified events in {args.incremental}")
+    
+    def is_representative(index: int) -> bool:
+        return clusters is None or clusters[index] == index
+    
+    print(f"Processing {pending_count} events with {max(args.workers, 1)} worker(s), {max(args.batch_size, 1)} event(s) per request...")
+    started = time.monotonic()
     
-    # Clean up temporary file
-    if os.path.exists('us_data_enhanced_temp.json'):
-        os.remove('us_data_enhanced_temp.json')
+    # Rows read ahead for the classifier wait here until their results are written,
+    # so only the in-flight window is held in memory.
+    queued = deque()
+    
+    def representatives() -> Iterator[Dict[str, Any]]:
+        for index, source_hash, event in pending_rows():
+            # Events unchanged since the previous output keep its classification
+            carried = previous.match(event)[1] if previous is not None else None
+            queued.append((index, source_hash, event, carried))
+            if carried is None and is_representative(index):
+                yield event
+    
+    def write_queued(checkpoint: CheckpointWriter, classification: Optional[Dict[str, str]]):
+        """Write queued duplicates and carried-forward events up to and including the next representative (or all, if None)."""
+        nonlocal done
+        while queued:
+            index, source_hash, event, carried = queued.popleft()
+            done += 1
+            print(f"Processing event {done}/{total_events} ({done/total_events*100:.1f}%)")
+            
+            representative = carried is None and is_representative(index)
+            if carried is not None:
+                if clusters is not None and clusters[index] == index and sizes[index] > 1:
+                    representative_results[index] = carried
+                result = carried
+            elif representative:
+                if clusters is not None and sizes[index] > 1:
+                    representative_results[index] = classification
+                result = classification
+            else:
+                result = representative_results[clusters[index]]
+            
+            # Create enhanced event with original data plus new classifications
+            enhanced_event = event.copy()
+            enhanced_event.update(result)
+            # Only triage runs record where each classification came from, so
+            # default runs keep the output columns unchanged.
+            if triage is not None:
+                enhanced_event[SOURCE_COLUMN] = result.get(SOURCE_COLUMN) or LLM_SOURCE
+            if clusters is not None:
+                enhanced_event["duplicate_cluster_id"] = clusters[index]
+                enhanced_event["duplicate_cluster_size"] = sizes[clusters[index]]
+            if shard:
+                enhanced_event[SOURCE_ROW] = index
+            
+            with metrics.time('checkpoint_write'):
+                checkpoint.write(index, source_hash, enhanced_event)
+            if representative:
+                return
+    
+    done = total_events - pending_count
+    classifications = classify_events(representatives(), green_examples, yellow_examples, workers=args.workers, backend=backend,
+                                      batch_size=args.batch_size, triage=triage, builder=prompt_builder)
+    with CheckpointWriter(args.checkpoint, resume=args.resume) as checkpoint:
+        for classification in classifications:
+            write_queued(checkpoint, classification)
+        # Duplicates after the last representative
+        write_queued(checkpoint, None)
+    
+    wall_seconds = time.monotonic() - started
+    if previous is not None:
+        counts = previous.counts
+        removed = "" if args.resume else f", {previous.removed} removed"
+        print(f"Incremental: {counts['unchanged']} unchanged events carried forward, {counts['changed']} changed, "
+              f"{counts['new']} new{removed}")
+        pending_count -= counts['unchanged']
+    if triage is not None:
+        print(f"Triage: {triage.local} of {triage.local + triage.routed} events classified locally, "
+              f"{triage.saved_fraction():.1%} of per-event LLM calls saved")
+    finish_run(args, backend, meter, scheduler, cache, prompt_builder, pending_count, wall_seconds)
+    
+    # Stream the final results from the checkpoint, summarizing classifications as they are written
+    output_format = args.output_format or infer_format(args.output)
+    print(f"Saving final results to {args.output} ({output_format})...")
+    summary = EventSummary()
+    
+    store = None
+    if args.sqlite:
+        store = ResultsStore(args.sqlite)
+        store.clear()
+    with open_event_writer(args.output, output_format) as writer:
+        for row_id, event in enumerate(iter_checkpoint_events(args.checkpoint)):
+            writer.write(event)
+            if store is not None:
+                store.add(event, row_id)
+            summary.update(event)
+    
+    if store is not None:
+        store.close()
+        print(f"Results database written to {args.sqlite}")
+    
+    # Clean up the checkpoint now that the output is complete
+    os.remove(args.checkpoint)
     
     print(f"Classification complete! Processed {total_events} events.")
     
-    # Print summary statistics
-    attack_types = {}
-    extremist_beliefs = {}
-    organized_groups = {}
-    sole_perpetrators = {}
-    issue_types = {}
-    targets = {}
-    political_violence = {}
-    
-    for event in enhanced_events:
-        attack_type = event.get('attack_type', 'UNKNOWN')
-        extremist = event.get('extremist_beliefs_classification', 'UNKNOWN')
-        organized = event.get('connection_to_organized_extremist_group_classification', 'UNKNOWN')
-        sole_perp = event.get('sole_perpetrator_classification', 'UNKNOWN')
-        issue = event.get('issue_type', 'UNKNOWN')
-        target = event.get('target', 'UNKNOWN')
-        pol_violence = event.get('political_violence_classification', 'UNKNOWN')
-        
-        attack_types[attack_type] = attack_types.get(attack_type, 0) + 1
-        extremist_beliefs[extremist] = extremist_beliefs.get(extremist, 0) + 1
-        organized_groups[organized] = organized_groups.get(organized, 0) + 1
-        sole_perpetrators[sole_perp] = sole_perpetrators.get(sole_perp, 0) + 1
-        issue_types[issue] = issue_types.get(issue, 0) + 1
-        targets[target] = targets.get(target, 0) + 1
-        political_violence[pol_violence] = political_violence.get(pol_violence, 0) + 1
-    
-    print("\nSUMMARY STATISTICS:")
-    print("Attack Types:")
-    for attack_type, count in sorted(attack_types.items()):
-        print(f"  {attack_type}: {count}")
-    
-    print("Extremist Beliefs:")
-    for belief, count in sorted(extremist_beliefs.items()):
-        print(f"  {belief}: {count}")
-    
-    print("Organized Group Connection:")
-    for connection, count in sorted(organized_groups.items()):
-        print(f"  {connection}: {count}")
-    
-    print("Sole Perpetrator:")
-    for sole_perp, count in sorted(sole_perpetrators.items()):
-        print(f"  {sole_perp}: {count}")
-    
-    print("Issue Types:")
-    for issue, count in sorted(issue_types.items()):
-        print(f"  {issue}: {count}")
-    
-    print("Targets:")
-    for target, count in sorted(targets.items()):
-        print(f"  {target}: {count}")
-    
-    print("Political Violence Classification:")
-    for pol_violence, count in sorted(political_violence.items()):
-        print(f"  {pol_violence}: {count}")
+    if args.summary:
+        save_summary(summary, args.summary)
+        print(f"Summary counts and cross-tabs written to {args.summary}")
+    
+    print_summary(summary)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Exact and near-duplicate detection for event rows.
+
+Rows are grouped first by a hash of their normalized notes text, then near
+duplicates are found with MinHash signatures over word shingles and
+locality-sensitive hashing, and confirmed with an exact Jaccard similarity
+threshold. Only rows with the same event type, date and location are merged,
+and rows with empty notes are never merged. Each cluster is identified by the
+input index of its first row, its representative.
+
+Events are streamed and no text is kept: each distinct row holds its LSH
+bucket entries and its shingle hashes, which the exact Jaccard check needs.
+Those are four bytes per distinct shingle, about one per word of notes, so
+memory grows with the number of distinct rows and with the length of their
+notes, but stays well below the size of the text itself.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+SHINGLE_SIZE = 3
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+
+_rng = np.random.default_rng(20240611)
+_HASH_A = _rng.integers(1, 2 ** 32, NUM_HASHES, dtype=np.uint64) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2 ** 32, NUM_HASHES, dtype=np.uint64)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+# Rows are only compared with rows that agree on all of these columns.
+INCIDENT_COLUMNS = ('event_type', 'event_date', 'city', 'state')
+
+
+def normalize_text(text: str) -> str:
+    """Upper-case, strip punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.upper()).split())
+
+
+def shingles(normalized: str) -> Set[str]:
+    """Word shingles of a normalized text (the text itself if it is shorter than one shingle)."""
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {normalized}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def shingle_hashes(normalized: str) -> np.ndarray:
+    """Sorted, distinct 32-bit hashes of a normalized text's shingles."""
+    shingle_set = shingles(normalized)
+    return np.unique(np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingle_set), dtype=np.uint32, count=len(shingle_set)))
+
+
+def minhash(hashes: np.ndarray) -> np.ndarray:
+    """MinHash signature of a set of shingle hashes."""
+    hashes = hashes.astype(np.uint64)
+    return ((hashes[:, None] * _HASH_A[None, :] + _HASH_B[None, :]) & _MASK32).min(axis=0)
+
+
+def incident_key(event: Dict[str, Any]) -> Tuple[str, ...]:
+    """The event type, date and location an event must share with its duplicates."""
+    return tuple(str(event.get(column) or '').strip().upper() for column in INCIDENT_COLUMNS)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity of two sorted, distinct hash arrays."""
+    if not a.size and not b.size:
+        return 1.0
+    shared = np.intersect1d(a, b, assume_unique=True).size
+    return shared / (a.size + b.size - shared)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the lowest index as the root so it becomes the representative.
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def find_duplicate_clusters(events: Iterable[Dict[str, Any]], threshold: float = 0.8) -> List[int]:
+    """Return, for each event, the index of its cluster's representative (itself if unique)."""
+    # Exact duplicates after normalization are matched by hash. The first of each
+    # goes into the LSH buckets for the near-duplicate pass, keeping only its
+    # shingle hashes, so events can be streamed without holding their text.
+    first_seen = {}
+    exact_duplicates = []
+    shingle_sets = {}
+    buckets = defaultdict(list)
+    count = 0
+    for index, event in enumerate(events):
+        count += 1
+        text = normalize_text(event.get('notes') or '')
+        if not text:
+            # Nothing to compare; an empty note says nothing about which incident this is.
+            continue
+        incident = "\0".join(incident_key(event))
+        key = hashlib.sha256(f"{incident}\0{text}".encode('utf-8')).digest()
+        if key in first_seen:
+            exact_duplicates.append((first_seen[key], index))
+            continue
+        first_seen[key] = index
+        shingle_sets[index] = shingle_hashes(text)
+        signature = minhash(shingle_sets[index])
+        incident_hash = hashlib.sha256(incident.encode('utf-8')).digest()[:16]
+        for band in range(BANDS):
+            band_key = (incident_hash, band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes())
+            buckets[band_key].append(index)
+
+    union_find = _UnionFind(count)
+    for first, duplicate in exact_duplicates:
+        union_find.union(first, duplicate)
+
+    checked = set()
+    for members in buckets.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                if jaccard(shingle_sets[a], shingle_sets[b]) >= threshold:
+                    union_find.union(a, b)
+
+    return [union_find.find(index) for index in range(count)]
+
+
+def cluster_sizes(clusters: List[int]) -> Dict[int, int]:
+    """Count the members of each cluster, keyed by representative index."""
+    sizes = defaultdict(int)
+    for representative in clusters:
+        sizes[representative] += 1
+    return dict(sizes)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Streaming readers and writers for event files.
+
+Input CSVs are read row by row, and enhanced events are written one at a time as
+JSONL, CSV or the legacy pretty-printed JSON array, so memory use does not grow
+with the size of the dataset. The readers accept any of the three output
+formats, including large JSON arrays, which are decoded incrementally.
+"""
+
+import csv
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+OUTPUT_FORMATS = ('json', 'jsonl', 'csv')
+
+# Read JSON arrays in chunks of this many characters.
+READ_CHUNK_SIZE = 1 << 16
+
+
+def iter_csv_rows(filename: str) -> Iterator[Dict[str, Any]]:
+    """Yield rows of a CSV file as dictionaries."""
+    with open(filename, 'r', encoding='utf-8', newline='') as file:
+        yield from csv.DictReader(file)
+
+
+def count_csv_rows(filename: str) -> int:
+    """Count data rows in a CSV file without keeping them."""
+    return sum(1 for _ in iter_csv_rows(filename))
+
+
+def infer_format(path: str, default: str = 'json') -> str:
+    """Guess an event file's format from its extension."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in OUTPUT_FORMATS else default
+
+
+def _iter_json_array(path: str) -> Iterator[Dict[str, Any]]:
+    """Decode the elements of a top-level JSON array one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} does not contain a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+def iter_event_file(path: str, file_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield events from a JSON array, JSONL or CSV file without loading it whole."""
+    file_format = file_format or infer_format(path)
+    if file_format == 'csv':
+        yield from iter_csv_rows(path)
+    elif file_format == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from _iter_json_array(path)
+
+
+class EventWriter:
+    """Base class for streaming event writers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+
+    def write(self, event: Dict[str, Any]):
+        self._write(event)
+        self.count += 1
+
+    def _write(self, event: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonArrayWriter(EventWriter):
+    """Writes the legacy pretty-printed array, byte-identical to json.dump(indent=2)."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file.write('[')
+
+    def _write(self, event: Dict[str, Any]):
+        text = json.dumps(event, indent=2, ensure_ascii=False)
+        self._file.write(',\n  ' if self.count else '\n  ')
+        self._file.write(text.replace('\n', '\n  '))
+
+    def close(self):
+        self._file.write('\n]' if self.count else ']')
+        super().close()
+
+
+class JsonlWriter(EventWriter):
+    """Writes one compact JSON object per line."""
+
+    def _write(self, event: Dict[str, Any]):
+        self._file.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+class CsvWriter(EventWriter):
+    """Writes CSV with the columns of the first event."""
+
+    def __init__(self, path: str, fieldnames: Optional[List[str]] = None):
+        super().__init__(path)
+        self._fieldnames = fieldnames
+        self._writer = None
+
+    def _write(self, event: Dict[str, Any]):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=self._fieldnames or list(event), extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow(event)
+
+
+WRITERS = {
+    'json': JsonArrayWriter,
+    'jsonl': JsonlWriter,
+    'csv': CsvWriter,
+}
+
+
+def open_event_writer(path: str, file_format: Optional[str] = None) -> EventWriter:
+    """Open a streaming writer for path in the given (or inferred) format."""
+    file_format = file_format or infer_format(path)
+    if file_format not in WRITERS:
+        raise ValueError(f"Unknown output format '{file_format}' (choose from {', '.join(OUTPUT_FORMATS)})")
+    return WRITERS[file_format](path)
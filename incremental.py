@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Incremental ingestion: diff a fresh export against the previous enhanced output.
+
+Events are matched by a stable identity (date, actors, location and a hash of
+the notes). A matched event whose prompt text is unchanged keeps its previous
+classification; a changed or new event is classified again; previous events
+missing from the new export are dropped. A daily refresh then costs only as
+many LLM calls as the delta.
+
+    python classification_script.py --input new_export.csv --incremental us_data_enhanced.json
+"""
+
+import hashlib
+import json
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from event_io import iter_event_file
+from results_store import CLASSIFICATION_FIELDS, SOURCE_COLUMN
+
+IDENTITY_COLUMNS = ('event_date', 'actor1', 'assoc_actor_1', 'actor2', 'assoc_actor_2', 'city', 'state')
+
+# Source columns rendered into the classification prompt (see render_event_section).
+PROMPT_COLUMNS = ('notes', 'tags', 'assoc_actor_1', 'actor1', 'event_type', 'sub_event_type')
+
+UNCHANGED, CHANGED, NEW = 'unchanged', 'changed', 'new'
+
+
+def _digest(values) -> bytes:
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode('utf-8')).digest()
+
+
+def _text(event: Dict[str, Any], column: str) -> str:
+    value = event.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def event_identity(event: Dict[str, Any]) -> bytes:
+    """Stable identity of an event: its date, actors, location and a hash of its notes."""
+    notes_hash = hashlib.sha256(_text(event, 'notes').encode('utf-8')).hexdigest()
+    return _digest([_text(event, column) for column in IDENTITY_COLUMNS] + [notes_hash])
+
+
+def prompt_hash(event: Dict[str, Any]) -> bytes:
+    """Hash of the source text the classifier sees; other column edits don't need a new classification."""
+    return _digest([_text(event, column) for column in PROMPT_COLUMNS])
+
+
+class PreviousResults:
+    """Classifications from a previous enhanced output, looked up by event identity.
+
+    Each previous event can be matched once; events with the same identity are
+    matched in file order.
+    """
+
+    def __init__(self, path: str, file_format: Optional[str] = None):
+        self.path = path
+        self._results = {}
+        self.total = 0
+        for event in iter_event_file(path, file_format):
+            self.total += 1
+            classification = {field: event[field] for field in CLASSIFICATION_FIELDS if field in event}
+            if SOURCE_COLUMN in event:
+                classification[SOURCE_COLUMN] = event[SOURCE_COLUMN]
+            self._results.setdefault(event_identity(event), deque()).append((prompt_hash(event), classification))
+        self.matched = 0
+        self.counts = {UNCHANGED: 0, CHANGED: 0, NEW: 0}
+
+    def match(self, event: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, str]]]:
+        """Diff one new event: (UNCHANGED, previous classification), (CHANGED, None) or (NEW, None).
+
+        A previous classification includes its classification_source, if recorded.
+        """
+        identity = event_identity(event)
+        previous = self._results.get(identity)
+        if not previous:
+            status, classification = NEW, None
+        else:
+            previous_hash, classification = previous.popleft()
+            if not previous:
+                del self._results[identity]
+            self.matched += 1
+            complete = all(field in classification for field in CLASSIFICATION_FIELDS)
+            status = UNCHANGED if previous_hash == prompt_hash(event) and complete else CHANGED
+            if status == CHANGED:
+                classification = None
+        self.counts[status] += 1
+        return status, classification
+
+    @property
+    def removed(self) -> int:
+        """Previous events not matched by any new event so far."""
+        return self.total - self.matched
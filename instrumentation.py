@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing, size and failure counters for classification runs.
+
+Pipeline code records into the module-level `metrics` registry: stage timings
+(CSV load, prompt build, backend call, response parsing, checkpoint writes),
+prompt and response sizes, and counters such as retries and MANUAL CHECK
+fallbacks. At the end of a run the registry is summarized as a JSON report with
+p50/p95/p99 latencies, histograms and throughput, or as Prometheus text.
+"""
+
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+# Histogram bucket upper bounds for timings (seconds) and sizes (characters).
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(2 ** power for power in range(6, 21))
+
+PERCENTILES = (50, 95, 99)
+
+# Counters always present in reports, so a clean run shows zero failures.
+REPORTED_COUNTERS = ('backend_errors', 'retries', 'failed_calls', 'parse_failures',
+                     'manual_check_fallbacks', 'batch_incomplete_responses', 'cache_hits',
+                     'normalized_values', 'repair_requests', 'unrepaired_fields')
+
+
+def _write_atomically(path: str, text: str):
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+class RunMetrics:
+    """Thread-safe registry of stage timings, size samples and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far, e.g. at the start of a run."""
+        with self._lock:
+            self.timings = {}
+            self.sizes = {}
+            self.counters = {}
+
+    def observe(self, stage: str, seconds: float):
+        """Record one timing sample for a stage."""
+        with self._lock:
+            self.timings.setdefault(stage, array('d')).append(seconds)
+
+    def observe_size(self, name: str, size: int):
+        """Record one size sample, e.g. prompt characters."""
+        with self._lock:
+            self.sizes.setdefault(name, array('d')).append(size)
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time the body of a with-block as one sample of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed_iter(self, stage: str, items: Iterable) -> Iterator:
+        """Yield from items, timing each step of the underlying iterator as `stage`."""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    @staticmethod
+    def _summarize(samples: array, buckets) -> Dict[str, Any]:
+        values = np.frombuffer(samples, dtype=np.float64) if len(samples) else np.zeros(0)
+        summary = {"count": int(len(values)), "sum": float(values.sum())}
+        if len(values):
+            for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                summary[f"p{percentile}"] = float(value)
+            summary["max"] = float(values.max())
+            # Cumulative counts per upper bound, as in a Prometheus histogram.
+            cumulative = np.searchsorted(np.sort(values), buckets, side='right')
+            summary["histogram"] = {str(bound): int(count) for bound, count in zip(buckets, cumulative)}
+            summary["histogram"]["+Inf"] = int(len(values))
+        return summary
+
+    def report(self, wall_seconds: Optional[float] = None, events: Optional[int] = None) -> Dict[str, Any]:
+        """Summarize everything recorded as a JSON-serializable dict."""
+        with self._lock:
+            timings = {stage: array('d', samples) for stage, samples in self.timings.items()}
+            sizes = {name: array('d', samples) for name, samples in self.sizes.items()}
+            counters = dict.fromkeys(REPORTED_COUNTERS, 0)
+            counters.update(self.counters)
+
+        report = {
+            "stages": {stage: self._summarize(samples, TIME_BUCKETS) for stage, samples in sorted(timings.items())},
+            "sizes": {name: self._summarize(samples, SIZE_BUCKETS) for name, samples in sorted(sizes.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+        if wall_seconds is not None:
+            throughput = {"wall_seconds": wall_seconds}
+            if events is not None:
+                throughput["events"] = events
+                throughput["events_per_second"] = events / wall_seconds if wall_seconds > 0 else None
+            calls = report["stages"].get("backend_call", {}).get("count", 0)
+            throughput["backend_calls_per_second"] = calls / wall_seconds if wall_seconds > 0 else None
+            report["throughput"] = throughput
+        return report
+
+    def write_report(self, path: str, wall_seconds: Optional[float] = None, events: Optional[int] = None) -> Dict[str, Any]:
+        """Write the JSON report to path and return it."""
+        report = self.report(wall_seconds, events)
+        _write_atomically(path, json.dumps(report, indent=2) + '\n')
+        return report
+
+    def prometheus_text(self, prefix: str = 'classification') -> str:
+        """Render the recorded metrics in the Prometheus text exposition format."""
+        report = self.report()
+        lines = []
+
+        def histogram(name: str, label: Optional[str], summary: Dict[str, Any], help_text: str, first: bool):
+            if first:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+            labels = f'{label},' if label else ''
+            for bound, count in summary.get("histogram", {"+Inf": 0}).items():
+                lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {count}')
+            suffix = f"{{{label}}}" if label else ''
+            lines.append(f"{name}_sum{suffix} {summary['sum']}")
+            lines.append(f"{name}_count{suffix} {summary['count']}")
+
+        for i, (stage, summary) in enumerate(report["stages"].items()):
+            histogram(f"{prefix}_stage_seconds", f'stage="{stage}"', summary, "Time spent per pipeline stage call.", i == 0)
+        for name, summary in report["sizes"].items():
+            histogram(f"{prefix}_{name}", None, summary, f"Distribution of {name.replace('_', ' ')}.", True)
+        for name, value in report["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = 'classification'):
+        _write_atomically(path, self.prometheus_text(prefix))
+
+
+def print_stage_report(report: Dict[str, Any]):
+    """Print one line per stage with call count, total time and p50/p95/p99 latency."""
+    print("Stage timings:")
+    for stage, summary in report["stages"].items():
+        if not summary["count"]:
+            continue
+        print(f"  {stage}: {summary['count']} calls, {summary['sum']:.2f}s total, "
+              f"p50 {summary['p50'] * 1000:.2f}ms, p95 {summary['p95'] * 1000:.2f}ms, p99 {summary['p99'] * 1000:.2f}ms")
+
+
+# Registry shared by the pipeline modules.
+metrics = RunMetrics()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Pluggable LLM backends used by the classification script.
+
+Backends are chosen by configuration (a JSON config file, environment variables
+or command line flags) rather than hard-coded:
+
+- "subprocess": runs the `llm` CLI once per prompt (the original behaviour)
+- "http": persistent in-process client for the Anthropic Messages API that
+  keeps one keep-alive connection open per worker thread
+- "stub": the HTTP backend pointed at a local stub server (see llm_stub.py),
+  for tests and offline runs
+"""
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from instrumentation import metrics
+
+DEFAULT_CONFIG = {
+    "backend": "subprocess",
+    "model": None,
+    "llm_path": "/home/codespace/.python/current/bin/llm",
+    "api_url": "https://api.anthropic.com",
+    "api_key_env": "ANTHROPIC_API_KEY",
+    "timeout": 60,
+    "max_tokens": 1024,
+    # Scheduling (see scheduler.py); None disables a limit.
+    "requests_per_minute": None,
+    "tokens_per_minute": None,
+    "max_retries": 4,
+    "latency_target": None,
+}
+
+# Environment variables that override the defaults above.
+ENV_OVERRIDES = {
+    "backend": "LLM_BACKEND",
+    "model": "LLM_MODEL",
+    "llm_path": "LLM_PATH",
+    "api_url": "LLM_API_URL",
+}
+
+# Tool the HTTP backend forces the model to call when a response schema is given.
+SCHEMA_TOOL_NAME = "record_classification"
+
+# Token counts in a Messages API response's "usage", by the names stats() reports them under.
+# Uncached input tokens, output tokens, and prompt-cache writes and reads.
+USAGE_FIELDS = {
+    "input_tokens": "input_tokens",
+    "output_tokens": "output_tokens",
+    "cache_creation_input_tokens": "cache_write_tokens",
+    "cache_read_input_tokens": "cache_read_tokens",
+}
+
+
+class LLMError(Exception):
+    """Raised when a backend fails to produce a response."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a backend call times out."""
+
+
+class LLMBackend:
+    """Base class for LLM backends."""
+
+    name = "base"
+    default_model = None
+
+    def __init__(self, model: Optional[str] = None, timeout: float = 60):
+        self.model = model or self.default_model
+        self.timeout = timeout
+
+    def complete(self, prompt: str, prefix_length: int = 0, schema: Optional[Dict[str, Any]] = None) -> str:
+        """Send a prompt and return the raw response text.
+        
+        `prefix_length` is how many leading characters of the prompt are shared by
+        every call; backends that support provider-side prompt caching mark them
+        as cacheable. `schema` is a JSON schema the response should follow;
+        backends with structured output constrain the response to it and return
+        the JSON object as text, others rely on the prompt alone.
+        """
+        raise NotImplementedError
+
+    def discard(self, prompt: str):
+        """Forget any stored response for prompt, e.g. because it failed to parse."""
+
+    def token_usage(self) -> Dict[str, int]:
+        """Token counts reported by the provider so far, zero where it reports none."""
+        return dict.fromkeys(USAGE_FIELDS.values(), 0)
+
+    def close(self):
+        """Release any resources held by the backend."""
+
+
+class SubprocessBackend(LLMBackend):
+    """Runs the `llm` CLI in a fresh process for every prompt."""
+
+    name = "subprocess"
+    default_model = "claude-4-sonnet"
+
+    def __init__(self, model: Optional[str] = None, timeout: float = 60, llm_path: str = DEFAULT_CONFIG["llm_path"]):
+        super().__init__(model, timeout)
+        self.llm_path = llm_path
+
+    def complete(self, prompt: str, prefix_length: int = 0, schema: Optional[Dict[str, Any]] = None) -> str:
+        command = [self.llm_path, '-m', self.model]
+        if schema is not None:
+            command += ['--schema', json.dumps(schema)]
+        try:
+            result = subprocess.run(
+                command + [prompt],
+                capture_output=True,
+                text=True,
+                timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise LLMTimeoutError(f"llm timed out after {self.timeout}s")
+
+        if result.returncode != 0:
+            raise LLMError(result.stderr.strip() or f"llm exited with status {result.returncode}")
+        return result.stdout
+
+
+class HTTPBackend(LLMBackend):
+    """In-process Anthropic Messages API client with per-thread keep-alive connections."""
+
+    name = "http"
+    default_model = "claude-sonnet-4-0"
+
+    def __init__(self, model: Optional[str] = None, timeout: float = 60, api_url: str = DEFAULT_CONFIG["api_url"],
+                 api_key: Optional[str] = None, max_tokens: int = 1024):
+        super().__init__(model, timeout)
+        parts = urlsplit(api_url)
+        self.scheme = parts.scheme or "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip('/')
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self._local = threading.local()
+        self._connections = []
+        self._usage = dict.fromkeys(USAGE_FIELDS.values(), 0)
+        self._lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = conn_class(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        """Close this thread's connection so the next request reconnects."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+    def _post(self, body: bytes) -> http.client.HTTPResponse:
+        headers = {
+            "content-type": "application/json",
+            "anthropic-version": "2023-06-01",
+        }
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+
+        # A keep-alive connection may have been closed by the server while idle;
+        # retry once on a fresh connection before giving up.
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", f"{self.path_prefix}/v1/messages", body=body, headers=headers)
+                return conn.getresponse()
+            except (socket.timeout, TimeoutError):
+                self._drop_connection()
+                raise LLMTimeoutError(f"request timed out after {self.timeout}s")
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest) as e:
+                self._drop_connection()
+                if attempt == 1:
+                    raise LLMError(f"connection failed: {e}")
+            except OSError as e:
+                self._drop_connection()
+                raise LLMError(f"connection failed: {e}")
+
+    def complete(self, prompt: str, prefix_length: int = 0, schema: Optional[Dict[str, Any]] = None) -> str:
+        content = prompt
+        if prefix_length > 0:
+            # Mark the shared prefix for Anthropic prompt caching.
+            content = [
+                {"type": "text", "text": prompt[:prefix_length], "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt[prefix_length:]},
+            ]
+        request = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": [{"role": "user", "content": content}],
+        }
+        if schema is not None:
+            # Forcing a single tool makes the model answer with input matching its schema.
+            request["tools"] = [{"name": SCHEMA_TOOL_NAME, "description": "Record the classification.", "input_schema": schema}]
+            request["tool_choice"] = {"type": "tool", "name": SCHEMA_TOOL_NAME}
+        body = json.dumps(request).encode('utf-8')
+
+        response = self._post(body)
+        try:
+            payload = response.read()
+        except (socket.timeout, TimeoutError):
+            self._drop_connection()
+            raise LLMTimeoutError(f"response timed out after {self.timeout}s")
+        if response.will_close:
+            self._drop_connection()
+
+        if response.status != 200:
+            raise LLMError(f"HTTP {response.status}: {payload[:200].decode('utf-8', 'replace')}", status=response.status)
+
+        try:
+            message = json.loads(payload)
+            self._record_usage(message.get("usage") or {})
+            for block in message.get("content", []):
+                if block.get("type") == "tool_use":
+                    return json.dumps(block.get("input"))
+            return "".join(block.get("text", "") for block in message.get("content", []) if block.get("type") == "text")
+        except (json.JSONDecodeError, AttributeError) as e:
+            raise LLMError(f"malformed API response: {e}")
+
+    def _record_usage(self, usage: Dict[str, Any]):
+        with self._lock:
+            for field, name in USAGE_FIELDS.items():
+                self._usage[name] += usage.get(field) or 0
+
+    def token_usage(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+class StubBackend(HTTPBackend):
+    """HTTP backend talking to a local stub server started on demand."""
+
+    name = "stub"
+    default_model = "stub-model"
+
+    def __init__(self, model: Optional[str] = None, timeout: float = 60, server=None):
+        # Imported here so normal runs never load the stub server.
+        from llm_stub import StubLLMServer
+
+        self.server = server or StubLLMServer()
+        self._owns_server = server is None
+        if self._owns_server:
+            self.server.start()
+        super().__init__(model, timeout, api_url=self.server.url)
+
+    def close(self):
+        super().close()
+        if self._owns_server:
+            self.server.stop()
+
+
+class MeteredBackend(LLMBackend):
+    """Wraps another backend and records request counts, prompt/response sizes, latency and token usage."""
+
+    def __init__(self, backend: LLMBackend):
+        super().__init__(backend.model, backend.timeout)
+        self.name = backend.name
+        self.backend = backend
+        self.calls = 0
+        self.errors = 0
+        self.prompt_chars = 0
+        self.response_chars = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt: str, prefix_length: int = 0, schema: Optional[Dict[str, Any]] = None) -> str:
+        start = time.monotonic()
+        response = None
+        try:
+            response = self.backend.complete(prompt, prefix_length, schema)
+            return response
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.calls += 1
+                self.seconds += elapsed
+                self.prompt_chars += len(prompt)
+                if response is None:
+                    self.errors += 1
+                else:
+                    self.response_chars += len(response)
+            metrics.observe('backend_call', elapsed)
+            if response is None:
+                metrics.increment('backend_errors')
+            else:
+                metrics.observe_size('response_chars', len(response))
+
+    def discard(self, prompt: str):
+        self.backend.discard(prompt)
+
+    def close(self):
+        self.backend.close()
+
+    def token_usage(self) -> Dict[str, int]:
+        return self.backend.token_usage()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "prompt_chars": self.prompt_chars,
+                "response_chars": self.response_chars,
+                "seconds": self.seconds,
+            }
+        stats.update(self.token_usage())
+        return stats
+
+
+BACKENDS = {
+    SubprocessBackend.name: SubprocessBackend,
+    HTTPBackend.name: HTTPBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def load_backend_config(config_path: Optional[str] = None, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Merge defaults, an optional JSON config file, environment variables and explicit overrides."""
+    config = dict(DEFAULT_CONFIG)
+
+    if config_path:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+
+    for key, env_var in ENV_OVERRIDES.items():
+        if os.environ.get(env_var):
+            config[key] = os.environ[env_var]
+
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            config[key] = value
+
+    return config
+
+
+def create_backend(config: Dict[str, Any]) -> LLMBackend:
+    """Instantiate the backend named in config."""
+    name = config.get("backend", "subprocess")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}' (choose from {', '.join(sorted(BACKENDS))})")
+
+    model = config.get("model")
+    timeout = float(config.get("timeout", 60))
+    if name == SubprocessBackend.name:
+        return SubprocessBackend(model, timeout, llm_path=config["llm_path"])
+    if name == HTTPBackend.name:
+        return HTTPBackend(model, timeout, api_url=config["api_url"],
+                           api_key=os.environ.get(config.get("api_key_env", "ANTHROPIC_API_KEY")),
+                           max_tokens=int(config.get("max_tokens", 1024)))
+    return StubBackend(model, timeout)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Local stub of the Anthropic Messages API for tests and offline runs.
+
+The stub answers POST /v1/messages on a background thread. Responses come from
+a `responder(prompt) -> str` callable, which by default returns a fixed, valid
+classification JSON object (or an array of them for batch prompts). A responder
+can raise `StubError` to answer with an error status, e.g. to inject 429s.
+Requests that force a tool get the responder's JSON back as that tool's input.
+Text up to a block marked with cache_control is treated as a cached prefix: the
+first request with it reports a cache write, later ones a cache read.
+"""
+
+import json
+import random
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+DEFAULT_CLASSIFICATION = {
+    "attack_type": "ASSAULT",
+    "extremist_beliefs_classification": "NO",
+    "connection_to_organized_extremist_group_classification": "N/A",
+    "sole_perpetrator_classification": "YES",
+    "issue_type": "ELECTIONS/VOTING/POLITICS",
+    "target": "PUBLIC FIGURE",
+    "political_violence_classification": "POLITICAL VIOLENCE"
+}
+
+
+BATCH_EVENT_PATTERN = re.compile(r"EVENT TO CLASSIFY \(event_index (\d+)\)")
+COMPACT_MARKER = "REQUIRED OUTPUT FORMAT (COMPACT CODES):"
+
+
+def default_responder(prompt: str) -> str:
+    """Return the default classification, as a JSON array for batch prompts.
+    
+    Prompts asking for compact codes get the classification's codes instead, with
+    a batch's array wrapped in an {"events": [...]} object.
+    """
+    indices = BATCH_EVENT_PATTERN.findall(prompt)
+    classification = DEFAULT_CLASSIFICATION
+    compact = COMPACT_MARKER in prompt
+    if compact:
+        # Imported here so the stub doesn't load the classifier unless asked for codes.
+        from classification_script import encode_compact
+        classification = encode_compact(DEFAULT_CLASSIFICATION)
+    if indices:
+        items = [dict(classification, event_index=int(index)) for index in indices]
+        return json.dumps({"events": items} if compact else items)
+    return json.dumps(classification)
+
+
+class StubError(Exception):
+    """Raised by a responder to answer with an HTTP error status."""
+
+    def __init__(self, status: int = 529, message: str = "Overloaded"):
+        super().__init__(message)
+        self.status = status
+
+
+def flaky_responder(failure_rate: float, status: int = 529, responder: Optional[Callable[[str], str]] = None,
+                    seed: Optional[int] = None) -> Callable[[str], str]:
+    """Wrap a responder so a random fraction of requests fail with the given status."""
+    responder = responder or default_responder
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def respond(prompt: str) -> str:
+        with lock:
+            fail = rng.random() < failure_rate
+        if fail:
+            raise StubError(status)
+        return responder(prompt)
+
+    return respond
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests.
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY each
+    # response stalls ~40ms on Nagle's algorithm and the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        content = request.get("messages", [{}])[-1].get("content", "")
+        prefix = ""
+        if isinstance(content, list):
+            marked = [i for i, block in enumerate(content) if "cache_control" in block]
+            if marked:
+                prefix = "".join(block.get("text", "") for block in content[:marked[-1] + 1])
+            content = "".join(block.get("text", "") for block in content)
+
+        tool = request.get("tool_choice", {}).get("name")
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.last_request = request
+            if tool:
+                server.tool_request_count += 1
+            cache_hit = prefix in server.cached_prefixes
+            if prefix:
+                server.cached_prefixes.add(prefix)
+
+        try:
+            text = server.responder(content)
+            status = 200
+            if tool:
+                blocks = [{"type": "tool_use", "id": f"toolu_stub_{server.request_count}", "name": tool, "input": json.loads(text)}]
+            else:
+                blocks = [{"type": "text", "text": text}]
+            body = {
+                "id": f"msg_stub_{server.request_count}",
+                "type": "message",
+                "role": "assistant",
+                "model": request.get("model"),
+                "content": blocks,
+                "stop_reason": "tool_use" if tool else "end_turn",
+                "usage": {
+                    "input_tokens": (len(content) - len(prefix)) // 4,
+                    "output_tokens": len(text) // 4,
+                    "cache_creation_input_tokens": 0 if cache_hit else len(prefix) // 4,
+                    "cache_read_input_tokens": len(prefix) // 4 if cache_hit else 0,
+                },
+            }
+        except StubError as e:
+            status = e.status
+            body = {"type": "error", "error": {"type": "overloaded_error" if status == 529 else "api_error", "message": str(e)}}
+        except Exception as e:
+            status = 500
+            body = {"type": "error", "error": {"type": "api_error", "message": str(e)}}
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Keep test output quiet.
+        pass
+
+
+class StubLLMServer:
+    """Threaded local HTTP server implementing a minimal /v1/messages endpoint."""
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.responder = responder or default_responder
+        self.httpd.request_count = 0
+        self.httpd.tool_request_count = 0
+        self.httpd.last_request = None
+        self.httpd.cached_prefixes = set()
+        self.httpd.connection_count = 0
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+        # Count accepted connections so tests can check keep-alive reuse.
+        original_process_request = self.httpd.process_request
+
+        def process_request(request, client_address):
+            with self.httpd.lock:
+                self.httpd.connection_count += 1
+            original_process_request(request, client_address)
+
+        self.httpd.process_request = process_request
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    @property
+    def tool_request_count(self) -> int:
+        return self.httpd.tool_request_count
+
+    @property
+    def last_request(self) -> Optional[dict]:
+        """The most recent request body, parsed."""
+        return self.httpd.last_request
+
+    @property
+    def connection_count(self) -> int:
+        return self.httpd.connection_count
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down and wait for the serving thread."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Persistent, content-addressed cache of LLM responses backed by SQLite.
+
+Entries are keyed by a SHA-256 hash of (model, full prompt text), so re-running
+the classification after an unrelated change serves unchanged prompts locally
+and only prompts whose text changed reach the model.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from instrumentation import metrics
+from llm_backends import LLMBackend
+
+# How many writes to make between eviction passes.
+EVICT_EVERY = 100
+
+
+def cache_key(model: str, prompt: str) -> str:
+    """Hash a model name and prompt into a cache key."""
+    digest = hashlib.sha256()
+    digest.update((model or '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite store of LLM responses with size/age eviction and hit/miss counters."""
+
+    def __init__(self, path: str = 'llm_cache.sqlite', max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, max_age_days: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400 if max_age_days is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self.evict()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Return the cached response for (model, prompt), or None on a miss."""
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or self._is_expired(row[1], now):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, prompt: str, response: str):
+        """Store a response, evicting old entries periodically."""
+        key = cache_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def discard(self, model: str, prompt: str):
+        """Remove the entry for (model, prompt), e.g. after it failed to parse."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (cache_key(model, prompt),))
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until within the size limits."""
+        removed = 0
+        with self._lock:
+            if self.max_age_seconds is not None:
+                cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+                removed += cursor.rowcount
+
+            if self.max_entries is not None:
+                cursor = self._conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+                removed += cursor.rowcount
+
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    doomed = []
+                    for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+                        if total <= self.max_bytes:
+                            break
+                        doomed.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                    removed += len(doomed)
+
+            self._conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedBackend(LLMBackend):
+    """Wraps another backend, serving repeated prompts from a ResponseCache.
+    
+    With refresh=True every prompt goes to the model and the cache is only
+    updated, e.g. to reclassify events whose cached answers were unusable.
+    """
+
+    def __init__(self, backend: LLMBackend, cache: ResponseCache, refresh: bool = False):
+        super().__init__(backend.model, backend.timeout)
+        self.name = backend.name
+        self.backend = backend
+        self.cache = cache
+        self.refresh = refresh
+
+    def complete(self, prompt: str, prefix_length: int = 0, schema: Optional[Dict[str, Any]] = None) -> str:
+        response = None
+        if not self.refresh:
+            with metrics.time('cache_lookup'):
+                response = self.cache.get(self.model, prompt)
+        if response is None:
+            response = self.backend.complete(prompt, prefix_length, schema)
+            self.cache.put(self.model, prompt, response)
+        else:
+            metrics.increment('cache_hits')
+        return response
+
+    def discard(self, prompt: str):
+        self.cache.discard(self.model, prompt)
+        self.backend.discard(prompt)
+
+    def close(self):
+        self.backend.close()
+        self.cache.close()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite store of classified events, with a small query CLI.
+
+Each event becomes one row of the `events` table, in input order, with one TEXT
+column per event field. The seven classification fields plus state, event_date
+and event_type are indexed, so filtered queries and cross-tabs are answered by
+SQLite without loading the dataset into memory.
+
+    python results_store.py load us_data_enhanced.json
+    python results_store.py query --where attack_type=SHOOTING --where state=TEXAS --columns event_date,city,notes
+    python results_store.py crosstab attack_type state --where issue_type=ELECTIONS/VOTING/POLITICS
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from event_io import OUTPUT_FORMATS, iter_event_file
+
+CLASSIFICATION_FIELDS = [
+    'attack_type',
+    'extremist_beliefs_classification',
+    'connection_to_organized_extremist_group_classification',
+    'sole_perpetrator_classification',
+    'issue_type',
+    'target',
+    'political_violence_classification',
+]
+
+# Where an output row's classification came from: the LLM or the local triage model.
+SOURCE_COLUMN = 'classification_source'
+LLM_SOURCE, TRIAGE_SOURCE = 'llm', 'triage'
+
+INDEXED_COLUMNS = CLASSIFICATION_FIELDS + [SOURCE_COLUMN, 'state', 'event_date', 'event_type']
+
+# Rows inserted per transaction while loading.
+INSERT_BATCH_SIZE = 1000
+
+
+def _quote(column: str) -> str:
+    """Quote a column name for use as an SQL identifier."""
+    return '"' + column.replace('"', '""') + '"'
+
+
+class ResultsStore:
+    """SQLite table of classified events with indexes on the commonly filtered columns."""
+
+    def __init__(self, path: str = 'us_data_enhanced.sqlite'):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS events (row_id INTEGER PRIMARY KEY)")
+        self._conn.commit()
+        self._columns = self._table_columns()
+        self._pending = 0
+
+    def _table_columns(self) -> List[str]:
+        return [row[1] for row in self._conn.execute("PRAGMA table_info(events)") if row[1] != 'row_id']
+
+    @property
+    def columns(self) -> List[str]:
+        """Event columns present in the table, in the order they were first seen."""
+        return list(self._columns)
+
+    def _add_columns(self, event: Dict[str, Any]):
+        for column in event:
+            if column not in self._columns and column != 'row_id':
+                self._conn.execute(f"ALTER TABLE events ADD COLUMN {_quote(column)} TEXT")
+                self._columns.append(column)
+                if column in INDEXED_COLUMNS:
+                    self._conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote('events_' + column)} ON events ({_quote(column)})")
+
+    def _check_columns(self, columns: Iterable[str]):
+        unknown = [column for column in columns if column not in self._columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)} (available: {', '.join(self._columns)})")
+
+    def clear(self):
+        """Delete every stored event."""
+        self._conn.execute("DELETE FROM events")
+        self._conn.commit()
+
+    def add(self, event: Dict[str, Any], row_id: Optional[int] = None):
+        """Store one event (replacing any row with the same row_id), committing every INSERT_BATCH_SIZE rows."""
+        if row_id is None:
+            row_id = self._next_row_id()
+        self._add_columns(event)
+        columns = ['row_id'] + list(event)
+        placeholders = ', '.join('?' for _ in columns)
+        values = [row_id] + [value if value is None or isinstance(value, (str, int, float)) else json.dumps(value)
+                             for value in event.values()]
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO events ({', '.join(_quote(c) for c in columns)}) VALUES ({placeholders})",
+            values
+        )
+        self._pending += 1
+        if self._pending >= INSERT_BATCH_SIZE:
+            self.commit()
+
+    def _next_row_id(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(row_id) + 1, 0) FROM events").fetchone()[0]
+
+    def write_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Append events in order; return how many were written."""
+        start = self._next_row_id()
+        count = 0
+        for count, event in enumerate(events, 1):
+            self.add(event, start + count - 1)
+        self.commit()
+        return count
+
+    def commit(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def _where(self, filters: Optional[Dict[str, str]]) -> Tuple[str, List[str]]:
+        if not filters:
+            return "", []
+        self._check_columns(filters)
+        clause = " AND ".join(f"{_quote(column)} = ?" for column in filters)
+        return f" WHERE {clause}", list(filters.values())
+
+    def count(self, filters: Optional[Dict[str, str]] = None) -> int:
+        """Count events matching every column=value filter."""
+        where, params = self._where(filters)
+        return self._conn.execute(f"SELECT COUNT(*) FROM events{where}", params).fetchone()[0]
+
+    def query(self, filters: Optional[Dict[str, str]] = None, columns: Optional[List[str]] = None,
+              limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield matching events in input order, optionally restricted to some columns."""
+        columns = columns or self.columns
+        self._check_columns(columns)
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM events{where} ORDER BY row_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for row in self._conn.execute(sql, params):
+            yield dict(zip(columns, row))
+
+    def crosstab(self, row_column: str, col_column: str,
+                 filters: Optional[Dict[str, str]] = None) -> Dict[Tuple[str, str], int]:
+        """Count matching events for each (row_column, col_column) value pair."""
+        self._check_columns([row_column, col_column])
+        where, params = self._where(filters)
+        sql = (f"SELECT {_quote(row_column)}, {_quote(col_column)}, COUNT(*) FROM events{where} "
+               f"GROUP BY {_quote(row_column)}, {_quote(col_column)}")
+        return {(row, col): count for row, col, count in self._conn.execute(sql, params)}
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_filters(where: List[str]) -> Dict[str, str]:
+    """Turn --where arguments of the form column=value into a {column: value} dict."""
+    filters = {}
+    for condition in where or []:
+        column, separator, value = condition.partition('=')
+        if not separator:
+            raise ValueError(f"Filter '{condition}' should look like column=value")
+        filters[column.strip()] = value
+    return filters
+
+
+def print_crosstab(table: Dict[Tuple[str, str], int], output=None):
+    """Write a cross-tab as CSV with one row per row value and a total column."""
+    row_values = sorted({row for row, _ in table}, key=str)
+    col_values = sorted({col for _, col in table}, key=str)
+    writer = csv.writer(output or sys.stdout)
+    writer.writerow([''] + col_values + ['TOTAL'])
+    for row in row_values:
+        counts = [table.get((row, col), 0) for col in col_values]
+        writer.writerow([row] + counts + [sum(counts)])
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Load classified events into SQLite and query them.")
+    parser.add_argument('--db', default='us_data_enhanced.sqlite',
+                        help="SQLite database file (default: us_data_enhanced.sqlite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help="Replace the stored events with those in an output file")
+    load.add_argument('path', nargs='?', default='us_data_enhanced.json',
+                      help="Enhanced events as a JSON array, JSONL or CSV (default: us_data_enhanced.json)")
+    load.add_argument('--format', choices=OUTPUT_FORMATS, default=None,
+                      help="Input format (default: from the file extension)")
+
+    for name, help_text in (('query', "Print events matching the filters"),
+                            ('count', "Count events matching the filters"),
+                            ('crosstab', "Count matching events by two columns")):
+        command = commands.add_parser(name, help=help_text)
+        if name == 'crosstab':
+            command.add_argument('rows', help="Column whose values label the rows")
+            command.add_argument('cols', help="Column whose values label the columns")
+        command.add_argument('--where', action='append', default=[], metavar='COLUMN=VALUE',
+                             help="Only include events where COLUMN equals VALUE (repeatable)")
+        if name == 'query':
+            command.add_argument('--columns', default=None,
+                                 help="Comma-separated columns to print (default: all)")
+            command.add_argument('--limit', type=int, default=None,
+                                 help="Print at most this many events")
+            command.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl',
+                                 help="Output format (default: jsonl)")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
+    """Run one store command."""
+    args = parse_args(argv)
+    with ResultsStore(args.db) as store:
+        try:
+            if args.command == 'load':
+                store.clear()
+                count = store.write_events(iter_event_file(args.path, args.format))
+                print(f"Loaded {count} events into {args.db}")
+                return
+
+            filters = parse_filters(args.where)
+            if args.command == 'count':
+                print(store.count(filters))
+            elif args.command == 'crosstab':
+                print_crosstab(store.crosstab(args.rows, args.cols, filters))
+            else:
+                columns = args.columns.split(',') if args.columns else None
+                rows = store.query(filters, columns, args.limit)
+                if args.format == 'csv':
+                    writer = csv.DictWriter(sys.stdout, fieldnames=columns or store.columns)
+                    writer.writeheader()
+                    writer.writerows(rows)
+                else:
+                    for row in rows:
+                        print(json.dumps(row, ensure_ascii=False))
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Rate limiting, retries and adaptive concurrency for LLM calls.
+
+`ScheduledBackend` wraps another backend. Before each call it takes a request
+and the prompt's estimated tokens from token buckets, and waits for a slot under
+an adaptive concurrency limit. Retryable failures (timeouts, dropped connections,
+429/5xx/overloaded responses) are retried with jittered exponential backoff. The
+concurrency limit follows AIMD: it grows by one slot after a limit's worth of
+successes and halves on overload errors or slow responses.
+"""
+
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from instrumentation import metrics
+from llm_backends import LLMBackend, LLMError, LLMTimeoutError
+
+# HTTP statuses worth retrying: timeouts, rate limits and server overload.
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504, 529}
+
+# Statuses that mean the provider wants less traffic.
+OVERLOAD_STATUSES = {429, 503, 529}
+
+# Error text that marks a transient failure when there is no status code, e.g.
+# from the llm CLI.
+TRANSIENT_PATTERN = re.compile(r"rate.?limit|overloaded|too many requests|\b(429|5\d\d)\b|timed? ?out|connection", re.IGNORECASE)
+OVERLOAD_PATTERN = re.compile(r"rate.?limit|overloaded|too many requests|\b(429|503|529)\b", re.IGNORECASE)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an LLM failure is transient and the call should be retried."""
+    if isinstance(error, LLMTimeoutError):
+        return True
+    if not isinstance(error, LLMError):
+        return False
+    if error.status is not None:
+        return error.status in RETRYABLE_STATUSES
+    return bool(TRANSIENT_PATTERN.search(str(error)))
+
+
+def is_overload(error: Exception) -> bool:
+    """Whether a failure says the provider is overloaded or rate limiting us."""
+    if isinstance(error, LLMTimeoutError):
+        return True
+    if not isinstance(error, LLMError):
+        return False
+    if error.status is not None:
+        return error.status in OVERLOAD_STATUSES
+    return bool(OVERLOAD_PATTERN.search(str(error)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """Take `amount` tokens, waiting until they are available; return the seconds waited."""
+        # A request larger than the bucket could never be served; let it through when the bucket is full.
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted by additive increase / multiplicative decrease."""
+
+    def __init__(self, limit: int, minimum: int = 1, maximum: Optional[int] = None,
+                 latency_target: Optional[float] = None, cooldown: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maximum = max(maximum or limit, 1)
+        self.minimum = max(min(minimum, self.maximum), 1)
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreases = 0
+        self._successes = 0
+        self._last_decrease = None
+        self._clock = clock
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot under the current limit."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self, latency: float):
+        """Grow the limit by one after a full limit's worth of fast successes; shrink it on slow ones."""
+        if self.latency_target is not None and latency > self.latency_target:
+            self.on_overload()
+            return
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_overload(self):
+        """Halve the limit, at most once per cooldown so one burst of failures counts once."""
+        with self._condition:
+            now = self._clock()
+            if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self._successes = 0
+            if self.limit > self.minimum:
+                self.limit = max(self.minimum, self.limit // 2)
+                self.decreases += 1
+
+
+class ScheduledBackend(LLMBackend):
+    """Wraps another backend with rate limits, retries and adaptive concurrency."""
+
+    def __init__(self, backend: LLMBackend, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 60.0, concurrency: int = 1,
+                 latency_target: Optional[float] = None,
+                 sleep: Callable[[float], None] = time.sleep, rng: Optional[random.Random] = None):
+        super().__init__(backend.model, backend.timeout)
+        self.name = backend.name
+        self.backend = backend
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_bucket = TokenBucket(requests_per_minute / 60, requests_per_minute, sleep=sleep) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute, sleep=sleep) if tokens_per_minute else None
+        self.limiter = AdaptiveLimiter(concurrency, latency_target=latency_target)
+        self.retries = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based): full jitter up to an exponential cap."""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _throttle(self, prompt: str):
+        waited = 0.0
+        if self.request_bucket is not None:
+            waited += self.request_bucket.acquire(1)
+        if self.token_bucket is not None:
+            # Input tokens, estimated at four characters per token.
+            waited += self.token_bucket.acquire(len(prompt) / 4)
+        if waited:
+            metrics.observe('rate_limit_wait', waited)
+            with self._lock:
+                self.throttled_seconds += waited
+
+    def complete(self, prompt: str, prefix_length: int = 0, schema: Optional[Dict[str, Any]] = None) -> str:
+        attempt = 0
+        while True:
+            self._throttle(prompt)
+            self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = self.backend.complete(prompt, prefix_length, schema)
+            except Exception as e:
+                self.limiter.release()
+                if is_overload(e):
+                    self.limiter.on_overload()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    metrics.increment('failed_calls')
+                    raise
+                delay = self.backoff(attempt)
+                with self._lock:
+                    self.retries += 1
+                metrics.increment('retries')
+                print(f"Warning: retrying LLM call in {delay:.1f}s after: {e}")
+                self._sleep(delay)
+                attempt += 1
+                continue
+            self.limiter.release()
+            self.limiter.on_success(time.monotonic() - start)
+            return response
+
+    def discard(self, prompt: str):
+        self.backend.discard(prompt)
+
+    def close(self):
+        self.backend.close()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "failures": self.failures,
+                "throttled_seconds": self.throttled_seconds,
+                "concurrency_limit": self.limiter.limit,
+                "concurrency_decreases": self.limiter.decreases,
+            }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Deterministic sharding of a classification run, and an ordered merge of the shards.
+
+`classification_script.py --shard i/N` classifies only the input rows whose
+content hash falls in shard i (0 <= i < N), so N processes or machines, each
+with its own API key, can split a backfill without coordinating. Each shard
+writes its own output, with a `source_row` field giving every event's position
+in the input. This module merges shard outputs back into input order, checking
+that every input row appears exactly once.
+
+    python classification_script.py --shard 0/4    # writes us_data_enhanced.shard-0-of-4.json
+    python sharding.py us_data_enhanced.shard-*-of-4.json --output us_data_enhanced.json
+"""
+
+import argparse
+import heapq
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from event_io import OUTPUT_FORMATS, count_csv_rows, infer_format, iter_event_file, open_event_writer
+
+SOURCE_ROW = 'source_row'
+
+# Row numbers listed when reporting missing or duplicated events.
+MAX_LISTED_ROWS = 20
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse 'i/N' into (index, count), with 0 <= index < count."""
+    index, separator, count = text.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        index = count = None
+    if not separator or count is None or count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard '{text}' should look like i/N with 0 <= i < N, e.g. 0/4")
+    return index, count
+
+
+def shard_of(source_hash: str, count: int) -> int:
+    """Shard for an event, from the hex content hash of its source row (see checkpoint.event_fingerprint)."""
+    return int(source_hash[:16], 16) % count
+
+
+def shard_path(path: str, index: int, count: int) -> str:
+    """Per-shard variant of a file name: out.json -> out.shard-0-of-4.json."""
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{extension}"
+
+
+def _iter_shard(path: str, file_format: Optional[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for event in iter_event_file(path, file_format):
+        if SOURCE_ROW not in event:
+            raise ValueError(f"{path} has an event without a {SOURCE_ROW} field; was it written with --shard?")
+        yield int(event.pop(SOURCE_ROW)), event
+
+
+def _describe_rows(rows: List[int], total: int) -> str:
+    listed = ', '.join(str(row) for row in rows[:MAX_LISTED_ROWS])
+    return listed + (f" and {total - MAX_LISTED_ROWS} more" if total > MAX_LISTED_ROWS else '')
+
+
+def merge_shards(paths: List[str], output: str, output_format: Optional[str] = None,
+                 input_format: Optional[str] = None, expected_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Stream shard outputs into one file in input order.
+
+    Events are merged by `source_row` without loading the shards, and the field
+    is dropped from the output. A repeated row keeps its first event. Returns
+    the number written plus the missing and duplicated row numbers; rows after
+    the last one seen count as missing only if `expected_rows` is given.
+    """
+    streams = [_iter_shard(path, input_format) for path in paths]
+    missing, duplicated = [], []
+    missing_count = duplicated_count = 0
+    next_row = 0
+    with open_event_writer(output, output_format) as writer:
+        for row, event in heapq.merge(*streams, key=lambda item: item[0]):
+            if row < next_row:
+                duplicated_count += 1
+                if len(duplicated) < MAX_LISTED_ROWS:
+                    duplicated.append(row)
+                continue
+            for gap in range(next_row, row):
+                missing_count += 1
+                if len(missing) < MAX_LISTED_ROWS:
+                    missing.append(gap)
+            writer.write(event)
+            next_row = row + 1
+        if expected_rows is not None:
+            for gap in range(next_row, expected_rows):
+                missing_count += 1
+                if len(missing) < MAX_LISTED_ROWS:
+                    missing.append(gap)
+    return {
+        "written": writer.count,
+        "missing": missing,
+        "missing_count": missing_count,
+        "duplicated": duplicated,
+        "duplicated_count": duplicated_count,
+    }
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Merge shard outputs of classification_script.py --shard into input order.")
+    parser.add_argument('shards', nargs='+',
+                        help="Shard output files (any order)")
+    parser.add_argument('--output', default='us_data_enhanced.json',
+                        help="Merged output file (default: us_data_enhanced.json)")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default=None,
+                        help="Output format (default: from the --output extension)")
+    parser.add_argument('--input-format', choices=OUTPUT_FORMATS, default=None,
+                        help="Shard file format (default: from each file's extension)")
+    parser.add_argument('--input', default='us_data_filtered.csv',
+                        help="The CSV the shards were classified from, to count expected rows (default: us_data_filtered.csv)")
+    parser.add_argument('--allow-incomplete', action='store_true',
+                        help="Keep the merged output even if rows are missing or duplicated")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
+    """Merge shards, refusing to replace the output if any input row is missing or duplicated."""
+    args = parse_args(argv)
+    expected_rows = count_csv_rows(args.input) if os.path.exists(args.input) else None
+    if expected_rows is None:
+        print(f"Warning: {args.input} not found; rows missing after the last merged event cannot be detected")
+
+    output_format = args.output_format or infer_format(args.output)
+    temporary = args.output + '.tmp'
+    try:
+        result = merge_shards(args.shards, temporary, output_format, args.input_format, expected_rows)
+    except (FileNotFoundError, ValueError) as e:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        sys.exit(f"Error: {e}")
+
+    print(f"Merged {result['written']} events from {len(args.shards)} shards")
+    if result["missing_count"]:
+        print(f"Missing {result['missing_count']} input rows: {_describe_rows(result['missing'], result['missing_count'])}")
+    if result["duplicated_count"]:
+        print(f"Duplicated {result['duplicated_count']} input rows (kept the first): "
+              f"{_describe_rows(result['duplicated'], result['duplicated_count'])}")
+
+    complete = not result["missing_count"] and not result["duplicated_count"]
+    if not complete and not args.allow_incomplete:
+        os.remove(temporary)
+        sys.exit(f"Error: shards are incomplete; {args.output} was not written (rerun the failed shards, "
+                 f"or pass --allow-incomplete)")
+    os.replace(temporary, args.output)
+    print(f"Merged results written to {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test the single-pass summary statistics.
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import analytics
+from analytics import EventSummary, write_report
+from event_io import open_event_writer
+
+EVENTS = [
+    {"state": "TEXAS", "event_date": "2024-01-02", "attack_type": "SHOOTING",
+     "political_violence_classification": "POLITICAL VIOLENCE", "issue_type": "LABOR"},
+    {"state": "OHIO", "event_date": "2024-01-20", "attack_type": "SHOOTING",
+     "political_violence_classification": "NOT POLITICAL VIOLENCE", "issue_type": "LABOR"},
+    {"state": "TEXAS", "year": "2024", "month": "2", "attack_type": "ASSAULT",
+     "political_violence_classification": "POLITICAL VIOLENCE", "issue_type": "COVID"},
+]
+
+
+def test_counts_and_crosstabs():
+    """One pass fills the field counts and the state, month and issue cross-tabs."""
+    summary = EventSummary()
+    assert summary.update_many(EVENTS) == 3
+    report = summary.to_dict()
+    assert report["counts"]["attack_type"] == {"ASSAULT": 1, "SHOOTING": 2}
+    assert report["counts"]["target"] == {"UNKNOWN": 3}
+    assert report["crosstabs"]["attack_type_by_state"] == {"ASSAULT": {"TEXAS": 1}, "SHOOTING": {"OHIO": 1, "TEXAS": 1}}
+    assert report["crosstabs"]["attack_type_by_month"] == {"ASSAULT": {"2024-02": 1}, "SHOOTING": {"2024-01": 2}}
+    assert report["crosstabs"]["political_violence_by_issue_type"] == {
+        "NOT POLITICAL VIOLENCE": {"LABOR": 1},
+        "POLITICAL VIOLENCE": {"COVID": 1, "LABOR": 1},
+    }
+
+    # Saved aggregates round trip exactly.
+    assert EventSummary.from_dict(json.loads(json.dumps(report))).to_dict() == report
+
+    output = io.StringIO()
+    write_report(summary, 'csv', output)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "table,row,column,count"
+    assert "attack_type_by_state,SHOOTING,OHIO,1" in lines
+
+
+def test_incremental_update_matches_full_pass():
+    """Records appended after a saved state are the only ones added on the next run."""
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, 'events.jsonl')
+        state = os.path.join(tmp, 'state.json')
+        with open_event_writer(data) as writer:
+            for event in EVENTS[:2]:
+                writer.write(event)
+        analytics.main([data, '--state', state, '--output', os.path.join(tmp, 'report.json')])
+
+        with open(data, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(EVENTS[2]) + '\n')
+        analytics.main([data, '--state', state, '--output', os.path.join(tmp, 'report.json')])
+
+        with open(os.path.join(tmp, 'report.json'), encoding='utf-8') as f:
+            report = json.load(f)
+        full = EventSummary()
+        full.update_many(EVENTS)
+        assert report == full.to_dict()
+
+
+def main():
+    """Run the analytics tests."""
+    print("Testing analytics...")
+    test_counts_and_crosstabs()
+    print("✓ Counts and cross-tabs")
+    test_incremental_update_matches_full_pass()
+    print("✓ Incremental updates match a full pass")
+
+
+if __name__ == "__main__":
+    main()
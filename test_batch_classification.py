@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test batched multi-event classification against the local HTTP stub server.
+"""
+
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_events, parse_batch_response
+from llm_backends import HTTPBackend, MeteredBackend
+from llm_stub import BATCH_EVENT_PATTERN, DEFAULT_CLASSIFICATION, StubLLMServer
+
+
+def attack_type_for(prompt_notes):
+    return "SHOOTING" if "SHOT" in prompt_notes else "ASSAULT"
+
+
+def make_events(count):
+    return [{"notes": f"EVENT {i}: A MAN SHOT AT A RALLY" if i % 3 == 0 else f"EVENT {i}: A MAN PUNCHED A VOTER"} for i in range(count)]
+
+
+def labelled_responder(drop_odd_on_first_try):
+    """Answer batch prompts per event, optionally omitting odd indices from large batches."""
+    def responder(prompt):
+        sections = prompt.split("\nEVENT TO CLASSIFY")[1:]
+        indices = BATCH_EVENT_PATTERN.findall(prompt)
+        if not indices:
+            notes = sections[-1].split("Notes:", 1)[1].split("\n", 1)[0]
+            return json.dumps(dict(DEFAULT_CLASSIFICATION, attack_type=attack_type_for(notes)))
+        items = []
+        for index, section in zip(indices, sections):
+            if drop_odd_on_first_try and len(indices) > 2 and int(index) % 2 == 1:
+                continue
+            notes = section.split("Notes:", 1)[1].split("\n", 1)[0]
+            items.append(dict(DEFAULT_CLASSIFICATION, event_index=int(index), attack_type=attack_type_for(notes)))
+        return json.dumps(items)
+    return responder
+
+
+def test_batches_classify_in_order():
+    """Full batches need one request per batch and keep input order."""
+    events = make_events(25)
+    with StubLLMServer(labelled_responder(False)) as server:
+        meter = MeteredBackend(HTTPBackend(model="stub-model", api_url=server.url))
+        results = list(classify_events(events, [], [], workers=3, backend=meter, batch_size=10))
+        meter.close()
+
+    assert [r["attack_type"] for r in results] == [attack_type_for(e["notes"]) for e in events]
+    assert meter.stats()["calls"] == 3
+
+
+def test_partial_batches_retry_only_missing_events():
+    """Events left out of a response are re-requested in smaller batches."""
+    events = make_events(8)
+    with StubLLMServer(labelled_responder(True)) as server:
+        meter = MeteredBackend(HTTPBackend(model="stub-model", api_url=server.url))
+        results = list(classify_events(events, [], [], backend=meter, batch_size=8))
+        meter.close()
+
+    assert [r["attack_type"] for r in results] == [attack_type_for(e["notes"]) for e in events]
+    # 1 full batch, then the 4 missing odd events as two batches of 2.
+    assert meter.stats()["calls"] == 3
+
+
+def test_parse_batch_response_validates_each_element():
+    """Elements missing required fields or with unknown indices are dropped."""
+    complete = dict(DEFAULT_CLASSIFICATION, event_index=0)
+    incomplete = {"event_index": 1, "attack_type": "ASSAULT"}
+    unexpected = dict(DEFAULT_CLASSIFICATION, event_index=7)
+    text = "Here you go:\n" + json.dumps([complete, incomplete, unexpected])
+    assert parse_batch_response(text, [0, 1]) == {0: DEFAULT_CLASSIFICATION}
+    assert parse_batch_response("no array", [0]) == {}
+
+
+def main():
+    """Run the batch classification tests."""
+    print("Testing batch classification...")
+    test_batches_classify_in_order()
+    print("✓ Batches classify events in input order")
+    test_partial_batches_retry_only_missing_events()
+    print("✓ Partial responses retry only the missing events")
+    test_parse_batch_response_validates_each_element()
+    print("✓ Batch elements are validated individually")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test the offline benchmark harness.
+"""
+
+import os
+import random
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+from event_io import iter_csv_rows
+
+
+def test_inflation_and_latency_samplers():
+    """Synthetic copies keep the columns and get distinct notes; latencies follow their distribution."""
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'us_data_filtered.csv')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'inflated.csv')
+        base = list(iter_csv_rows(source))
+        assert benchmark.inflate_dataset(source, path, len(base) + 5) == len(base) + 5
+        rows = list(iter_csv_rows(path))
+    assert len(rows) == len(base) + 5
+    assert rows[0] == base[0]
+    assert rows[len(base)]['notes'] == base[0]['notes'] + " [SYNTHETIC COPY 1]"
+
+    rng = random.Random(1)
+    assert benchmark.latency_sampler('fixed', 200, 0.5, rng)() == 0.2
+    samples = sorted(benchmark.latency_sampler('lognormal', 100, 0.5, rng)() for _ in range(2001))
+    assert 0.09 < samples[1000] < 0.11
+    assert all(0.05 <= benchmark.latency_sampler('uniform', 100, 0.5, rng)() <= 0.15 for _ in range(100))
+
+
+def test_end_to_end_run_with_injected_failures():
+    """A small synthetic run completes, retries the injected failures and reports its figures."""
+    results = benchmark.main(['--sizes', '40', '--latency-ms', '1', '--failure-rate', '0.1',
+                              '--workers', '4', '--pipeline-args', '--max-retries 10'])
+    result = results[0]
+    assert result["returncode"] == 0
+    assert result["events"] == 40
+    assert result["llm_requests"] == 40 + result["injected_failures"]
+    assert result["counters"]["retries"] == result["injected_failures"]
+    assert result["counters"]["manual_check_fallbacks"] == 0
+    assert result["peak_rss_mb"] > 0 and result["prompt_bytes_per_event"] > 1000
+    assert "backend_call" in result["stages_ms"]
+
+
+def main():
+    """Run the benchmark harness tests."""
+    print("Testing benchmark harness...")
+    test_inflation_and_latency_samplers()
+    print("✓ Synthetic inflation and latency distributions")
+    test_end_to_end_run_with_injected_failures()
+    print("✓ End-to-end run against the fake LLM")
+
+
+if __name__ == "__main__":
+    main()
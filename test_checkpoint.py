@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test append-only JSONL checkpointing and resume.
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import classification_script
+from checkpoint import CheckpointWriter, event_fingerprint, iter_checkpoint, iter_checkpoint_events, load_completed
+from event_io import iter_event_file, open_event_writer
+from llm_stub import DEFAULT_CLASSIFICATION
+
+
+def make_events(count):
+    return [{"notes": f"EVENT {i} – ÉTÉ", "attack_type": "ASSAULT"} for i in range(count)]
+
+
+def write_output(checkpoint_path, output_path):
+    """Stream the checkpoint to the final output as classification_script.main does; return the event count."""
+    with open_event_writer(output_path) as writer:
+        for event in iter_checkpoint_events(checkpoint_path):
+            writer.write(event)
+    return writer.count
+
+
+def test_output_matches_legacy_json_dump():
+    """The streamed array is byte-identical to json.dump(indent=2)."""
+    events = make_events(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint.jsonl')
+        with CheckpointWriter(path) as checkpoint:
+            for i, event in enumerate(events):
+                checkpoint.write(i, event_fingerprint(event), event)
+
+        output = os.path.join(tmp, 'out.json')
+        assert write_output(path, output) == 3
+        with open(output, encoding='utf-8') as f:
+            streamed = f.read()
+
+    assert streamed == json.dumps(events, indent=2, ensure_ascii=False)
+
+
+def test_resume_after_crash():
+    """A half-written final line is dropped and resumed records are merged in order, even if the resumed run is cut off too."""
+    events = make_events(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint.jsonl')
+        with CheckpointWriter(path) as checkpoint:
+            checkpoint.write(0, event_fingerprint(events[0]), events[0])
+            checkpoint.write(2, event_fingerprint(events[2]), events[2])
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"index": 1, "ha')
+
+        completed = load_completed(path)
+        assert completed == {0: event_fingerprint(events[0]), 2: event_fingerprint(events[2])}
+
+        with CheckpointWriter(path, resume=True) as checkpoint:
+            for i in (1, 3):
+                checkpoint.write(i, event_fingerprint(events[i]), events[i])
+        assert [record["index"] for record in iter_checkpoint(path)] == [0, 2, 1, 3]
+
+        # The resumed run crashes mid-write as well: its torn last line is left out.
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"index": 4, "hash": "')
+        output = os.path.join(tmp, 'out.json')
+        assert write_output(path, output) == 4
+        with open(output, encoding='utf-8') as f:
+            assert json.load(f) == events
+
+
+def test_resumed_run_over_a_torn_checkpoint():
+    """A --resume run keeps recorded events, classifies the rest, and writes them all in input order."""
+    rows = [{"notes": f"EVENT {i}"} for i in range(4)]
+    recorded = {i: dict(rows[i], **dict(DEFAULT_CLASSIFICATION, attack_type="ARSON")) for i in (0, 2)}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'events.csv')
+        with open(source, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['notes'])
+            writer.writeheader()
+            writer.writerows(rows)
+        path = os.path.join(tmp, 'checkpoint.jsonl')
+        with CheckpointWriter(path) as checkpoint:
+            for i, event in recorded.items():
+                checkpoint.write(i, event_fingerprint(rows[i]), event)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"index": 1, "ha')
+
+        output = os.path.join(tmp, 'out.json')
+        classification_script.main(['--backend', 'stub', '--no-cache', '--input', source, '--output', output,
+                                    '--checkpoint', path, '--resume'])
+        events = list(iter_event_file(output))
+        assert not os.path.exists(path)
+
+    assert [event["notes"] for event in events] == [row["notes"] for row in rows]
+    assert [event["attack_type"] for event in events] == ["ARSON", DEFAULT_CLASSIFICATION["attack_type"]] * 2
+
+
+def test_corrupt_lines_are_skipped():
+    """Corrupt or differently formatted lines don't stop the final output, in or out of order."""
+    events = make_events(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        for order in ([0, 1, 2, 3], [2, 0, 3, 1]):
+            path = os.path.join(tmp, 'checkpoint.jsonl')
+            with open(path, 'w', encoding='utf-8') as f:
+                for position, i in enumerate(order):
+                    record = {"index": i, "hash": event_fingerprint(events[i]), "event": events[i]}
+                    # One record written with other key order and spacing.
+                    f.write(json.dumps(record) if position else json.dumps(dict(reversed(record.items())), separators=(',', ':')))
+                    f.write('\n')
+                    if position == 1:
+                        f.write('{"index": x, garbage\n')
+                        f.write('not json at all\n')
+
+            output = os.path.join(tmp, 'out.json')
+            assert write_output(path, output) == 4
+            with open(output, encoding='utf-8') as f:
+                assert json.load(f) == events
+
+
+def test_empty_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint.jsonl')
+        CheckpointWriter(path).close()
+        output = os.path.join(tmp, 'out.json')
+        assert write_output(path, output) == 0
+        with open(output, encoding='utf-8') as f:
+            assert f.read() == '[]'
+
+
+def main():
+    """Run the checkpoint tests."""
+    print("Testing checkpointing...")
+    test_output_matches_legacy_json_dump()
+    print("✓ Final output matches the legacy pretty JSON")
+    test_resume_after_crash()
+    print("✓ Resume skips recorded events and recovers from a partial line")
+    test_resumed_run_over_a_torn_checkpoint()
+    print("✓ Resumed run over a torn checkpoint writes every event in order")
+    test_corrupt_lines_are_skipped()
+    print("✓ Corrupt checkpoint lines are skipped")
+    test_empty_checkpoint()
+    print("✓ Empty checkpoint produces an empty array")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test the compact output mode: short codes, schema-constrained responses and expansion to full labels.
+"""
+
+import csv
+import json
+import os
+import stat
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import classification_script
+from classification_script import (COMPACT_KEYS, COMPACT_VALUES, FIELD_VALUES, MANUAL_CHECK, compact_schema,
+                                   encode_compact, expand_compact, validate_classification)
+from event_io import iter_event_file
+from llm_backends import HTTPBackend, SubprocessBackend
+from llm_stub import COMPACT_MARKER, DEFAULT_CLASSIFICATION, StubLLMServer, default_responder
+
+
+def test_codes_round_trip_every_label():
+    for field, key in COMPACT_KEYS.items():
+        assert COMPACT_VALUES[field] == [MANUAL_CHECK] + FIELD_VALUES[field]
+        for code, value in enumerate(COMPACT_VALUES[field]):
+            assert expand_compact({key: code})[field] == value
+
+    codes = encode_compact(DEFAULT_CLASSIFICATION)
+    assert set(codes) == set(COMPACT_KEYS.values())
+    assert expand_compact(codes) == DEFAULT_CLASSIFICATION
+
+    # An unknown code is dropped, so validation reports just that field.
+    _, invalid = validate_classification(expand_compact(dict(codes, pv=99)))
+    assert invalid == ["political_violence_classification"]
+
+    schema = compact_schema()
+    assert schema["properties"]["pv"]["enum"] == [0, 1, 2]
+    assert compact_schema(batch=True)["properties"]["events"]["items"]["required"][0] == "event_index"
+
+
+def test_schema_is_passed_to_the_backends():
+    codes = encode_compact(DEFAULT_CLASSIFICATION)
+    with StubLLMServer(lambda prompt: json.dumps(codes)) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        assert json.loads(backend.complete("prompt", schema=compact_schema())) == codes
+        backend.complete("prompt")
+        backend.close()
+    assert (server.request_count, server.tool_request_count) == (2, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A stand-in for the llm CLI that echoes its arguments.
+        llm_path = os.path.join(tmp, 'llm')
+        with open(llm_path, 'w', encoding='utf-8') as f:
+            f.write(f"#!{sys.executable}\nimport json, sys\nprint(json.dumps(sys.argv[1:]))\n")
+        os.chmod(llm_path, os.stat(llm_path).st_mode | stat.S_IEXEC)
+        argv = json.loads(SubprocessBackend(model="some-model", llm_path=llm_path).complete("prompt", schema=compact_schema()))
+    assert argv[:3] == ['-m', 'some-model', '--schema']
+    assert json.loads(argv[3]) == compact_schema() and argv[4] == "prompt"
+
+
+def test_compact_runs_write_full_labels():
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return default_responder(prompt)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'events.csv')
+        with open(source, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['event_id', 'notes'])
+            writer.writeheader()
+            writer.writerows({'event_id': str(i), 'notes': f"EVENT NUMBER {i}"} for i in range(7))
+
+        config = os.path.join(tmp, 'backend.json')
+        outputs = []
+        with StubLLMServer(responder) as server:
+            with open(config, 'w', encoding='utf-8') as f:
+                json.dump({"backend": "http", "api_url": server.url, "model": "stub-model"}, f)
+            for batch_size in ('1', '3'):
+                outputs.append(os.path.join(tmp, f'enhanced_{batch_size}.jsonl'))
+                classification_script.main(['--input', source, '--output', outputs[-1], '--config', config,
+                                            '--no-cache', '--compact', '--batch-size', batch_size,
+                                            '--checkpoint', os.path.join(tmp, f'checkpoint_{batch_size}.jsonl')])
+        events = [list(iter_event_file(output)) for output in outputs]
+
+    assert prompts and all(COMPACT_MARKER in prompt for prompt in prompts)
+    assert server.tool_request_count == server.request_count
+    for run in events:
+        assert [event['event_id'] for event in run] == [str(i) for i in range(7)]
+        assert all({field: event[field] for field in COMPACT_KEYS} == DEFAULT_CLASSIFICATION for event in run)
+
+
+def main():
+    """Run the compact output tests."""
+    print("Testing compact output...")
+    test_codes_round_trip_every_label()
+    print("✓ Codes expand to every full label")
+    test_schema_is_passed_to_the_backends()
+    print("✓ Response schema sent as a forced tool and to llm --schema")
+    test_compact_runs_write_full_labels()
+    print("✓ Compact single and batch runs write full labels")
+
+
+if __name__ == "__main__":
+    main()
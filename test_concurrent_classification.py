@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test concurrent classification against a local stand-in for the `llm` executable.
+"""
+
+import os
+import stat
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_events
+from llm_backends import SubprocessBackend
+
+# Stand-in for the llm CLI: sleeps to simulate network latency, then answers
+# SHOOTING for events whose notes mention a shooting and ASSAULT otherwise.
+FAKE_LLM = '''#!/usr/bin/env python3
+import json
+import sys
+import time
+
+time.sleep(0.2)
+prompt = sys.argv[-1]
+notes = prompt.split("Notes:", 1)[1].split("\\n", 1)[0]
+if "FAIL" in notes:
+    sys.exit(1)
+print(json.dumps({
+    "attack_type": "SHOOTING" if "SHOT" in notes else "ASSAULT",
+    "extremist_beliefs_classification": "NO",
+    "connection_to_organized_extremist_group_classification": "N/A",
+    "sole_perpetrator_classification": "YES",
+    "issue_type": "ELECTIONS/VOTING/POLITICS",
+    "target": "PUBLIC FIGURE",
+    "political_violence_classification": "POLITICAL VIOLENCE"
+}))
+'''
+
+
+def make_fake_llm(directory):
+    """Write the fake llm executable into directory and return its path."""
+    path = os.path.join(directory, 'llm')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(FAKE_LLM)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+def make_events(count):
+    """Build events alternating between shootings and assaults."""
+    return [
+        {"notes": f"EVENT {i}: A MAN SHOT AT A CAMPAIGN OFFICE" if i % 2 == 0 else f"EVENT {i}: A MAN PUNCHED A CANDIDATE"}
+        for i in range(count)
+    ]
+
+
+def test_concurrent_results_in_input_order():
+    """Concurrent results come back in input order and faster than sequential."""
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SubprocessBackend(llm_path=make_fake_llm(tmp))
+        events = make_events(16)
+
+        start = time.monotonic()
+        results = list(classify_events(events, [], [], workers=8, backend=backend))
+        elapsed = time.monotonic() - start
+
+    assert len(results) == len(events)
+    for i, result in enumerate(results):
+        expected = "SHOOTING" if i % 2 == 0 else "ASSAULT"
+        assert result["attack_type"] == expected, f"event {i}: {result['attack_type']}"
+    # 16 calls at 0.2s each take 3.2s sequentially.
+    assert elapsed < 2.0, f"concurrent run took {elapsed:.1f}s"
+
+
+def test_failed_event_falls_back_to_manual_check():
+    """A failing call only marks its own event as MANUAL CHECK."""
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SubprocessBackend(llm_path=make_fake_llm(tmp))
+        events = make_events(4)
+        events[1] = {"notes": "FAIL"}
+        results = list(classify_events(events, [], [], workers=4, backend=backend))
+
+    assert results[0]["attack_type"] == "SHOOTING"
+    assert results[1]["attack_type"] == "MANUAL CHECK"
+    assert results[2]["attack_type"] == "SHOOTING"
+    assert results[3]["attack_type"] == "ASSAULT"
+
+
+def main():
+    """Run the concurrent classification tests."""
+    print("Testing concurrent classification...")
+    test_concurrent_results_in_input_order()
+    print("✓ Concurrent results returned in input order")
+    test_failed_event_falls_back_to_manual_check()
+    print("✓ Failed events fall back to MANUAL CHECK individually")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test exact and near-duplicate event clustering.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dedup import cluster_sizes, find_duplicate_clusters
+
+NOTES = ("ON 4 MARCH 2021, AN UNREPORTED NUMBER OF PEOPLE DEMONSTRATED OUTSIDE THE HOMES OF AT LEAST SEVEN "
+         "UNIVERSITY OF CALIFORNIA EMPLOYEES IN BERKELEY (CALIFORNIA) AS WELL AS IN OAKLAND AND SAN FRANCISCO. "
+         "HIGHLY THREATENING GRAFFITI WAS SPRAY-PAINTED ON THE HOMES AND WINDOWS WERE BROKEN.")
+
+
+def test_exact_and_near_duplicates_share_a_cluster():
+    """Rows differing only in case/punctuation or a few words cluster under the first row."""
+    events = [
+        {"event_type": "RIOTS", "notes": NOTES},
+        {"event_type": "RIOTS", "notes": "A MAN PUNCHED A POLL WORKER IN PHOENIX (ARIZONA)."},
+        {"event_type": "RIOTS", "notes": NOTES.lower().replace(",", "")},
+        {"event_type": "RIOTS", "notes": NOTES.replace("AT LEAST SEVEN", "AT LEAST EIGHT")},
+        {"event_type": "PROTESTS", "notes": NOTES},
+    ]
+    clusters = find_duplicate_clusters(events)
+    assert clusters == [0, 1, 0, 0, 4]
+    assert cluster_sizes(clusters) == {0: 3, 1: 1, 4: 1}
+
+
+def test_threshold_controls_near_duplicate_merges():
+    """A stricter threshold keeps moderately similar rows apart."""
+    events = [
+        {"event_type": "RIOTS", "notes": NOTES},
+        {"event_type": "RIOTS", "notes": NOTES.replace("SEVEN", "NINE").replace("BROKEN", "SMASHED").replace("GRAFFITI", "MESSAGES")},
+    ]
+    assert find_duplicate_clusters(events, threshold=0.5) == [0, 0]
+    assert find_duplicate_clusters(events, threshold=0.95) == [0, 1]
+
+
+def test_separate_incidents_with_the_same_notes_stay_apart():
+    """Matching notes on another date or in another place, or empty notes, are not duplicates."""
+    base = {"event_type": "PROTESTS", "event_date": "2025-06-12", "city": "HANOVER", "state": "NEW HAMPSHIRE",
+            "notes": "STUDENTS DEMONSTRATED AGAINST TUITION INCREASES."}
+    events = [
+        base,
+        dict(base, event_date="2025-06-11"),
+        dict(base, city="CONCORD"),
+        dict(base, notes=NOTES),
+        dict(base, notes=NOTES.replace("SEVEN", "EIGHT"), event_date="2025-06-11"),
+        dict(base, notes=""),
+        dict(base, notes=""),
+        dict(base, city="hanover "),
+    ]
+    assert find_duplicate_clusters(events) == [0, 1, 2, 3, 4, 5, 6, 0]
+
+
+def main():
+    """Run the deduplication tests."""
+    print("Testing deduplication...")
+    test_exact_and_near_duplicates_share_a_cluster()
+    print("✓ Exact and near duplicates share a cluster")
+    test_threshold_controls_near_duplicate_merges()
+    print("✓ Threshold controls near-duplicate merges")
+    test_separate_incidents_with_the_same_notes_stay_apart()
+    print("✓ Different dates, places and empty notes are never merged")
+
+
+if __name__ == "__main__":
+    main()
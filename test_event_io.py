@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test the streaming event readers and writers.
+"""
+
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import event_io
+from event_io import iter_event_file, open_event_writer
+
+EVENTS = [
+    {"notes": "ON 1 JUNE 2020, PEOPLE DEMONSTRATED IN GLENDALE [CALIFORNIA]", "tags": "", "attack_type": "ASSAULT"},
+    {"notes": "A \"QUOTED\" NOTE, WITH COMMAS } AND ] BRACKETS", "tags": "CROWD SIZE=NO REPORT", "attack_type": "OTHER"},
+    {"notes": "ÉVÉNEMENT – NON-ASCII", "tags": "", "attack_type": "SHOOTING"},
+]
+
+
+def test_round_trip_all_formats():
+    """Every output format reads back the same events."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format in ('json', 'jsonl', 'csv'):
+            path = os.path.join(tmp, f"events.{file_format}")
+            with open_event_writer(path) as writer:
+                for event in EVENTS:
+                    writer.write(event)
+            assert writer.count == len(EVENTS)
+            assert list(iter_event_file(path)) == EVENTS, file_format
+
+
+def test_json_array_matches_legacy_output_and_streams():
+    """The JSON writer matches json.dump(indent=2); the reader decodes it in small chunks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'events.json')
+        with open_event_writer(path, 'json') as writer:
+            for event in EVENTS * 50:
+                writer.write(event)
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == json.dumps(EVENTS * 50, indent=2, ensure_ascii=False)
+
+        original = event_io.READ_CHUNK_SIZE
+        event_io.READ_CHUNK_SIZE = 7
+        try:
+            assert list(iter_event_file(path)) == EVENTS * 50
+        finally:
+            event_io.READ_CHUNK_SIZE = original
+
+        empty = os.path.join(tmp, 'empty.json')
+        open_event_writer(empty).close()
+        assert list(iter_event_file(empty)) == []
+
+
+def main():
+    """Run the event I/O tests."""
+    print("Testing event I/O...")
+    test_round_trip_all_formats()
+    print("✓ JSON, JSONL and CSV round trip")
+    test_json_array_matches_legacy_output_and_streams()
+    print("✓ JSON arrays match the legacy format and stream in chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test similarity-indexed retrieval of labeled examples.
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import PromptBuilder, load_csv_data
+from example_index import ExampleIndex
+
+GREEN = [
+    {"notes": "A MAN FIRED SHOTS AT A CAMPAIGN OFFICE OF THE REPUBLICAN PARTY", "attack_type": "SHOOTING",
+     "sole_perpatrator_classification": "YES", "motive": "ANTI-REPUBLICAN", "source": "LOCAL NEWS"},
+    {"notes": "ARSONISTS THREW A MOLOTOV COCKTAIL AT A PLANNED PARENTHOOD CLINIC", "attack_type": "BOMB",
+     "sole_perpatrator_classification": "NO", "motive": "ANTI-ABORTION", "source": "LOCAL NEWS"},
+]
+YELLOW = [
+    {"notes": "A WOMAN WAS STABBED OUTSIDE A BAR AFTER AN ARGUMENT", "attack_type": "STABBING",
+     "sole_perpetrator": "YES", "motive": "PERSONAL", "tags": "CROWD SIZE=NO REPORT"},
+]
+
+
+def test_nearest_returns_most_similar_first():
+    """The best-matching example comes first, trimmed to labels and notes."""
+    index = ExampleIndex(GREEN, YELLOW)
+    nearest = index.nearest({"notes": "SOMEONE THREW A MOLOTOV COCKTAIL AT AN ABORTION CLINIC"}, k=2)
+    assert len(nearest) == 2
+    assert nearest[0] == {
+        "set": "GREEN",
+        "attack_type": "BOMB",
+        "sole_perpetrator_classification": "NO",
+        "motive": "ANTI-ABORTION",
+        "notes": GREEN[1]["notes"],
+    }
+    stabbing = index.nearest({"notes": "A MAN WAS STABBED AT A BAR"}, k=1)[0]
+    assert stabbing["set"] == "YELLOW"
+    assert stabbing["sole_perpetrator_classification"] == "YES"
+
+    # "A" is in every example, so it has no postings; "BAR" is in one.
+    postings = lambda token: index.posting_starts[index.vocabulary[token] + 1] - index.posting_starts[index.vocabulary[token]]
+    assert (postings("A"), postings("BAR")) == (0, 1)
+
+
+def test_prompts_carry_per_event_examples():
+    """With an index, fixed examples leave the prefix and each event gets its own."""
+    green, yellow = list(GREEN), list(YELLOW)
+    builder = PromptBuilder(green, yellow, ExampleIndex(green, yellow), 1)
+    prompt = builder.build({"notes": "SHOTS FIRED AT THE REPUBLICAN CAMPAIGN OFFICE"})
+    assert "GREEN EXAMPLES" not in builder.prefix
+    assert prompt.startswith(builder.prefix)
+    assert "ANTI-REPUBLICAN" in prompt[len(builder.prefix):]
+    # Callers without the builder get plain prompts with fixed examples.
+    assert "GREEN EXAMPLES" in PromptBuilder.for_examples(green, yellow).prefix
+
+
+def test_lookup_latency_on_large_example_sets():
+    """Lookups stay under a millisecond with tens of thousands of examples."""
+    green = [dict(row, notes=f"{row['notes']} VARIANT {i}") for i in range(40) for row in load_csv_data('green_11_5.csv')]
+    yellow = [dict(row, notes=f"{row['notes']} VARIANT {i}") for i in range(40) for row in load_csv_data('yellow_11_5.csv')]
+    index = ExampleIndex(green, yellow)
+    events = load_csv_data('us_data_filtered.csv')[:200]
+
+    # Best of three passes, so one noisy pass on a shared machine doesn't fail the test.
+    passes = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for event in events:
+            index.nearest(event, 4)
+        passes.append((time.perf_counter() - start) / len(events))
+    per_lookup = min(passes)
+    assert len(index) > 30000
+    assert per_lookup < 0.001, f"{per_lookup * 1000:.2f}ms per lookup"
+
+
+def main():
+    """Run the example index tests."""
+    print("Testing example index...")
+    test_nearest_returns_most_similar_first()
+    print("✓ Nearest examples ranked by similarity")
+    test_prompts_carry_per_event_examples()
+    print("✓ Prompts carry each event's nearest examples")
+    test_lookup_latency_on_large_example_sets()
+    print("✓ Lookups stay fast on large example sets")
+
+
+if __name__ == "__main__":
+    main()
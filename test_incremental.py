@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test incremental ingestion against a previous enhanced output.
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import classification_script
+from event_io import iter_event_file, open_event_writer
+from incremental import CHANGED, NEW, UNCHANGED, PreviousResults
+from llm_stub import DEFAULT_CLASSIFICATION, StubLLMServer
+
+COLUMNS = ['event_date', 'actor1', 'city', 'state', 'fatalities', 'notes', 'tags']
+PREVIOUS = dict(DEFAULT_CLASSIFICATION, target="INSTITUTION")
+
+
+def _row(i, **changes):
+    row = {'event_date': f'2024-01-{i + 1:02d}', 'actor1': 'RIOTERS', 'city': 'SALEM', 'state': 'OREGON',
+           'fatalities': '0', 'notes': f"EVENT {i} HAPPENED", 'tags': ''}
+    row.update(changes)
+    return row
+
+
+def _write_previous(path, rows):
+    with open_event_writer(path) as writer:
+        for row in rows:
+            writer.write(dict(row, **PREVIOUS))
+
+
+def test_diff_statuses():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'previous.jsonl')
+        # Two events with the same identity are matched in order.
+        _write_previous(path, [_row(0), _row(1), _row(1), _row(2)])
+        previous = PreviousResults(path)
+
+    assert previous.match(_row(0, fatalities='3')) == (UNCHANGED, PREVIOUS)
+    assert previous.match(_row(1)) == (UNCHANGED, PREVIOUS)
+    assert previous.match(_row(1, tags='ARMED')) == (CHANGED, None)
+    assert previous.match(_row(1)) == (NEW, None)
+    assert previous.match(_row(2, notes="EVENT 2 HAPPENED, UPDATED")) == (NEW, None)
+    assert previous.counts == {UNCHANGED: 2, CHANGED: 1, NEW: 2}
+    assert previous.removed == 1
+
+
+def test_only_the_delta_is_classified():
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return json.dumps(DEFAULT_CLASSIFICATION)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = os.path.join(tmp, 'previous.jsonl')
+        _write_previous(previous, [_row(i) for i in range(6)])
+        export = os.path.join(tmp, 'export.csv')
+        with open(export, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            # Row 0 removed, row 2 retagged, row 3 has a new casualty count, row 9 is new.
+            writer.writerows([_row(1), _row(2, tags='ARMED'), _row(3, fatalities='1'), _row(4), _row(5), _row(9)])
+
+        config = os.path.join(tmp, 'backend.json')
+        output = os.path.join(tmp, 'enhanced.jsonl')
+        with StubLLMServer(responder) as server:
+            with open(config, 'w', encoding='utf-8') as f:
+                json.dump({"backend": "http", "api_url": server.url, "model": "stub-model"}, f)
+            classification_script.main(['--input', export, '--incremental', previous, '--output', output,
+                                        '--config', config, '--no-cache', '--workers', '2',
+                                        '--checkpoint', os.path.join(tmp, 'checkpoint.jsonl')])
+        events = list(iter_event_file(output))
+
+    assert len(prompts) == 2
+    assert any("EVENT 2 HAPPENED" in prompt for prompt in prompts)
+    assert any("EVENT 9 HAPPENED" in prompt for prompt in prompts)
+    assert [event['notes'] for event in events] == [f"EVENT {i} HAPPENED" for i in (1, 2, 3, 4, 5, 9)]
+    assert [event['target'] for event in events] == [
+        "INSTITUTION", DEFAULT_CLASSIFICATION["target"], "INSTITUTION", "INSTITUTION", "INSTITUTION", DEFAULT_CLASSIFICATION["target"]]
+    # Carried-forward events take the new export's source columns.
+    assert events[2]['fatalities'] == '1'
+
+
+def main():
+    """Run the incremental ingestion tests."""
+    print("Testing incremental ingestion...")
+    test_diff_statuses()
+    print("✓ Events diffed by identity and prompt text")
+    test_only_the_delta_is_classified()
+    print("✓ Only new and changed events sent to the LLM")
+
+
+if __name__ == "__main__":
+    main()
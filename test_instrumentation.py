@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test per-stage instrumentation and the run report.
+"""
+
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_events
+from instrumentation import RunMetrics, metrics
+from llm_backends import HTTPBackend, MeteredBackend
+from llm_stub import StubLLMServer
+
+
+def test_percentiles_histograms_and_prometheus():
+    """Reports carry percentiles, cumulative histograms, throughput and zeroed failure counters."""
+    run = RunMetrics()
+    for i in range(1, 101):
+        run.observe('backend_call', i / 1000)
+    run.observe_size('prompt_chars', 5000)
+    run.increment('retries', 2)
+
+    report = run.report(wall_seconds=2.0, events=100)
+    stage = report["stages"]["backend_call"]
+    assert stage["count"] == 100
+    assert abs(stage["p50"] - 0.0505) < 1e-9 and abs(stage["p99"] - 0.09901) < 1e-9
+    assert stage["histogram"]["0.05"] == 50 and stage["histogram"]["+Inf"] == 100
+    assert report["counters"]["retries"] == 2 and report["counters"]["parse_failures"] == 0
+    assert report["throughput"]["events_per_second"] == 50
+
+    text = run.prometheus_text()
+    assert 'classification_stage_seconds_bucket{stage="backend_call",le="0.05"} 50' in text
+    assert 'classification_stage_seconds_count{stage="backend_call"} 100' in text
+    assert 'classification_prompt_chars_count 1' in text
+    assert 'classification_retries_total 2' in text
+
+
+def test_pipeline_records_each_stage():
+    """A classification run times prompt building, backend calls and parsing per event."""
+    metrics.reset()
+    with StubLLMServer() as server:
+        backend = MeteredBackend(HTTPBackend(model="stub-model", api_url=server.url))
+        events = [{"notes": f"EVENT {i}"} for i in range(12)]
+        list(classify_events(events, [], [], workers=3, backend=backend))
+        backend.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.json')
+        metrics.write_report(path, wall_seconds=1.0, events=12)
+        with open(path, encoding='utf-8') as f:
+            report = json.load(f)
+
+    for stage in ('prompt_build', 'backend_call', 'parse'):
+        assert report["stages"][stage]["count"] == 12, stage
+    assert report["sizes"]["prompt_chars"]["count"] == 12
+    assert report["sizes"]["response_chars"]["count"] == 12
+    assert report["counters"]["manual_check_fallbacks"] == 0
+
+
+def main():
+    """Run the instrumentation tests."""
+    print("Testing instrumentation...")
+    test_percentiles_histograms_and_prometheus()
+    print("✓ Percentiles, histograms and Prometheus text")
+    test_pipeline_records_each_stage()
+    print("✓ Pipeline stages are timed")
+
+
+if __name__ == "__main__":
+    main()
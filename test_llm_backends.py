@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test the pluggable LLM backends against the local HTTP stub server.
+"""
+
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_event_with_llm, classify_events
+from llm_backends import HTTPBackend, LLMError, StubBackend, SubprocessBackend, create_backend, load_backend_config
+from llm_stub import DEFAULT_CLASSIFICATION, StubLLMServer
+
+
+def test_http_backend_reuses_connections():
+    """Sequential requests from one thread share a single keep-alive connection."""
+    with StubLLMServer() as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        for _ in range(5):
+            assert json.loads(backend.complete("prompt")) == DEFAULT_CLASSIFICATION
+        backend.close()
+
+    assert server.request_count == 5
+    assert server.connection_count == 1, f"opened {server.connection_count} connections"
+
+
+def test_concurrent_workers_use_one_connection_each():
+    """Each worker thread keeps its own pooled connection."""
+    with StubLLMServer() as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        events = [{"notes": f"EVENT {i}"} for i in range(20)]
+        results = list(classify_events(events, [], [], workers=4, backend=backend))
+        backend.close()
+
+    assert results == [DEFAULT_CLASSIFICATION] * 20
+    assert server.connection_count <= 4
+
+
+def test_http_error_falls_back_to_manual_check():
+    """Server errors surface as LLMError and become MANUAL CHECK."""
+    def failing_responder(prompt):
+        raise RuntimeError("overloaded")
+
+    with StubLLMServer(failing_responder) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        try:
+            backend.complete("prompt")
+            assert False, "expected LLMError"
+        except LLMError as e:
+            assert e.status == 500
+        classification = classify_event_with_llm({"notes": "x"}, [], [], backend)
+        backend.close()
+
+    assert set(classification.values()) == {"MANUAL CHECK"}
+
+
+def test_backend_selected_by_config():
+    """The backend and model come from configuration rather than code."""
+    config = load_backend_config(overrides={"backend": "subprocess", "model": "some-model", "llm_path": "/opt/llm"})
+    backend = create_backend(config)
+    assert isinstance(backend, SubprocessBackend)
+    assert backend.model == "some-model"
+    assert backend.llm_path == "/opt/llm"
+
+    backend = create_backend(load_backend_config(overrides={"backend": "stub"}))
+    try:
+        assert isinstance(backend, StubBackend)
+        assert json.loads(backend.complete("prompt")) == DEFAULT_CLASSIFICATION
+    finally:
+        backend.close()
+
+
+def main():
+    """Run the backend tests."""
+    print("Testing LLM backends...")
+    test_http_backend_reuses_connections()
+    print("✓ HTTP backend reuses keep-alive connections")
+    test_concurrent_workers_use_one_connection_each()
+    print("✓ Concurrent workers each keep one pooled connection")
+    test_http_error_falls_back_to_manual_check()
+    print("✓ HTTP errors fall back to MANUAL CHECK")
+    test_backend_selected_by_config()
+    print("✓ Backend and model are selected by config")
+
+
+if __name__ == "__main__":
+    main()
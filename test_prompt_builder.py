@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test the prompt builder: the cacheable prefix, its cache_control marking and cache-token
+accounting, shared-builder reuse and explicitly passed builders.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import PromptBuilder, classify_event_with_llm, classify_events
+from llm_backends import HTTPBackend, MeteredBackend
+from llm_stub import COMPACT_MARKER, DEFAULT_CLASSIFICATION, StubLLMServer, default_responder
+
+GREEN = [{"notes": "A MAN FIRED SHOTS AT A CAMPAIGN OFFICE", "attack_type": "SHOOTING"}]
+YELLOW = [{"notes": "A WOMAN WAS STABBED OUTSIDE A BAR", "attack_type": "STABBING"}]
+
+
+def test_prefix_is_identical_and_precedes_the_event():
+    """Every prompt starts with the same prefix bytes, followed by its own event section."""
+    builder = PromptBuilder(list(GREEN), list(YELLOW))
+    prefix = builder.prefix.encode('utf-8')
+    events = [{"notes": "SHOTS FIRED AT A RALLY", "tags": "CROWD SIZE=NO REPORT"}, {"notes": "A CAR RAMMED PROTESTERS"}]
+    prompts = [builder.build(event).encode('utf-8') for event in events]
+    prompts.append(builder.build_batch(list(enumerate(events))).encode('utf-8'))
+
+    for prompt in prompts:
+        assert prompt[:len(prefix)] == prefix
+    for event, prompt in zip(events, prompts):
+        assert prompt[len(prefix):].lstrip().startswith(b"EVENT TO CLASSIFY:")
+        assert event["notes"].encode('utf-8') in prompt[len(prefix):]
+        assert event["notes"].encode('utf-8') not in prefix
+    # Rendering is deterministic, so separate runs send the same prefix too.
+    assert PromptBuilder(list(GREEN), list(YELLOW)).prefix.encode('utf-8') == prefix
+
+
+def test_prefix_is_marked_for_caching_in_the_payload():
+    """The HTTP backend sends the prefix as its own block carrying cache_control."""
+    builder = PromptBuilder(list(GREEN), list(YELLOW))
+    prompt = builder.build({"notes": "SHOTS FIRED AT A RALLY"})
+    with StubLLMServer() as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        backend.complete(prompt, prefix_length=len(builder.prefix))
+        cached_request = server.last_request
+        backend.complete(prompt)
+        plain_request = server.last_request
+        backend.close()
+
+    blocks = cached_request["messages"][0]["content"]
+    assert blocks == [
+        {"type": "text", "text": builder.prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": prompt[len(builder.prefix):]},
+    ]
+    assert plain_request["messages"][0]["content"] == prompt
+
+
+def test_cache_tokens_are_accounted():
+    """The first call writes the prefix to the cache and later calls read it, as reported by the provider."""
+    builder = PromptBuilder(list(GREEN), list(YELLOW))
+    prefix_tokens = len(builder.prefix) // 4
+    events = [{"notes": f"EVENT NUMBER {i}"} for i in range(4)]
+    with StubLLMServer() as server:
+        backend = MeteredBackend(HTTPBackend(model="stub-model", api_url=server.url))
+        for event in events:
+            classify_event_with_llm(event, GREEN, YELLOW, backend, builder)
+        stats = backend.stats()
+        backend.close()
+
+    assert stats["calls"] == 4
+    assert stats["cache_write_tokens"] == prefix_tokens
+    assert stats["cache_read_tokens"] == 3 * prefix_tokens
+    # Uncached input is just the event sections.
+    sections = [builder.build(event)[len(builder.prefix):] for event in events]
+    assert stats["input_tokens"] == sum(len(section) // 4 for section in sections)
+    assert stats["output_tokens"] > 0
+
+    # Backends without provider usage report zeros.
+    assert set(MeteredBackend(HTTPBackend(model="stub-model")).stats()[name] for name in
+               ("input_tokens", "output_tokens", "cache_write_tokens", "cache_read_tokens")) == {0}
+
+
+def test_shared_builders_are_bounded():
+    """Builders for throwaway example lists are evicted instead of piling up."""
+    green, yellow = list(GREEN), list(YELLOW)
+    builder = PromptBuilder.for_examples(green, yellow)
+    assert PromptBuilder.for_examples(green, yellow) is builder
+
+    for _ in range(PromptBuilder.MAX_SHARED_BUILDERS * 3):
+        PromptBuilder.for_examples(list(GREEN), list(YELLOW))
+    assert len(PromptBuilder._builders) <= PromptBuilder.MAX_SHARED_BUILDERS
+    # An evicted builder is rendered again for the same lists, not confused with another.
+    assert PromptBuilder.for_examples(green, yellow).green_examples is green
+
+
+def test_explicit_builder_is_used_for_every_prompt():
+    """A run's builder reaches single, batch and fallback requests without being registered globally."""
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return default_responder(prompt)
+
+    green, yellow = list(GREEN), list(YELLOW)
+    builder = PromptBuilder(green, yellow, compact=True)
+    events = [{"notes": f"EVENT {i}"} for i in range(5)]
+    with StubLLMServer(responder) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        for batch_size in (1, 3):
+            results = list(classify_events(events, green, yellow, backend=backend, batch_size=batch_size, builder=builder))
+            assert results == [DEFAULT_CLASSIFICATION] * 5
+        backend.close()
+
+    # Batches of 3 and 2 events, after five single-event prompts.
+    assert len(prompts) == 7 and all(COMPACT_MARKER in prompt for prompt in prompts)
+    assert builder.event_count == 10
+    assert not PromptBuilder.for_examples(green, yellow).compact
+
+
+def main():
+    """Run the prompt builder tests."""
+    print("Testing prompt builder...")
+    test_prefix_is_identical_and_precedes_the_event()
+    print("✓ Prefix identical across events and placed first")
+    test_prefix_is_marked_for_caching_in_the_payload()
+    print("✓ Prefix sent with cache_control")
+    test_cache_tokens_are_accounted()
+    print("✓ Cache writes and reads accounted")
+    test_shared_builders_are_bounded()
+    print("✓ Shared builders are bounded")
+    test_explicit_builder_is_used_for_every_prompt()
+    print("✓ Explicit builder used for every prompt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test selective reclassification of an existing enhanced output.
+"""
+
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import classification_script
+from classification_script import reclassification_reason
+from event_io import iter_event_file, open_event_writer
+from llm_stub import DEFAULT_CLASSIFICATION, StubLLMServer
+
+REPAIR_MARKER = "An earlier answer for the event below"
+
+
+def _events():
+    manual = dict(DEFAULT_CLASSIFICATION, target="MANUAL CHECK")
+    return [
+        dict(DEFAULT_CLASSIFICATION, notes="FINE ONE", state="Texas"),
+        dict(manual, notes="NEEDS A LOOK", state="Ohio"),
+        dict(DEFAULT_CLASSIFICATION, notes="BAD TARGET", state="Ohio", target="EVERYONE"),
+        dict(DEFAULT_CLASSIFICATION, notes="RESPELLED", state="Texas", attack_type="assault"),
+        dict(DEFAULT_CLASSIFICATION, notes="FINE TWO", state="Maine"),
+    ]
+
+
+def _reclassify(tmp, events, responder, extra_args=()):
+    path = os.path.join(tmp, 'enhanced.jsonl')
+    with open_event_writer(path) as writer:
+        for event in events:
+            writer.write(event)
+    config = os.path.join(tmp, 'backend.json')
+    with StubLLMServer(responder) as server:
+        with open(config, 'w', encoding='utf-8') as f:
+            json.dump({"backend": "http", "api_url": server.url, "model": "stub-model"}, f)
+        classification_script.main(['--reclassify', path, '--config', config, '--no-cache',
+                                    '--workers', '2'] + list(extra_args))
+    return path
+
+
+def test_selection_criteria():
+    events = _events()
+    criteria = ('manual-check', 'invalid')
+    assert [reclassification_reason(e, criteria) for e in events] == [None, 'manual-check', 'invalid', None, None]
+    assert reclassification_reason(events[0], [], {"state": "Texas"}) == 'predicate'
+    assert reclassification_reason(events[0], [], {"state": "Texas", "notes": "OTHER"}) is None
+
+
+def test_only_selected_rows_are_sent_and_merged_in_place():
+    """MANUAL CHECK rows are classified again, invalid fields repaired, and everything else kept in order."""
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        if REPAIR_MARKER in prompt:
+            return json.dumps({"target": "INSTITUTION"})
+        return json.dumps(dict(DEFAULT_CLASSIFICATION, target="CIVILIANS"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _reclassify(tmp, _events(), responder)
+        merged = list(iter_event_file(path))
+
+    assert len(prompts) == 2
+    assert sum(REPAIR_MARKER in prompt for prompt in prompts) == 1
+    assert all("FINE" not in prompt for prompt in prompts)
+    assert [e["notes"] for e in merged] == ["FINE ONE", "NEEDS A LOOK", "BAD TARGET", "RESPELLED", "FINE TWO"]
+    assert merged[0] == _events()[0]
+    assert merged[1]["target"] == "CIVILIANS"
+    assert merged[2]["target"] == "INSTITUTION"
+    assert merged[3]["attack_type"] == "ASSAULT"
+    assert merged[4] == _events()[4]
+
+
+def test_where_selects_rows_to_classify_again():
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return json.dumps(dict(DEFAULT_CLASSIFICATION, target="CIVILIANS"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _reclassify(tmp, _events(), responder, ['--where', 'state=Texas'])
+        merged = list(iter_event_file(path))
+
+    # Only the predicate: the MANUAL CHECK row is left alone.
+    assert len(prompts) == 2
+    assert [e["target"] for e in merged] == ["CIVILIANS", "MANUAL CHECK", "EVERYONE", "CIVILIANS", DEFAULT_CLASSIFICATION["target"]]
+
+
+def main():
+    """Run the reclassification tests."""
+    print("Testing selective reclassification...")
+    test_selection_criteria()
+    print("✓ Rows selected by MANUAL CHECK, invalid values and predicates")
+    test_only_selected_rows_are_sent_and_merged_in_place()
+    print("✓ Only selected rows sent to the LLM and merged back in order")
+    test_where_selects_rows_to_classify_again()
+    print("✓ --where selects rows to classify again")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the persistent LLM response cache.
+"""
+
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_event_with_llm
+from llm_backends import HTTPBackend
+from llm_stub import StubLLMServer
+from response_cache import CachedBackend, ResponseCache
+
+
+def test_hits_misses_and_persistence():
+    """Responses persist across cache instances and are keyed by model and prompt."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite')
+        cache = ResponseCache(path)
+        assert cache.get("model-a", "prompt") is None
+        cache.put("model-a", "prompt", "response")
+        cache.close()
+
+        cache = ResponseCache(path)
+        assert cache.get("model-a", "prompt") == "response"
+        assert cache.get("model-b", "prompt") is None
+        assert cache.get("model-a", "prompt!") is None
+        stats = cache.stats()
+        cache.close()
+
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 1
+
+
+def test_eviction_by_size_and_age():
+    """Least recently used entries go first; expired entries are never served."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'), max_entries=2)
+        for i in range(3):
+            cache.put("m", f"prompt {i}", "x")
+            time.sleep(0.01)
+        cache.get("m", "prompt 0")
+        cache.evict()
+        assert cache.get("m", "prompt 0") == "x"
+        assert cache.get("m", "prompt 1") is None
+        assert cache.get("m", "prompt 2") == "x"
+        cache.close()
+
+        cache = ResponseCache(os.path.join(tmp, 'aged.sqlite'), max_age_days=1 / 86400)
+        cache.put("m", "prompt", "x")
+        time.sleep(1.1)
+        assert cache.get("m", "prompt") is None
+        assert cache.evict() == 1
+        cache.close()
+
+
+def test_cached_backend_only_sends_new_prompts():
+    """Unchanged events are served locally; unusable responses are not cached."""
+    responses = iter(['not json', 'still not json'])
+
+    def responder(prompt):
+        return next(responses, None) or '{"attack_type": "SHOOTING", "extremist_beliefs_classification": "NO", ' \
+            '"connection_to_organized_extremist_group_classification": "N/A", "sole_perpetrator_classification": "YES", ' \
+            '"issue_type": "LABOR", "target": "INSTITUTION", "political_violence_classification": "POLITICAL VIOLENCE"}'
+
+    with tempfile.TemporaryDirectory() as tmp, StubLLMServer(responder) as server:
+        cache = ResponseCache(os.path.join(tmp, 'cache.sqlite'))
+        backend = CachedBackend(HTTPBackend(model="stub-model", api_url=server.url), cache)
+        event = {"notes": "A SHOOTING AT A UNION HALL"}
+
+        assert classify_event_with_llm(event, [], [], backend)["attack_type"] == "MANUAL CHECK"
+        assert classify_event_with_llm(event, [], [], backend)["attack_type"] == "MANUAL CHECK"
+        assert classify_event_with_llm(event, [], [], backend)["attack_type"] == "SHOOTING"
+        assert classify_event_with_llm(event, [], [], backend)["attack_type"] == "SHOOTING"
+        backend.close()
+
+    assert server.request_count == 3
+    assert cache.hits == 1
+
+
+def main():
+    """Run the response cache tests."""
+    print("Testing response cache...")
+    test_hits_misses_and_persistence()
+    print("✓ Responses persist and are keyed by model and prompt")
+    test_eviction_by_size_and_age()
+    print("✓ Size and age eviction")
+    test_cached_backend_only_sends_new_prompts()
+    print("✓ Only uncached prompts reach the model")
+
+
+if __name__ == "__main__":
+    main()
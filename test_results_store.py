@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test the indexed SQLite results store.
+"""
+
+import io
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from results_store import INDEXED_COLUMNS, ResultsStore, print_crosstab
+
+EVENTS = [
+    {"event_type": "RIOTS", "state": "TEXAS", "event_date": "2024-01-02", "attack_type": "SHOOTING", "issue_type": "ELECTIONS/VOTING/POLITICS"},
+    {"event_type": "RIOTS", "state": "OHIO", "event_date": "2024-01-03", "attack_type": "SHOOTING", "issue_type": "LABOR"},
+    {"event_type": "PROTESTS", "state": "TEXAS", "event_date": "2024-02-01", "attack_type": "ASSAULT", "issue_type": "ELECTIONS/VOTING/POLITICS"},
+    {"event_type": "RIOTS", "state": "TEXAS", "event_date": "2024-02-05", "attack_type": "SHOOTING", "issue_type": "ELECTIONS/VOTING/POLITICS",
+     "target": "PUBLIC FIGURE"},
+]
+
+
+def test_query_count_and_crosstab():
+    """Filters use the indexes, results keep input order, and unknown columns are rejected."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.sqlite')
+        with ResultsStore(path) as store:
+            assert store.write_events(EVENTS) == 4
+
+        with ResultsStore(path) as store:
+            filters = {"attack_type": "SHOOTING", "state": "TEXAS", "issue_type": "ELECTIONS/VOTING/POLITICS"}
+            assert store.count(filters) == 2
+            rows = list(store.query(filters, columns=["event_date", "target"]))
+            assert rows == [{"event_date": "2024-01-02", "target": None},
+                            {"event_date": "2024-02-05", "target": "PUBLIC FIGURE"}]
+
+            plan = " ".join(str(row) for row in store._conn.execute(
+                'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM events WHERE "state" = ?', ("TEXAS",)))
+            assert "events_state" in plan
+
+            table = store.crosstab("attack_type", "state")
+            assert table == {("SHOOTING", "TEXAS"): 2, ("SHOOTING", "OHIO"): 1, ("ASSAULT", "TEXAS"): 1}
+            output = io.StringIO()
+            print_crosstab(table, output)
+            assert output.getvalue().splitlines() == [",OHIO,TEXAS,TOTAL", "ASSAULT,0,1,1", "SHOOTING,1,2,3"]
+
+            try:
+                store.count({"state; DROP TABLE events": "x"})
+                assert False, "unknown column accepted"
+            except ValueError:
+                pass
+
+            indexes = {row[1] for row in store._conn.execute("PRAGMA index_list(events)")}
+            present = [column for column in INDEXED_COLUMNS if column in store.columns]
+            assert indexes == {f"events_{column}" for column in present}
+
+
+def main():
+    """Run the results store tests."""
+    print("Testing results store...")
+    test_query_count_and_crosstab()
+    print("✓ Indexed queries, counts and cross-tabs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test rate limiting, retries and adaptive concurrency against a failure-injecting stub.
+"""
+
+import os
+import sys
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_event_with_llm, classify_events
+from llm_backends import HTTPBackend, LLMError, LLMTimeoutError
+from llm_stub import DEFAULT_CLASSIFICATION, StubError, StubLLMServer, default_responder, flaky_responder
+from scheduler import AdaptiveLimiter, ScheduledBackend, TokenBucket, is_retryable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_waits_for_refill():
+    """Bursts up to capacity pass at once; later requests wait for the refill rate."""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+    assert abs(bucket.acquire() - 0.1) < 1e-9
+    # Requests larger than the bucket wait for a full bucket instead of forever.
+    assert abs(bucket.acquire(50) - 0.2) < 1e-9
+
+
+def test_retryable_errors():
+    assert is_retryable(LLMTimeoutError("timed out"))
+    assert is_retryable(LLMError("HTTP 429", status=429))
+    assert is_retryable(LLMError("HTTP 529", status=529))
+    assert not is_retryable(LLMError("HTTP 400", status=400))
+    assert is_retryable(LLMError("Error: rate limit exceeded"))
+    assert not is_retryable(LLMError("Unknown model: claude-9"))
+
+
+def test_transient_failures_are_retried():
+    """429s and overload errors are retried with backoff instead of becoming MANUAL CHECK."""
+    failures = {"left": 3}
+    lock = threading.Lock()
+
+    def responder(prompt):
+        with lock:
+            if failures["left"]:
+                failures["left"] -= 1
+                raise StubError(429 if failures["left"] % 2 else 529)
+        return default_responder(prompt)
+
+    sleeps = []
+    with StubLLMServer(responder) as server:
+        backend = ScheduledBackend(HTTPBackend(model="stub-model", api_url=server.url), sleep=sleeps.append)
+        classification = classify_event_with_llm({"notes": "x"}, [], [], backend)
+        stats = backend.stats()
+        backend.close()
+
+    assert classification == DEFAULT_CLASSIFICATION
+    assert server.request_count == 4
+    assert stats["retries"] == 3 and stats["failures"] == 0
+    # Full jitter: each delay lies under its doubling cap.
+    assert all(0 <= delay <= cap for delay, cap in zip(sleeps, [1, 2, 4]))
+
+
+def test_permanent_failures_are_not_retried():
+    def responder(prompt):
+        raise StubError(400, "bad request")
+
+    with StubLLMServer(responder) as server:
+        backend = ScheduledBackend(HTTPBackend(model="stub-model", api_url=server.url), sleep=lambda s: None)
+        classification = classify_event_with_llm({"notes": "x"}, [], [], backend)
+        backend.close()
+
+    assert server.request_count == 1
+    assert set(classification.values()) == {"MANUAL CHECK"}
+
+
+def test_limiter_halves_on_overload_and_grows_back():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(8, clock=clock)
+    limiter.on_overload()
+    limiter.on_overload()  # same burst, within the cooldown
+    assert limiter.limit == 4
+    clock.now += 5
+    limiter.on_overload()
+    assert limiter.limit == 2
+    for _ in range(2 + 3):
+        limiter.on_success(0.1)
+    assert limiter.limit == 4
+    limiter = AdaptiveLimiter(4, latency_target=1.0, clock=clock)
+    limiter.on_success(3.0)
+    assert limiter.limit == 2
+
+
+def test_concurrent_run_survives_injected_failures():
+    """With a third of requests failing, every event still gets a real classification."""
+    with StubLLMServer(flaky_responder(0.3, status=529, seed=7)) as server:
+        backend = ScheduledBackend(HTTPBackend(model="stub-model", api_url=server.url), max_retries=10,
+                                   concurrency=4, sleep=lambda s: None)
+        events = [{"notes": f"EVENT {i}"} for i in range(40)]
+        results = list(classify_events(events, [], [], workers=4, backend=backend))
+        stats = backend.stats()
+        backend.close()
+
+    assert results == [DEFAULT_CLASSIFICATION] * 40
+    assert stats["retries"] > 0 and stats["failures"] == 0
+    assert server.request_count == 40 + stats["retries"]
+
+
+def main():
+    """Run the scheduler tests."""
+    print("Testing scheduler...")
+    test_token_bucket_waits_for_refill()
+    print("✓ Token bucket rate limits")
+    test_retryable_errors()
+    test_transient_failures_are_retried()
+    test_permanent_failures_are_not_retried()
+    print("✓ Retries with backoff for transient failures only")
+    test_limiter_halves_on_overload_and_grows_back()
+    print("✓ AIMD concurrency limit")
+    test_concurrent_run_survives_injected_failures()
+    print("✓ Concurrent run survives injected failures")
+
+
+if __name__ == "__main__":
+    main()
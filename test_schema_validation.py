@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test schema validation of LLM responses and per-field repair requests.
+"""
+
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classification_script import classify_batch, classify_event_with_llm, normalize_field_value, validate_classification
+from llm_backends import HTTPBackend, MeteredBackend
+from llm_stub import DEFAULT_CLASSIFICATION, StubLLMServer
+
+REPAIR_MARKER = "An earlier answer for the event below"
+
+
+def test_normalizes_case_whitespace_and_near_misses():
+    assert normalize_field_value("attack_type", "PROPERTY_DESTRUCTION") == "PROPERTY DESTRUCTION"
+    assert normalize_field_value("attack_type", "  fire / explosive ") == "FIRE/EXPLOSIVE"
+    assert normalize_field_value("issue_type", "OTHER - CHECK MANUALLY") == "OTHER — CHECK MANUALLY"
+    assert normalize_field_value("issue_type", "Black Lives Mater") == "BLACK LIVES MATTER"
+    assert normalize_field_value("connection_to_organized_extremist_group_classification", "n/a") == "N/A"
+    assert normalize_field_value("target", "manual check") == "MANUAL CHECK"
+    # Not an allowed value, and not close to exactly one.
+    assert normalize_field_value("target", "OTHER") is None
+    assert normalize_field_value("extremist_beliefs_classification", "MAYBE") is None
+    assert normalize_field_value("attack_type", 3) is None
+
+    data = dict(DEFAULT_CLASSIFICATION, attack_type="assault", target="OTHER")
+    del data["issue_type"]
+    valid, invalid = validate_classification(data)
+    assert valid["attack_type"] == "ASSAULT"
+    assert invalid == ["issue_type", "target"]
+
+    # The same response from a backend is not taken as is: the near miss is fixed
+    # and the two invalid fields are asked for again.
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        if REPAIR_MARKER in prompt:
+            return json.dumps({"issue_type": "LABOR", "target": "INSTITUTION"})
+        return json.dumps(data)
+
+    with StubLLMServer(responder) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        classification = classify_event_with_llm({"notes": "STRIKERS SMASHED A WINDOW"}, [], [], backend)
+        backend.close()
+    assert classification == dict(DEFAULT_CLASSIFICATION, attack_type="ASSAULT", issue_type="LABOR", target="INSTITUTION")
+    assert len(prompts) == 2
+
+
+def test_invalid_fields_get_a_short_repair_request():
+    """Only the invalid fields are asked for again, in a much shorter prompt."""
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        if REPAIR_MARKER in prompt:
+            return json.dumps({"target": "Institution", "issue_type": "LABOR"})
+        return json.dumps(dict(DEFAULT_CLASSIFICATION, target="OTHER", issue_type="LABOUR",
+                               attack_type="PROPERTY_DESTRUCTION"))
+
+    with StubLLMServer(responder) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        classification = classify_event_with_llm({"notes": "STRIKERS SMASHED A WINDOW"}, [], [], backend)
+        backend.close()
+
+    # LABOUR is a near miss of LABOR and is fixed without asking again.
+    assert classification == dict(DEFAULT_CLASSIFICATION, target="INSTITUTION", issue_type="LABOR",
+                                  attack_type="PROPERTY DESTRUCTION")
+    assert len(prompts) == 2
+    repair = prompts[1]
+    assert "TARGET CLASSIFICATIONS" in repair and "ISSUE_TYPE CLASSIFICATIONS" not in repair
+    assert "STRIKERS SMASHED A WINDOW" in repair
+    assert len(repair) < len(prompts[0]) / 3
+
+
+def test_unrepaired_fields_alone_become_manual_check():
+    def responder(prompt):
+        if REPAIR_MARKER in prompt:
+            return "I am not sure."
+        return json.dumps(dict(DEFAULT_CLASSIFICATION, target="EVERYONE"))
+
+    with StubLLMServer(responder) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        classification = classify_event_with_llm({"notes": "x"}, [], [], backend)
+        backend.close()
+
+    assert classification == dict(DEFAULT_CLASSIFICATION, target="MANUAL CHECK")
+
+
+def test_batch_entries_with_invalid_fields_are_repaired():
+    """A batch entry with a bad field costs one repair request, not a re-sent batch."""
+    def responder(prompt):
+        if REPAIR_MARKER in prompt:
+            return json.dumps({"sole_perpetrator_classification": "NO"})
+        return json.dumps([
+            dict(DEFAULT_CLASSIFICATION, event_index=0),
+            dict(DEFAULT_CLASSIFICATION, event_index=1, sole_perpetrator_classification="UNCLEAR"),
+            dict(DEFAULT_CLASSIFICATION, event_index=2),
+        ])
+
+    with StubLLMServer(responder) as server:
+        backend = MeteredBackend(HTTPBackend(model="stub-model", api_url=server.url))
+        results = classify_batch([{"notes": f"EVENT {i}"} for i in range(3)], [], [], backend)
+        calls = backend.stats()["calls"]
+        backend.close()
+
+    assert results[1] == dict(DEFAULT_CLASSIFICATION, sole_perpetrator_classification="NO")
+    assert results[0] == results[2] == DEFAULT_CLASSIFICATION
+    assert calls == 2
+
+
+def main():
+    """Run the schema validation tests."""
+    print("Testing schema validation...")
+    test_normalizes_case_whitespace_and_near_misses()
+    print("✓ Values normalized against the definition lists")
+    test_invalid_fields_get_a_short_repair_request()
+    test_unrepaired_fields_alone_become_manual_check()
+    print("✓ Invalid fields repaired with a short follow-up request")
+    test_batch_entries_with_invalid_fields_are_repaired()
+    print("✓ Batch entries repaired individually")
+
+
+if __name__ == "__main__":
+    main()
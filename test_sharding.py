@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test deterministic sharding and the ordered merge of shard outputs.
+"""
+
+import csv
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import classification_script
+import sharding
+from checkpoint import event_fingerprint
+from event_io import iter_event_file, open_event_writer
+from sharding import merge_shards, parse_shard, shard_of, shard_path
+
+
+def _write_csv(path, count):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['event_id', 'notes'])
+        writer.writeheader()
+        for i in range(count):
+            writer.writerow({'event_id': str(i), 'notes': f"EVENT NUMBER {i}"})
+
+
+def _write_shard(path, rows):
+    with open_event_writer(path) as writer:
+        for row in rows:
+            writer.write({'event_id': str(row), 'source_row': row})
+
+
+def test_parse_and_assign_shards():
+    assert parse_shard("0/4") == (0, 4)
+    for text in ("4/4", "-1/4", "1", "a/b", "0/0"):
+        try:
+            parse_shard(text)
+            assert False, f"accepted shard {text}"
+        except ValueError:
+            pass
+    assert shard_path("out/us_data_enhanced.json", 1, 3) == "out/us_data_enhanced.shard-1-of-3.json"
+
+    # Assignment depends only on content, and spreads events over every shard.
+    hashes = [event_fingerprint({'notes': f"EVENT {i}"}) for i in range(300)]
+    shards = [shard_of(h, 3) for h in hashes]
+    assert shards == [shard_of(h, 3) for h in hashes]
+    assert all(shards.count(i) > 60 for i in range(3))
+
+
+def test_merge_restores_order_and_reports_gaps_and_repeats():
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = os.path.join(tmp, 'a.jsonl'), os.path.join(tmp, 'b.json')
+        _write_shard(a, [0, 3, 4, 4])
+        _write_shard(b, [1, 5])
+        output = os.path.join(tmp, 'merged.jsonl')
+        result = merge_shards([b, a], output, expected_rows=8)
+        merged = list(iter_event_file(output))
+
+    assert [e['event_id'] for e in merged] == ['0', '1', '3', '4', '5']
+    assert all('source_row' not in e for e in merged)
+    assert result['missing'] == [2, 6, 7]
+    assert result['duplicated'] == [4]
+
+
+def test_sharded_runs_merge_to_the_unsharded_output():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'events.csv')
+        _write_csv(source, 30)
+        common = ['--backend', 'stub', '--no-cache', '--input', source]
+        full = os.path.join(tmp, 'full.jsonl')
+        classification_script.main(common + ['--output', full, '--checkpoint', os.path.join(tmp, 'full.ckpt')])
+
+        shards = []
+        for i in range(3):
+            shards.append(os.path.join(tmp, f'shard{i}.jsonl'))
+            classification_script.main(common + ['--shard', f'{i}/3', '--output', shards[-1],
+                                                 '--checkpoint', os.path.join(tmp, f'shard{i}.ckpt')])
+        merged = os.path.join(tmp, 'merged.jsonl')
+        sharding.main(shards + ['--input', source, '--output', merged])
+        assert list(iter_event_file(merged)) == list(iter_event_file(full))
+
+        # A lost shard is reported and the output left alone.
+        try:
+            sharding.main(shards[:2] + ['--input', source, '--output', os.path.join(tmp, 'partial.jsonl')])
+            assert False, "incomplete merge accepted"
+        except SystemExit:
+            pass
+        assert not os.path.exists(os.path.join(tmp, 'partial.jsonl'))
+
+
+def main():
+    """Run the sharding tests."""
+    print("Testing sharding...")
+    test_parse_and_assign_shards()
+    print("✓ Shards assigned by a stable content hash")
+    test_merge_restores_order_and_reports_gaps_and_repeats()
+    print("✓ Merge restores input order and reports missing and duplicated rows")
+    test_sharded_runs_merge_to_the_unsharded_output()
+    print("✓ Sharded runs merge to the unsharded output")
+
+
+if __name__ == "__main__":
+    main()
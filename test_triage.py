@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test the local triage classifier and LLM routing.
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import classification_script
+from classification_script import REQUIRED_FIELDS, classify_events
+from event_io import iter_event_file
+from llm_backends import HTTPBackend
+from llm_stub import DEFAULT_CLASSIFICATION, StubLLMServer
+from results_store import SOURCE_COLUMN
+from triage import TriageModel, TriageRouter, featurize, fit_isotonic, load_training_data
+
+SHOOTING = dict(DEFAULT_CLASSIFICATION, attack_type="SHOOTING", target="CIVILIANS")
+VEHICLE = dict(DEFAULT_CLASSIFICATION, attack_type="VEHICLE", target="INSTITUTION")
+
+
+def _training_set(count=200):
+    events, labels = [], []
+    for i in range(count):
+        if i % 2:
+            events.append({"notes": f"A GUNMAN FIRED SHOTS AT A CROWD IN TOWN {i}", "sub_event_type": "ATTACK"})
+            labels.append(dict(SHOOTING))
+        else:
+            events.append({"notes": f"A DRIVER RAMMED A CAR INTO THE OFFICE IN TOWN {i}", "sub_event_type": "VIOLENT DEMONSTRATION"})
+            labels.append(dict(VEHICLE))
+    return events, labels
+
+
+def test_features_are_stable_sparse_rows():
+    features, starts = featurize([{"notes": "SHOTS FIRED"}, {}], 1 << 12)
+    assert starts.tolist()[0] == 0 and len(starts) == 3
+    # The empty event still has its bias feature.
+    assert starts[2] - starts[1] == 1
+    again, _ = featurize([{"notes": "SHOTS FIRED"}], 1 << 12)
+    assert np.array_equal(features[:starts[1]], again)
+
+
+def test_learns_confident_predictions_and_round_trips():
+    events, labels = _training_set()
+    model = TriageModel.train(events, labels, REQUIRED_FIELDS, n_features=1 << 12)
+    predictions, confidence = model.predict([
+        {"notes": "A GUNMAN FIRED SHOTS AT A CROWD IN TOWN 999", "sub_event_type": "ATTACK"},
+        {"notes": "A DRIVER RAMMED A CAR INTO THE OFFICE", "sub_event_type": "VIOLENT DEMONSTRATION"},
+        {"notes": "A GUNMAN RAMMED A CAR"},
+    ])
+    assert predictions[0] == SHOOTING
+    assert predictions[1] == VEHICLE
+    assert confidence[0] > 0.9 and confidence[1] > 0.9
+    assert confidence[2] < confidence[0]
+    assert all(accuracy == 1.0 for accuracy in model.evaluation["field_accuracy"].values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.npz')
+        model.save(path)
+        loaded = TriageModel.load(path)
+    _, loaded_confidence = loaded.predict([{"notes": "A GUNMAN RAMMED A CAR"}])
+    assert np.allclose(loaded_confidence, confidence[2:])
+
+
+def test_joint_confidence_is_calibrated_on_whole_predictions():
+    # Correlated fields: products around 0.4 are right 90% of the time, around 0.1 half the time.
+    products = np.array([0.1] * 100 + [0.4] * 100)
+    correct = np.array([True, False] * 50 + [True] * 90 + [False] * 10)
+    points, probabilities = fit_isotonic(products, correct)
+    assert np.all(np.diff(points) >= 0) and np.all(np.diff(probabilities) >= 0)
+    confidence = np.interp([0.0, 0.1, 0.4, 1.0], points, probabilities)
+    assert confidence[0] == 0.0
+    # Each block maps to a little under its observed rate, and nothing above the top block's.
+    assert 0.4 < confidence[1] < 0.5 and 0.83 < confidence[2] < 0.9
+    assert confidence[3] == confidence[2]
+    assert 0.4 < np.interp(0.25, points, probabilities) < 0.9
+
+    # A few right answers at the very top don't make a block of their own.
+    points, probabilities = fit_isotonic(np.append(products, [0.95, 0.99]), np.append(correct, [True, True]))
+    assert probabilities.max() < 0.9
+
+
+def test_confidence_threshold_holds_on_fresh_events():
+    """Events at or above a confidence of 0.9 are right at least 90% of the time."""
+    def sample(rng, count, accuracy):
+        scores = rng.random(count)
+        return scores, rng.random(count) < accuracy(scores)
+
+    # Scores that overstate how often whole predictions are right: no region reaches
+    # 90%, so nothing may reach the threshold. And a region that is reliably right.
+    overconfident = lambda scores: 0.84 * scores
+    reliable_top = lambda scores: np.where(scores > 0.7, 0.97, 0.5)
+    for accuracy, expect_coverage in ((overconfident, False), (reliable_top, True)):
+        for seed in range(20):
+            rng = np.random.default_rng(seed)
+            calibration = fit_isotonic(*sample(rng, 500, accuracy))
+            scores, correct = sample(rng, 20000, accuracy)
+            accepted = np.interp(scores, *calibration) >= 0.9
+            assert accepted.any() == expect_coverage, seed
+            if accepted.any():
+                assert correct[accepted].mean() >= 0.9, seed
+
+    # The same holds end to end when a field's labels are noisy: 15% of attack
+    # types are wrong, so no whole prediction is right 90% of the time.
+    rng = np.random.default_rng(0)
+    events, labels = _training_set(600)
+    for row in labels:
+        if rng.random() < 0.15:
+            row["attack_type"] = "ARSON"
+    model = TriageModel.train(events, labels, REQUIRED_FIELDS, n_features=1 << 12)
+    assert model.evaluation["thresholds"]["0.9"]["coverage"] == 0.0
+    assert model.joint_confidence(np.ones(1))[0] < 0.9
+
+
+def test_only_low_confidence_events_reach_the_llm():
+    events, labels = _training_set()
+    router = TriageRouter(TriageModel.train(events, labels, REQUIRED_FIELDS, n_features=1 << 12), threshold=0.9)
+    prompts = []
+
+    def responder(prompt):
+        prompts.append(prompt)
+        return json.dumps(DEFAULT_CLASSIFICATION)
+
+    incoming = [
+        {"notes": "A GUNMAN FIRED SHOTS AT A CROWD IN TOWN 500", "sub_event_type": "ATTACK"},
+        {"notes": "PROTESTERS GATHERED PEACEFULLY"},
+        {"notes": "A DRIVER RAMMED A CAR INTO THE OFFICE IN TOWN 501", "sub_event_type": "VIOLENT DEMONSTRATION"},
+    ]
+    with StubLLMServer(responder) as server:
+        backend = HTTPBackend(model="stub-model", api_url=server.url)
+        results = list(classify_events(incoming, [], [], workers=2, backend=backend, triage=router))
+        backend.close()
+
+    assert results == [dict(SHOOTING, classification_source="triage"), DEFAULT_CLASSIFICATION,
+                       dict(VEHICLE, classification_source="triage")]
+    assert len(prompts) == 1 and "PROTESTERS GATHERED PEACEFULLY" in prompts[0]
+    assert (router.local, router.routed) == (2, 1)
+    assert abs(router.saved_fraction() - 2 / 3) < 1e-9
+
+
+def test_outputs_record_the_source_and_training_skips_triage_rows():
+    events, labels = _training_set()
+    with tempfile.TemporaryDirectory() as tmp:
+        model = os.path.join(tmp, 'model.npz')
+        TriageModel.train(events, labels, REQUIRED_FIELDS, n_features=1 << 12).save(model)
+        source = os.path.join(tmp, 'events.csv')
+        with open(source, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['notes', 'sub_event_type'])
+            writer.writeheader()
+            writer.writerow({"notes": "A GUNMAN FIRED SHOTS AT A CROWD IN TOWN 500", "sub_event_type": "ATTACK"})
+            writer.writerow({"notes": "PROTESTERS GATHERED PEACEFULLY", "sub_event_type": ""})
+        output = os.path.join(tmp, 'enhanced.jsonl')
+        classification_script.main(['--backend', 'stub', '--no-cache', '--input', source, '--output', output,
+                                    '--checkpoint', os.path.join(tmp, 'checkpoint.jsonl'), '--triage', model])
+        assert [event[SOURCE_COLUMN] for event in iter_event_file(output)] == ["triage", "llm"]
+        training_events, _ = load_training_data([output], [])
+
+        # Reclassified triage rows are marked as the LLM's.
+        reclassified = os.path.join(tmp, 'reclassified.jsonl')
+        classification_script.main(['--backend', 'stub', '--no-cache', '--reclassify', output, '--output', reclassified,
+                                    '--where', f'{SOURCE_COLUMN}=triage'])
+        assert [event[SOURCE_COLUMN] for event in iter_event_file(reclassified)] == ["llm", "llm"]
+
+        # Runs without triage keep the output columns unchanged.
+        default = os.path.join(tmp, 'default.jsonl')
+        classification_script.main(['--backend', 'stub', '--no-cache', '--input', source, '--output', default,
+                                    '--checkpoint', os.path.join(tmp, 'default_checkpoint.jsonl')])
+        assert all(SOURCE_COLUMN not in event for event in iter_event_file(default))
+    assert [event['notes'] for event in training_events] == ["PROTESTERS GATHERED PEACEFULLY"]
+
+
+def main():
+    """Run the triage tests."""
+    print("Testing triage classifier...")
+    test_features_are_stable_sparse_rows()
+    print("✓ Hashed n-gram features")
+    test_learns_confident_predictions_and_round_trips()
+    print("✓ Calibrated predictions, save and load")
+    test_joint_confidence_is_calibrated_on_whole_predictions()
+    print("✓ Joint confidence calibrated on whole predictions")
+    test_confidence_threshold_holds_on_fresh_events()
+    print("✓ A 0.9 threshold keeps only events right at least 90% of the time")
+    test_only_low_confidence_events_reach_the_llm()
+    print("✓ Only low-confidence events sent to the LLM")
+    test_outputs_record_the_source_and_training_skips_triage_rows()
+    print("✓ Triage outputs record their classification source; triage rows are not trained on")
+
+
+if __name__ == "__main__":
+    main()
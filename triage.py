@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Local first-pass classifier that triages events before they reach the LLM.
+
+One multinomial logistic regression per classification field is trained on
+hashed word n-grams of the notes, tags, event types and actors. Training data is past
+enhanced output (e.g. us_data_enhanced.json) plus the labeled green/yellow
+example rows. Probabilities are calibrated by temperature scaling on a held-out
+split. The fields are strongly correlated, so the product of their probabilities
+understates how often a whole prediction is right; an event's confidence is that
+product mapped by isotonic regression, fitted on whether held-out events had every
+field right. `classification_script.py --triage` keeps predictions at or above a
+threshold and sends only the rest to the LLM. Training and inference are
+CPU-only and vectorized with NumPy.
+
+    python triage.py train --output triage_model.npz
+    python classification_script.py --triage triage_model.npz --triage-threshold 0.95
+"""
+
+import argparse
+import json
+import zlib
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from event_io import iter_csv_rows, iter_event_file
+from example_index import LABEL_COLUMNS, tokenize
+from instrumentation import metrics
+from results_store import SOURCE_COLUMN, TRIAGE_SOURCE
+
+# Hashed feature space; collisions are rare at this size for a few thousand events.
+DEFAULT_FEATURES = 1 << 16
+
+# L2 penalty, full-batch Adam epochs and step size for fitting the weights.
+DEFAULT_L2 = 1e-4
+DEFAULT_EPOCHS = 100
+LEARNING_RATE = 0.05
+
+# Fraction of the training rows held out to fit temperatures and estimate accuracy.
+HOLDOUT_FRACTION = 0.2
+
+# Temperatures tried when calibrating the held-out probabilities.
+TEMPERATURES = np.geomspace(0.25, 16, 49)
+
+# Default confidence needed to keep a local classification.
+DEFAULT_THRESHOLD = 0.9
+
+# Fewest held-out rows behind any point of the joint confidence calibration.
+MIN_CALIBRATION_BLOCK = 30
+
+# Each calibration block maps to a one-sided 95% lower bound on its observed rate,
+# so a block that looks accurate on a few dozen rows isn't taken at face value.
+CALIBRATION_Z = 1.645
+
+# Confidence thresholds listed in the training report.
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+# Events predicted per vectorized call while routing.
+ROUTE_CHUNK_SIZE = 256
+
+# Columns whose whole values (split on ';') are features, with a short prefix each.
+VALUE_COLUMNS = {'event_type': 'E', 'sub_event_type': 'S', 'actor1': 'A', 'assoc_actor_1': 'A', 'actor2': 'B', 'tags': 'T'}
+
+# Columns whose words and word bigrams are features.
+TEXT_COLUMNS = {'notes': 'N', 'tags': 'W'}
+
+BIAS_FEATURE = '__bias__'
+
+
+def event_features(event: Dict[str, Any], n_features: int) -> np.ndarray:
+    """Distinct hashed feature ids of an event, always including a bias feature."""
+    tokens = {BIAS_FEATURE}
+    for column, prefix in VALUE_COLUMNS.items():
+        for value in str(event.get(column) or '').upper().split(';'):
+            if value.strip():
+                tokens.add(f"{prefix}={value.strip()}")
+    for column, prefix in TEXT_COLUMNS.items():
+        tokens.update(f"{prefix}:{token}" for token in tokenize(str(event.get(column) or '')))
+    return np.unique(np.fromiter((zlib.crc32(token.encode('utf-8')) % n_features for token in tokens),
+                                 dtype=np.int64, count=len(tokens)))
+
+
+def featurize(events: Iterable[Dict[str, Any]], n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse binary feature rows as (feature ids, row start offsets), like a CSR matrix without values."""
+    rows = [event_features(event, n_features) for event in events]
+    starts = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=starts[1:])
+    return (np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)), starts
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=0, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=0, keepdims=True)
+
+
+class FieldModel:
+    """Softmax regression over hashed binary features for one field, with a calibration temperature."""
+
+    def __init__(self, classes: List[str], weights: np.ndarray, temperature: float = 1.0):
+        self.classes = classes
+        self.weights = weights
+        self.temperature = temperature
+
+    @classmethod
+    def fit(cls, features: np.ndarray, starts: np.ndarray, labels: np.ndarray, classes: List[str],
+            n_features: int, l2: float = DEFAULT_L2, epochs: int = DEFAULT_EPOCHS) -> 'FieldModel':
+        """Minimize L2-regularized cross-entropy with full-batch Adam; labels are class ids per row."""
+        rows = len(starts) - 1
+        row_of_feature = np.repeat(np.arange(rows), np.diff(starts))
+        # Only features seen in training get nonzero weights, so optimize those columns alone.
+        columns, compact = np.unique(features, return_inverse=True)
+        by_column = np.argsort(compact, kind='stable')
+        column_starts = np.searchsorted(compact[by_column], np.arange(len(columns)))
+        row_of_sorted = row_of_feature[by_column]
+
+        targets = np.zeros((len(classes), rows), dtype=np.float32)
+        targets[labels, np.arange(rows)] = 1
+        weights = np.zeros((len(classes), len(columns)), dtype=np.float32)
+        first_moment = np.zeros_like(weights)
+        second_moment = np.zeros_like(weights)
+        for step in range(1, epochs + 1):
+            probabilities = _softmax(np.add.reduceat(weights[:, compact], starts[:-1], axis=1))
+            error = (probabilities - targets) / rows
+            gradient = np.add.reduceat(error[:, row_of_sorted], column_starts, axis=1) + l2 * weights
+            first_moment = 0.9 * first_moment + 0.1 * gradient
+            second_moment = 0.999 * second_moment + 0.001 * gradient * gradient
+            weights -= LEARNING_RATE * (first_moment / (1 - 0.9 ** step)) / (np.sqrt(second_moment / (1 - 0.999 ** step)) + 1e-8)
+
+        full = np.zeros((len(classes), n_features), dtype=np.float32)
+        full[:, columns] = weights
+        return cls(classes, full)
+
+    def scores(self, features: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """Class scores (logits), shape (classes, rows)."""
+        # Every row has the bias feature, so no reduceat segment is empty.
+        return np.add.reduceat(self.weights[:, features], starts[:-1], axis=1)
+
+    def predict_proba(self, features: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """Calibrated class probabilities, shape (classes, rows)."""
+        return _softmax(self.scores(features, starts) / self.temperature)
+
+    def calibrate(self, features: np.ndarray, starts: np.ndarray, labels: np.ndarray):
+        """Pick the temperature minimizing held-out negative log-likelihood."""
+        scores = self.scores(features, starts)
+        columns = np.arange(len(labels))
+        losses = [-np.log(_softmax(scores / t)[labels, columns] + 1e-12).mean() for t in TEMPERATURES]
+        self.temperature = float(TEMPERATURES[int(np.argmin(losses))])
+
+
+def fit_isotonic(scores: np.ndarray, correct: np.ndarray,
+                 min_block: int = MIN_CALIBRATION_BLOCK) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit a nondecreasing map from scores to the chance of being correct (pool adjacent violators).
+
+    Blocks with fewer than min_block observations are pooled into the block
+    below, so no probability, least of all the top one, rests on a handful of
+    rows. Each block maps to a Wilson lower bound on its rate, never above the
+    rate observed; scores above everything held out get the top block's.
+    Scores below everything held out fall towards 0 at a score of 0.
+    Returns (score points, probabilities) to interpolate between, one pair at
+    each end of every pooled block.
+    """
+    order = np.argsort(scores, kind='stable')
+    values, weights, lows, highs = [], [], [], []
+
+    def pool(i: int):
+        # Merge block i + 1 into block i.
+        weight = weights[i] + weights[i + 1]
+        values[i] = (values[i] * weights[i] + values[i + 1] * weights[i + 1]) / weight
+        weights[i] = weight
+        highs[i] = highs[i + 1]
+        del values[i + 1], weights[i + 1], lows[i + 1], highs[i + 1]
+
+    for score, outcome in zip(np.asarray(scores, dtype=float)[order], np.asarray(correct, dtype=float)[order]):
+        values.append(outcome)
+        weights.append(1.0)
+        lows.append(score)
+        highs.append(score)
+        while len(values) > 1 and values[-2] >= values[-1]:
+            pool(len(values) - 2)
+    # Pooling adjacent blocks keeps the values nondecreasing.
+    i = len(values) - 1
+    while i > 0:
+        if weights[i] < min_block:
+            pool(i - 1)
+        i = min(i, len(values)) - 1
+    if len(values) > 1 and weights[0] < min_block:
+        pool(0)
+
+    rates, counts, z = np.array(values), np.array(weights), CALIBRATION_Z
+    bounds = (rates + z * z / (2 * counts) - z * np.sqrt(rates * (1 - rates) / counts + z * z / (4 * counts * counts))) / (1 + z * z / counts)
+    # A smaller block's bound can fall below a larger one's under it; keep the map nondecreasing.
+    bounds = np.maximum.accumulate(bounds)
+
+    points = np.column_stack([lows, highs]).ravel()
+    probabilities = np.repeat(bounds, 2)
+    if len(points) and points[0] > 0:
+        points, probabilities = np.concatenate([[0.0], points]), np.concatenate([[0.0], probabilities])
+    return points, probabilities
+
+
+def cross_fitted_confidence(scores: np.ndarray, correct: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Calibrated scores where each half is mapped by a calibration fitted on the other half."""
+    half = np.random.default_rng(seed).random(len(scores)) < 0.5
+    confidence = np.empty(len(scores))
+    for fitted, mapped in ((half, ~half), (~half, half)):
+        if fitted.any() and mapped.any():
+            confidence[mapped] = np.interp(scores[mapped], *fit_isotonic(scores[fitted], correct[fitted]))
+        else:
+            confidence[mapped] = scores[mapped]
+    return confidence
+
+
+class TriageModel:
+    """Per-field logistic regressions predicting a full classification with a confidence.
+
+    `joint` holds the isotonic calibration (product points, probabilities) mapping
+    the product of field probabilities to the chance that every field is right;
+    without it the raw product is used.
+    """
+
+    def __init__(self, fields: Dict[str, FieldModel], n_features: int = DEFAULT_FEATURES,
+                 evaluation: Optional[Dict[str, Any]] = None, joint: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        self.fields = fields
+        self.n_features = n_features
+        self.evaluation = evaluation or {}
+        self.joint = joint
+
+    def joint_confidence(self, product: np.ndarray) -> np.ndarray:
+        """Calibrated chance that every field is right, from the product of field probabilities."""
+        if self.joint is None:
+            return product
+        return np.interp(product, *self.joint)
+
+    @classmethod
+    def train(cls, events: List[Dict[str, Any]], labels: List[Dict[str, str]], field_names: List[str],
+              n_features: int = DEFAULT_FEATURES, l2: float = DEFAULT_L2, seed: int = 0) -> 'TriageModel':
+        """Fit on labeled events, calibrating and evaluating on a held-out split first.
+
+        labels[i] maps field names to event i's known values; a field missing from
+        it is left out of that field's training data.
+        """
+        features, starts = featurize(events, n_features)
+        holdout = np.random.default_rng(seed).random(len(events)) < HOLDOUT_FRACTION
+
+        def subset(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            rows = np.flatnonzero(mask)
+            lengths = np.diff(starts)[rows]
+            sub_starts = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=sub_starts[1:])
+            positions = np.repeat(starts[rows] - sub_starts[:-1], lengths) + np.arange(sub_starts[-1])
+            return features[positions], sub_starts
+
+        fields = {}
+        held_out_correct = {}
+        held_out_confidence = np.ones(int(holdout.sum()))
+        held_out_all_correct = np.ones(int(holdout.sum()), dtype=bool)
+        holdout_rows = np.flatnonzero(holdout)
+        for field in field_names:
+            known = np.array([field in row for row in labels], dtype=bool)
+            classes = sorted({row[field] for row in labels if field in row})
+            if not classes:
+                raise ValueError(f"No training labels for {field}")
+            class_ids = {value: i for i, value in enumerate(classes)}
+            y = np.array([class_ids.get(row.get(field), -1) for row in labels], dtype=np.int64)
+
+            train_mask, test_mask = known & ~holdout, known & holdout
+            if train_mask.any() and test_mask.any():
+                model = FieldModel.fit(*subset(train_mask), y[train_mask], classes, n_features, l2)
+                model.calibrate(*subset(test_mask), y[test_mask])
+                probabilities = model.predict_proba(*subset(holdout))
+                predicted = probabilities.argmax(axis=0)
+                held_out_confidence *= probabilities.max(axis=0)
+                # Held-out rows without this label neither count as right nor wrong
+                labelled = known[holdout_rows]
+                correct = predicted == y[holdout_rows]
+                held_out_all_correct &= correct | ~labelled
+                held_out_correct[field] = float(correct[labelled].mean())
+                temperature = model.temperature
+            else:
+                temperature = 1.0
+            final = FieldModel.fit(*subset(known), y[known], classes, n_features, l2)
+            final.temperature = temperature
+            fields[field] = final
+
+        joint = fit_isotonic(held_out_confidence, held_out_all_correct) if len(holdout_rows) else None
+        model = cls(fields, n_features, joint=joint)
+        # Report thresholds on confidences calibrated without the rows they are scored on.
+        held_out_confidence = cross_fitted_confidence(held_out_confidence, held_out_all_correct, seed)
+        evaluation = {"training_rows": len(events), "held_out_rows": int(holdout.sum()),
+                      "field_accuracy": held_out_correct, "thresholds": {}}
+        for threshold in REPORT_THRESHOLDS:
+            accepted = held_out_confidence >= threshold
+            evaluation["thresholds"][str(threshold)] = {
+                "coverage": float(accepted.mean()) if len(accepted) else 0.0,
+                "accuracy": float(held_out_all_correct[accepted].mean()) if accepted.any() else None,
+            }
+        model.evaluation = evaluation
+        return model
+
+    def predict(self, events: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], np.ndarray]:
+        """Most likely value of every field for each event, and each event's confidence."""
+        features, starts = featurize(events, self.n_features)
+        predictions = [{} for _ in events]
+        product = np.ones(len(events))
+        for field, model in self.fields.items():
+            probabilities = model.predict_proba(features, starts)
+            best = probabilities.argmax(axis=0)
+            product *= probabilities.max(axis=0)
+            for prediction, class_id in zip(predictions, best):
+                prediction[field] = model.classes[class_id]
+        return predictions, self.joint_confidence(product)
+
+    def save(self, path: str):
+        arrays = {}
+        meta = {"n_features": self.n_features, "evaluation": self.evaluation, "fields": {}}
+        for field, model in self.fields.items():
+            meta["fields"][field] = {"classes": model.classes, "temperature": model.temperature}
+            arrays[f"{field}.weights"] = model.weights
+        if self.joint is not None:
+            arrays["joint.points"], arrays["joint.probabilities"] = self.joint
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'TriageModel':
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            fields = {
+                field: FieldModel(info["classes"], data[f"{field}.weights"], info["temperature"])
+                for field, info in meta["fields"].items()
+            }
+            joint = (data["joint.points"], data["joint.probabilities"]) if "joint.points" in data else None
+        return cls(fields, meta["n_features"], meta["evaluation"], joint)
+
+
+class TriageRouter:
+    """Classifies confident events locally and passes the rest on, counting both."""
+
+    def __init__(self, model: TriageModel, threshold: float = DEFAULT_THRESHOLD, chunk_size: int = ROUTE_CHUNK_SIZE):
+        self.model = model
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self.local = 0
+        self.routed = 0
+
+    def route(self, events: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, str]]]]:
+        """Yield (event, local classification or None if the LLM should classify it), in order.
+
+        Local classifications carry classification_source "triage", so output rows
+        show where their labels came from.
+        """
+        events = iter(events)
+        while True:
+            chunk = list(islice(events, self.chunk_size))
+            if not chunk:
+                return
+            with metrics.time('triage'):
+                predictions, confidence = self.model.predict(chunk)
+            for event, prediction, score in zip(chunk, predictions, confidence):
+                if score >= self.threshold:
+                    self.local += 1
+                    metrics.increment('triage_local')
+                    prediction[SOURCE_COLUMN] = TRIAGE_SOURCE
+                    yield event, prediction
+                else:
+                    self.routed += 1
+                    metrics.increment('triage_llm')
+                    yield event, None
+
+    def saved_fraction(self) -> float:
+        """Fraction of events that needed no LLM call."""
+        total = self.local + self.routed
+        return self.local / total if total else 0.0
+
+
+def load_training_data(enhanced_paths: List[str], example_paths: List[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """Events and their valid labels from enhanced outputs and labeled example CSVs.
+
+    MANUAL CHECK and values outside the definition lists are not used as labels,
+    and enhanced rows classified by triage are skipped so the model never learns
+    from its own predictions.
+    """
+    # Imported here because classification_script imports this module.
+    from classification_script import MANUAL_CHECK, REQUIRED_FIELDS, normalize_field_value
+
+    def labels_of(row: Dict[str, Any]) -> Dict[str, str]:
+        labels = {}
+        for column, field in LABEL_COLUMNS.items():
+            if field in REQUIRED_FIELDS and field not in labels:
+                value = normalize_field_value(field, row.get(column))
+                if value is not None and value != MANUAL_CHECK:
+                    labels[field] = value
+        return labels
+
+    events, labels = [], []
+    rows = [row for path in enhanced_paths for row in iter_event_file(path) if row.get(SOURCE_COLUMN) != TRIAGE_SOURCE]
+    rows += [row for path in example_paths for row in iter_csv_rows(path)]
+    for row in rows:
+        row_labels = labels_of(row)
+        if row_labels:
+            events.append(row)
+            labels.append(row_labels)
+    return events, labels
+
+
+def print_evaluation(evaluation: Dict[str, Any]):
+    """Print held-out accuracy per field and coverage/accuracy at each threshold."""
+    print(f"Trained on {evaluation['training_rows']} labeled events ({evaluation['held_out_rows']} held out for calibration)")
+    print("Held-out accuracy per field:")
+    for field, accuracy in evaluation["field_accuracy"].items():
+        print(f"  {field}: {accuracy:.1%}")
+    print("Held-out events classified locally at each confidence threshold:")
+    for threshold, result in evaluation["thresholds"].items():
+        accuracy = "n/a" if result["accuracy"] is None else f"{result['accuracy']:.1%}"
+        print(f"  >= {threshold}: {result['coverage']:.1%} of events, all fields correct for {accuracy}")
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Train the local triage classifier.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    train = commands.add_parser('train', help="Train on enhanced outputs and labeled examples")
+    train.add_argument('--enhanced', nargs='*', default=['us_data_enhanced.json'],
+                       help="Enhanced outputs to learn from (default: us_data_enhanced.json)")
+    train.add_argument('--examples', nargs='*', default=['green_11_5.csv', 'yellow_11_5.csv'],
+                       help="Labeled example CSVs (default: green_11_5.csv yellow_11_5.csv)")
+    train.add_argument('--output', default='triage_model.npz',
+                       help="Where to save the model (default: triage_model.npz)")
+    train.add_argument('--features', type=int, default=DEFAULT_FEATURES,
+                       help=f"Size of the hashed feature space (default: {DEFAULT_FEATURES})")
+    train.add_argument('--seed', type=int, default=0,
+                       help="Seed for the held-out split (default: 0)")
+    commands.add_parser('info', help="Print a saved model's held-out evaluation").add_argument(
+        'model', nargs='?', default='triage_model.npz', help="Model file (default: triage_model.npz)")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None):
+    """Train a model or describe a saved one."""
+    args = parse_args(argv)
+    if args.command == 'info':
+        print_evaluation(TriageModel.load(args.model).evaluation)
+        return
+
+    from classification_script import REQUIRED_FIELDS
+    events, labels = load_training_data(args.enhanced, args.examples)
+    model = TriageModel.train(events, labels, REQUIRED_FIELDS, args.features, seed=args.seed)
+    model.save(args.output)
+    print_evaluation(model.evaluation)
+    print(f"Model saved to {args.output}")
+    return model
+
+
+if __name__ == "__main__":
+    main()